@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+"""
+Circuit Breaker สำหรับการดึงข้อมูลจากแหล่งภายนอก
+- จำกัดเวลาต่อครั้ง (latency budget) ด้วย asyncio.wait_for
+- ล้มเหลวติดกันครบ threshold -> OPEN (ไม่เรียก upstream เลยจนครบ reset_timeout)
+- ครบเวลาแล้วปล่อยให้ลองหนึ่งครั้ง (HALF_OPEN) ถ้าผ่านกลับเป็น CLOSED
+"""
+
+import asyncio
+import logging
+import time
+from typing import Any, Awaitable, Callable, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class CircuitOpenError(Exception):
+    """ไม่เรียก upstream เพราะ circuit เปิดอยู่"""
+
+
+class CircuitBreaker:
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half_open'
+
+    def __init__(self, name: str, latency_budget: float = 5.0, failure_threshold: int = 3,
+                 reset_timeout: float = 300.0):
+        self.name = name
+        self.latency_budget = latency_budget
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        # งานที่เกินงบเวลาแต่ยังทำต่อเบื้องหลัง (เช่น full sync ครั้งแรก)
+        self.inflight: Optional[asyncio.Task] = None
+
+    def allow_request(self) -> bool:
+        if self.state == self.OPEN:
+            if time.monotonic() - self.opened_at >= self.reset_timeout:
+                self.state = self.HALF_OPEN
+                logger.info(f"🔌 Circuit '{self.name}' half-open: trying upstream again")
+                return True
+            return False
+        return True
+
+    def record_success(self):
+        if self.state != self.CLOSED:
+            logger.info(f"✅ Circuit '{self.name}' closed")
+        self.state = self.CLOSED
+        self.failures = 0
+
+    def record_failure(self, reason: str = ''):
+        self.failures += 1
+        if self.state == self.HALF_OPEN or self.failures >= self.failure_threshold:
+            self.state = self.OPEN
+            self.opened_at = time.monotonic()
+            logger.warning(f"🚫 Circuit '{self.name}' open for {self.reset_timeout:.0f}s ({reason})")
+
+    async def call(self, factory: Callable[[], Awaitable[Any]], unbounded: bool = False) -> Any:
+        """เรียก upstream ภายใต้งบเวลา - คืนค่า None หรือ exception ถือว่าล้มเหลว
+        unbounded=True รอจนเสร็จ (ไม่มีข้อมูลสำรองให้ fallback หรืองานที่ใช้เวลานานโดยธรรมชาติ)"""
+        if not self.allow_request():
+            raise CircuitOpenError(f"circuit '{self.name}' is open")
+
+        # ถ้ารอบก่อนหมดเวลาแต่งานยังวิ่งอยู่ (หรือเพิ่งเสร็จ) ให้ใช้งานเดิมแทนการเริ่มใหม่
+        task = self.inflight
+        if task is None or (task.done() and (task.cancelled() or task.exception() is not None)):
+            task = self.inflight = asyncio.ensure_future(factory())
+
+        try:
+            if unbounded:
+                result = await asyncio.shield(task)
+            else:
+                result = await asyncio.wait_for(asyncio.shield(task), self.latency_budget)
+        except asyncio.TimeoutError:
+            self.record_failure(f"exceeded {self.latency_budget:.1f}s budget")
+            raise
+        except Exception as e:
+            self.inflight = None
+            self.record_failure(str(e))
+            raise
+
+        self.inflight = None
+        if result is None or result == []:
+            self.record_failure('empty result')
+            raise ValueError(f"{self.name} returned no data")
+
+        self.record_success()
+        return result
+
+    async def drain(self):
+        """รองานที่เกินงบเวลาแต่ยังวิ่งอยู่ให้เสร็จ (ก่อนปิดโปรแกรมแบบรันครั้งเดียว)"""
+        task, self.inflight = self.inflight, None
+        if task is None or task.done():
+            return
+        logger.info(f"⏳ Waiting for background fetch of '{self.name}' to finish...")
+        try:
+            await task
+        except Exception as e:
+            logger.warning(f"⚠️ Background fetch of '{self.name}' failed: {str(e) or type(e).__name__}")
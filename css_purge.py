@@ -0,0 +1,213 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+🧹 CSS Purge - ตัดกฎ CSS ที่ไม่มีหน้าไหนใช้ ออกเป็น bundle ต่อกลุ่มหน้า (page family)
+
+- อ่าน HTML ทุกหน้าครั้งเดียว สร้างดัชนี element ต่อกลุ่ม (css_tools.DocumentIndex):
+  element ที่โครงสร้างซ้ำกันข้ามหน้าเก็บครั้งเดียว หลายพันหน้าจาก template เดียวกันเหลือขนาดราวหน้าเดียว
+- รวม element/class ที่ inline script สร้าง (template string ใน all-cars.html, classList/className, createElement)
+  และเนื้อหาของ <noscript>
+- เช็คแต่ละ selector กับดัชนีครั้งเดียว ไม่ใช่ทุกหน้า x ทุก selector
+- bundle ของกลุ่ม = stylesheet ในเว็บทุกไฟล์ที่หน้าในกลุ่มลิงก์ (ตามลำดับ) ที่เหลือเฉพาะกฎที่ใช้ แบบ minify
+  url() ถูกปรับให้ถูกต้องจากตำแหน่งใหม่ของ bundle
+- SAFELIST = class ที่ JavaScript ภายนอก (เช่น image-optimization.js) เติม - ใช้ * ได้ เช่น "swiper-*"
+
+การใช้งาน:
+    python css_purge.py                                 # docs/ -> docs/purged/<family>.css
+    python css_purge.py --root . --safelist "active,modal-*" --report purge-report.json
+    python css_purge.py --family listing=index.html,all-cars.html --family car-detail="car-detail/*.html"
+"""
+
+import argparse
+import json
+import os
+import re
+import time
+from fnmatch import fnmatch, filter as fnmatch_filter
+from pathlib import Path
+
+from css_tools import (AtRule, DocumentIndex, compile_selector, filter_rules, is_stylesheet_link, parse_stylesheet,
+                       read_stylesheet, rebase_urls, resolve_stylesheet, serialize, style_rules)
+from html_tokens import tokenize
+
+# หน้าเข้ากลุ่มแรกที่ glob ตรง (เทียบกับ root, * ข้าม / ได้)
+PAGE_FAMILIES = {
+    "car-detail": ("car-detail/*.html",),
+    "pages": ("*.html",),
+}
+
+# class ที่ JavaScript ภายนอกเติม (script ใน HTML ถูกอ่านเองอยู่แล้ว)
+SAFELIST = ("loaded",)
+
+
+def selector_names(rules):
+    """(class, attribute) ที่ selector ของกฎเหล่านี้ใช้"""
+    classes = set()
+    attributes = set()
+    for rule in style_rules(rules):
+        for selector in rule.selectors:
+            for _, compound in compile_selector(selector) or ():
+                classes.update(compound.classes)
+                attributes.update(name for name, _, _, _ in compound.attrs)
+    return classes, attributes
+
+
+def expand_safelist(safelist, classes):
+    """class ใน safelist + class ใน stylesheet ที่ตรง pattern (*, ?)"""
+    expanded = set()
+    for entry in safelist:
+        if re.search(r'[*?\[]', entry):
+            expanded.update(fnmatch_filter(classes, entry))
+        else:
+            expanded.add(entry)
+    return expanded
+
+
+def page_stylesheets(html, page_path):
+    """path ของ stylesheet ในเว็บที่หน้าลิงก์ (ดูเฉพาะ <head>)"""
+    end = html.find('</head>')
+    paths = []
+    for token in tokenize(html if end == -1 else html[:end]):
+        if token.kind == 'start' and token.name == 'link' and is_stylesheet_link(token):
+            path = resolve_stylesheet(token.attr('href'), page_path)
+            if path and path not in paths:
+                paths.append(path)
+    return paths
+
+
+class CSSPurger:
+    def __init__(self, root="docs", families=None, safelist=SAFELIST, output_dir=None):
+        self.root = Path(root)
+        self.families = dict(families or PAGE_FAMILIES)
+        self.safelist = tuple(safelist)
+        self.output_dir = Path(output_dir) if output_dir else self.root / "purged"
+
+    def family_pages(self):
+        """{family: [path ของหน้า]} - หน้าที่ไม่เข้ากลุ่มไหนไม่ถูกอ่าน"""
+        pages = {name: [] for name in self.families}
+        output_dir = self.output_dir.resolve()
+        for path in sorted(self.root.rglob("*.html")):
+            if output_dir in path.resolve().parents:
+                continue
+            relative = path.relative_to(self.root).as_posix()
+            for name, patterns in self.families.items():
+                if any(fnmatch(relative, pattern) for pattern in patterns):
+                    pages[name].append(path)
+                    break
+        return pages
+
+    def selector_attributes(self):
+        """attribute ที่ selector ใน CSS ทุกไฟล์ของเว็บใช้ - ดัชนีเก็บเฉพาะ attribute เหล่านี้"""
+        attributes = set()
+        for path in self.root.rglob("*.css"):
+            if self.output_dir.resolve() not in path.resolve().parents:
+                attributes |= selector_names(parse_stylesheet(read_stylesheet(str(path))))[1]
+        return attributes
+
+    def purge_family(self, name, pages, attributes, write=True):
+        started = time.perf_counter()
+        index = DocumentIndex(attributes=attributes)
+        stylesheets = []
+        for page in pages:
+            with open(page, "r", encoding="utf-8") as f:
+                html = f.read()
+            index.add_html(html, scripts=True)
+            for path in page_stylesheets(html, page):
+                if path not in stylesheets:
+                    stylesheets.append(path)
+        if not stylesheets:
+            return None
+
+        rules = []
+        original_bytes = 0
+        for path in stylesheets:
+            css = read_stylesheet(path)
+            original_bytes += len(css.encode("utf-8"))
+            rules.extend(parse_stylesheet(rebase_urls(css, os.path.dirname(path), str(self.output_dir))))
+        safelist = expand_safelist(self.safelist, selector_names(rules)[0])
+        purged = filter_rules(rules, index, safelist=safelist)
+        # @charset/@import ใช้ได้เฉพาะต้นไฟล์ - ไฟล์ที่สองเป็นต้นไปต้องยกขึ้นมา (@charset เหลือตัวแรก)
+        leading = [rule for rule in purged if isinstance(rule, AtRule) and rule.name in ('charset', 'import')]
+        charsets = [rule for rule in leading if rule.name == 'charset']
+        purged = (charsets[:1] + [rule for rule in leading if rule.name == 'import']
+                  + [rule for rule in purged if rule not in leading])
+        minified_css = serialize(rules)
+        purged_css = serialize(purged)
+
+        output_path = self.output_dir / f"{name}.css"
+        if write:
+            self.output_dir.mkdir(parents=True, exist_ok=True)
+            tmp_path = output_path.with_suffix(".tmp")
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                f.write(purged_css)
+            os.replace(tmp_path, output_path)
+
+        minified_bytes = len(minified_css.encode("utf-8"))
+        purged_bytes = len(purged_css.encode("utf-8"))
+        return {
+            'family': name,
+            'pages': len(pages),
+            'stylesheets': [os.path.relpath(path, self.root) for path in stylesheets],
+            'output': str(output_path),
+            'original_bytes': original_bytes,
+            'minified_bytes': minified_bytes,
+            'purged_bytes': purged_bytes,
+            'removed_bytes': minified_bytes - purged_bytes,
+            'selectors': sum(len(rule.selectors) for rule in style_rules(rules)),
+            'kept_selectors': sum(len(rule.selectors) for rule in style_rules(purged)),
+            'indexed_elements': len(index.elements),
+            'dynamic_classes': len(index.dynamic_classes),
+            'elapsed_ms': round((time.perf_counter() - started) * 1000, 1),
+        }
+
+    def run(self, write=True, verbose=True):
+        """purge ทุกกลุ่ม คืนค่ารายงานต่อกลุ่ม"""
+        attributes = self.selector_attributes()
+        reports = []
+        for name, pages in self.family_pages().items():
+            if not pages:
+                continue
+            report = self.purge_family(name, pages, attributes, write=write)
+            if report is None:
+                if verbose:
+                    print(f"⏭️ {name}: {len(pages)} หน้า ไม่มี stylesheet ในเว็บ")
+                continue
+            reports.append(report)
+            if verbose:
+                removed_percent = report['removed_bytes'] / max(1, report['minified_bytes']) * 100
+                print(f"🧹 {name}: {report['pages']:,} หน้า, {' + '.join(report['stylesheets'])}"
+                      f" {report['original_bytes']:,} -> {report['purged_bytes']:,} ไบต์"
+                      f" (purge ตัด {report['removed_bytes']:,} ไบต์ = {removed_percent:.0f}% หลัง minify,"
+                      f" selector {report['kept_selectors']}/{report['selectors']}) ใน {report['elapsed_ms']:.0f} ms")
+        return reports
+
+
+def main():
+    parser = argparse.ArgumentParser(description="ตัด CSS ที่ไม่ได้ใช้ เป็น bundle ต่อกลุ่มหน้า")
+    parser.add_argument("--root", default="docs", help="โฟลเดอร์เว็บที่ generate แล้ว")
+    parser.add_argument("--output-dir", help="ที่เก็บ bundle (ค่าเริ่มต้น <root>/purged)")
+    parser.add_argument("--family", action="append", default=[], metavar="NAME=GLOB[,GLOB]",
+                        help="กลุ่มหน้า (กำหนดแล้วแทนกลุ่มเริ่มต้นทั้งหมด)")
+    parser.add_argument("--safelist", default="", help="class ที่เก็บไว้เสมอ คั่นด้วย comma (ใช้ * ได้)")
+    parser.add_argument("--report", help="บันทึกรายงานเป็น JSON")
+    parser.add_argument("--dry-run", action="store_true", help="รายงานอย่างเดียว ไม่เขียน bundle")
+    args = parser.parse_args()
+
+    families = {}
+    for entry in args.family:
+        name, _, patterns = entry.partition("=")
+        if not name or not patterns:
+            parser.error(f"--family ต้องเป็น NAME=GLOB[,GLOB]: {entry}")
+        families[name] = tuple(pattern.strip() for pattern in patterns.split(",") if pattern.strip())
+    safelist = SAFELIST + tuple(name.strip() for name in args.safelist.split(",") if name.strip())
+
+    purger = CSSPurger(args.root, families=families or None, safelist=safelist, output_dir=args.output_dir)
+    reports = purger.run(write=not args.dry_run)
+    if args.report:
+        with open(args.report, "w", encoding="utf-8") as f:
+            json.dump(reports, f, ensure_ascii=False, indent=2)
+        print(f"📄 รายงาน: {args.report}")
+
+
+if __name__ == "__main__":
+    main()
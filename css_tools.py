@@ -0,0 +1,725 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+🎨 CSS Tools - แยก CSS เป็นกฎ จับคู่ selector กับ HTML ที่ generate แล้ว และดึง critical CSS
+
+- parse_stylesheet: แยก stylesheet เป็น StyleRule/AtRule (ไม่พึ่ง library) ต่อกลับแบบ minify ด้วย serialize
+- DocumentIndex: element ของหน้า (ทั้งหน้า หรือเฉพาะเหนือ fold) พร้อมดัชนี tag/class/id
+  selector แต่ละตัวเช็คเฉพาะ element ที่มี tag/class/id ของ compound ขวาสุด ไม่ไล่ทุก element
+- selector ที่ประเมินแบบ static ไม่ได้ (:nth-child, :not, :is ...) ถือว่าตรง - เก็บเกินดีกว่าหน้าเพี้ยน
+- critical_css: เฉพาะกฎที่ใช้กับ element เหนือ fold (ตัด :hover/:focus, @media print, @keyframes)
+- inline_critical_css: ใส่ <style data-critical> จาก stylesheet ที่หน้าลิงก์ไว้ แล้วโหลดไฟล์เต็มแบบไม่ block render
+  (preload + onload, มี <noscript> สำรอง) - คำนวณใหม่ทุกครั้งจาก CSS ปัจจุบัน รันซ้ำได้ผลเท่าเดิม
+
+การใช้งาน:
+    python css_tools.py critical docs/car-detail/some-car.html
+    python css_tools.py critical docs/index.html --fold ".cta-section" --max-elements 80
+"""
+
+import argparse
+import html as html_lib
+import os
+import re
+import sys
+from functools import lru_cache
+
+from html_tokens import replace_elements, replace_tags, tokenize
+
+# ส่วนของหน้าที่เริ่มต่ำกว่าจอแรกใน template ของเว็บนี้ (element แรกที่ตรง = จุด fold)
+FOLD_SELECTOR = ".car-details, .car-specs, .car-description, .action-buttons, .cta-section, footer"
+# หน้าที่ไม่มีจุด fold (เช่น grid รถยาวๆ) นับ element ใน body ได้ไม่เกินนี้ถือว่าอยู่เหนือ fold
+ABOVE_FOLD_ELEMENTS = 60
+
+CRITICAL_ATTR = "data-critical"
+DEFER_ONLOAD = "this.onload=null;this.rel='stylesheet'"
+
+VOID_ELEMENTS = {'area', 'base', 'br', 'col', 'embed', 'hr', 'img', 'input', 'link', 'meta',
+                 'param', 'source', 'track', 'wbr'}
+# แท็กเปิดเหล่านี้ปิด element ที่ยังเปิดอยู่บนสุดโดยนัย (<li>1<li>2 เป็นพี่น้องกัน)
+_BLOCK_CLOSES_P = {'address', 'article', 'aside', 'blockquote', 'details', 'div', 'dl', 'fieldset', 'figure',
+                   'footer', 'form', 'h1', 'h2', 'h3', 'h4', 'h5', 'h6', 'header', 'hr', 'main', 'nav', 'ol',
+                   'p', 'pre', 'section', 'table', 'ul'}
+IMPLIED_END_TAGS = {
+    'li': {'li'}, 'dt': {'dt', 'dd'}, 'dd': {'dt', 'dd'}, 'tr': {'tr', 'td', 'th'},
+    'td': {'td', 'th'}, 'th': {'td', 'th'}, 'option': {'option'},
+    **{name: {'p'} for name in _BLOCK_CLOSES_P},
+}
+# ไม่ถูกวาดบนจอ - ไม่นับเป็น element เหนือ fold
+NON_RENDERED_ELEMENTS = {'script', 'style', 'noscript', 'template', 'link', 'meta', 'title', 'base'}
+# at-rule ที่มีกฎซ้อนข้างใน (ส่วนอื่นเช่น @font-face/@keyframes เก็บ block เป็นข้อความ)
+NESTED_AT_RULES = {'media', 'supports', 'document', '-moz-document', 'layer', 'container', 'scope'}
+# สถานะที่เกิดจากผู้ใช้ - ไม่ต้องใช้ตอนวาดครั้งแรก
+STATE_PSEUDO_CLASSES = {'hover', 'focus', 'active', 'visited', 'focus-within', 'focus-visible', 'target'}
+
+_STRING_RE = re.compile(r'''("(?:\\.|[^"\\])*"|'(?:\\.|[^'\\])*')''', re.S)
+_COMMENT_OR_STRING_RE = re.compile(r'''/\*.*?(?:\*/|\Z)|"(?:\\.|[^"\\])*"|'(?:\\.|[^'\\])*\'''', re.S)
+_SPECIAL_RE = re.compile(r'''"(?:\\.|[^"\\])*(?:"|\Z)|'(?:\\.|[^'\\])*(?:'|\Z)|[{};,()\[\]]''', re.S)
+_SELECTOR_PART_RE = re.compile(r'''
+    (?P<combinator>\s*[>+~]\s*|\s+)
+  | (?P<universal>\*)
+  | (?P<tag>-?[_a-zA-Z\u0080-\uffff][\w\u0080-\uffff-]*)
+  | \#(?P<id>(?:\\.|[\w\u0080-\uffff-])+)
+  | \.(?P<cls>(?:\\.|[\w\u0080-\uffff-])+)
+  | \[\s*(?P<attr>[^\]~|^$*=\s]+)\s*(?:(?P<op>[~|^$*]?=)\s*(?P<value>"(?:\\.|[^"\\])*"|'(?:\\.|[^'\\])*'|[^\]\s]+)\s*(?P<flag>[iIsS])?\s*)?\]
+  | (?P<colons>::?)(?P<pseudo>-?[\w-]+)(?P<args>\((?:[^()]|\([^()]*\))*\))?
+''', re.X)
+_JS_LITERAL_RE = re.compile(r'''//[^\n]*|/\*.*?(?:\*/|\Z)|`(?:\\.|\$\{(?:[^{}]|\{[^{}]*\})*\}|[^`\\$]|\$(?!\{))*`?|"(?:\\.|[^"\\\n])*"?|'(?:\\.|[^'\\\n])*'?''', re.S)
+_MARKUP_RE = re.compile(r'<[a-zA-Z]')
+_CLASS_WORD_RE = re.compile(r'-?[_a-zA-Z][\w-]*')
+_CREATE_ELEMENT_RE = re.compile(r'''createElement\(\s*['"]([a-zA-Z][\w-]*)['"]''')
+_URL_RE = re.compile(r'''url\(\s*(['"]?)(.*?)\1\s*\)''', re.I)
+_IMPORT_RE = re.compile(r'''@import\s+(['"])(.*?)\1''', re.I)
+_FONT_FAMILY_RE = re.compile(r'font-family\s*:\s*([^;]+)', re.I)
+_ANIMATION_NAME_RE = re.compile(r'@(?:-webkit-|-moz-)?keyframes\s+(\S+)', re.I)
+
+
+# ---------------------------------------------------------------- stylesheet
+
+class StyleRule:
+    """selector list + declarations (ข้อความใน {} ตามต้นฉบับ)"""
+
+    __slots__ = ('selectors', 'declarations')
+
+    def __init__(self, selectors, declarations):
+        self.selectors = selectors
+        self.declarations = declarations
+
+    def css(self):
+        return ','.join(self.selectors) + '{' + minify_declarations(self.declarations) + '}'
+
+
+class AtRule:
+    """@media/@supports มี rules ซ้อน, @font-face/@keyframes มี block ข้อความ, @import/@charset ไม่มี block"""
+
+    __slots__ = ('prelude', 'name', 'rules', 'block')
+
+    def __init__(self, prelude, rules=None, block=None):
+        self.prelude = ' '.join(prelude.split())
+        self.name = re.match(r'@([\w-]*)', self.prelude).group(1).lower()
+        self.rules = rules
+        self.block = block
+
+    def css(self):
+        if self.rules is not None:
+            return f"{self.prelude}{{{serialize(self.rules)}}}"
+        if self.block is not None:
+            return f"{self.prelude}{{{minify_declarations(self.block)}}}"
+        return f"{self.prelude};"
+
+
+def strip_comments(css):
+    return _COMMENT_OR_STRING_RE.sub(lambda m: '' if m.group().startswith('/*') else m.group(), css)
+
+
+def minify_declarations(text):
+    """ยุบช่องว่างนอก string และตัดช่องว่างรอบ ; : , { }"""
+    parts = _STRING_RE.split(text)
+    for i in range(0, len(parts), 2):
+        part = re.sub(r'\s+', ' ', parts[i])
+        parts[i] = re.sub(r'\s*([;:,{}])\s*', r'\1', part)
+    return re.sub(r';+(}|$)', r'\1', ''.join(parts).strip())
+
+
+def _scan(css, pos, end, stops):
+    """ตำแหน่งแรกของอักขระใน stops ที่อยู่นอก string/วงเล็บ (ไม่เจอ = end)"""
+    depth = 0
+    for match in _SPECIAL_RE.finditer(css, pos, end):
+        char = match.group()
+        if char[0] in '"\'':
+            continue
+        if char in '([':
+            depth += 1
+        elif char in ')]':
+            depth = max(0, depth - 1)
+        elif depth == 0 and char in stops:
+            return match.start()
+    return end
+
+
+def _block_end(css, pos, end):
+    """ตำแหน่ง } ที่ปิด block ที่เริ่มก่อน pos"""
+    depth = 1
+    for match in _SPECIAL_RE.finditer(css, pos, end):
+        char = match.group()
+        if char == '{':
+            depth += 1
+        elif char == '}':
+            depth -= 1
+            if depth == 0:
+                return match.start()
+    return end
+
+
+def split_selectors(prelude):
+    """แยก selector list ที่ comma นอกวงเล็บ/string และยุบช่องว่าง"""
+    selectors = []
+    pos = 0
+    while pos <= len(prelude):
+        comma = _scan(prelude, pos, len(prelude), ',')
+        selector = re.sub(r'\s*([>+~])\s*', r'\1', ' '.join(prelude[pos:comma].split()))
+        if selector:
+            selectors.append(selector)
+        pos = comma + 1
+    return selectors
+
+
+def _parse_rules(css, pos, end):
+    rules = []
+    while pos < end:
+        stop = _scan(css, pos, end, '{;}')
+        prelude = css[pos:stop].strip()
+        if stop >= end or css[stop] != '{':
+            # @import/@charset; หรือ ; } ที่หลงมา
+            if prelude.startswith('@'):
+                rules.append(AtRule(prelude))
+            pos = stop + 1
+            continue
+        close = _block_end(css, stop + 1, end)
+        if prelude.startswith('@'):
+            rule = AtRule(prelude)
+            if rule.name in NESTED_AT_RULES:
+                rule.rules = _parse_rules(css, stop + 1, close)
+            else:
+                rule.block = css[stop + 1:close]
+            rules.append(rule)
+        elif prelude:
+            selectors = split_selectors(prelude)
+            if selectors:
+                rules.append(StyleRule(selectors, css[stop + 1:close]))
+        pos = close + 1
+    return rules
+
+
+def rebase_urls(css, from_dir, to_dir):
+    """ปรับ url()/@import แบบ relative ของ CSS ที่อยู่ใน from_dir ให้ถูกเมื่อย้ายไปไว้ใน to_dir"""
+    def rebase(url):
+        if not url or re.match(r'^(?:[a-zA-Z][\w+.-]*:|/|#)', url):
+            return url
+        path, suffix = re.match(r'([^?#]*)(.*)', url).groups()
+        target = os.path.relpath(os.path.normpath(os.path.join(from_dir, path)), to_dir)
+        return target.replace(os.sep, '/') + suffix
+
+    css = _URL_RE.sub(lambda m: f"url({m.group(1)}{rebase(m.group(2))}{m.group(1)})", css)
+    return _IMPORT_RE.sub(lambda m: f"@import {m.group(1)}{rebase(m.group(2))}{m.group(1)}", css)
+
+
+@lru_cache(maxsize=64)
+def parse_stylesheet(css):
+    """แยก stylesheet เป็นกฎ (แคชตามเนื้อหา - ห้ามแก้ list ที่ได้)"""
+    css = strip_comments(css)
+    return tuple(_parse_rules(css, 0, len(css)))
+
+
+def serialize(rules):
+    return ''.join(rule.css() for rule in rules)
+
+
+# ---------------------------------------------------------------- selectors
+
+class Compound:
+    """selector ย่อยไม่มี combinator เช่น a.btn[href]:hover"""
+
+    __slots__ = ('tag', 'ids', 'classes', 'attrs', 'state', 'root')
+
+    def __init__(self):
+        self.tag = None
+        self.ids = []
+        self.classes = []
+        self.attrs = []
+        self.state = False
+        self.root = False
+
+
+def _unescape(identifier):
+    return re.sub(r'\\(.)', r'\1', identifier)
+
+
+@lru_cache(maxsize=None)
+def compile_selector(selector):
+    """selector -> [(combinator กับ compound ก่อนหน้า, Compound)] หรือ None ถ้าอ่านไม่ออก"""
+    parts = []
+    compound = Compound()
+    combinator = None
+    empty = True
+    pos = 0
+    while pos < len(selector):
+        match = _SELECTOR_PART_RE.match(selector, pos)
+        if not match or match.end() == pos:
+            return None
+        pos = match.end()
+        if match.group('combinator') is not None:
+            if empty:
+                if parts or match.group().strip():
+                    return None
+                continue
+            parts.append((combinator, compound))
+            combinator = match.group().strip() or ' '
+            compound = Compound()
+            empty = True
+            continue
+        empty = False
+        if match.group('tag') is not None:
+            compound.tag = match.group('tag').lower()
+        elif match.group('id') is not None:
+            compound.ids.append(_unescape(match.group('id')))
+        elif match.group('cls') is not None:
+            compound.classes.append(_unescape(match.group('cls')))
+        elif match.group('attr') is not None:
+            value = match.group('value')
+            if value and value[0] in '"\'':
+                value = value[1:-1]
+            compound.attrs.append((match.group('attr').lower(), match.group('op'),
+                                   _unescape(value) if value is not None else None,
+                                   (match.group('flag') or '').lower() == 'i'))
+        elif match.group('pseudo') is not None:
+            name = match.group('pseudo').lower()
+            if match.group('colons') == ':' and name in STATE_PSEUDO_CLASSES:
+                compound.state = True
+            elif match.group('colons') == ':' and name == 'root':
+                compound.root = True
+            # pseudo-element และ pseudo-class อื่น (nth-child, not, is, ...) ถือว่าตรง
+    if empty:
+        return None
+    parts.append((combinator, compound))
+    return parts
+
+
+class Element:
+    """element หนึ่งตัว - detached = root ของ HTML ที่ script สร้าง (ไม่รู้ว่าจะถูกใส่ใต้ element ไหน)"""
+
+    __slots__ = ('tag', 'id', 'classes', 'attrs', 'parent', 'prev', 'detached')
+
+    def __init__(self, tag, attrs, parent, prev, detached=False):
+        self.tag = tag
+        self.attrs = attrs
+        self.id = attrs.get('id')
+        self.classes = frozenset(attrs.get('class', '').split())
+        self.parent = parent
+        self.prev = prev
+        self.detached = detached
+
+
+def _match_attr(element, name, op, expected, ignore_case):
+    value = element.attrs.get(name)
+    if value is None:
+        return False
+    if op is None:
+        return True
+    if ignore_case:
+        value, expected = value.lower(), expected.lower()
+    if op == '=':
+        return value == expected
+    if op == '~=':
+        return expected in value.split()
+    if op == '|=':
+        return value == expected or value.startswith(expected + '-')
+    if op == '^=':
+        return bool(expected) and value.startswith(expected)
+    if op == '$=':
+        return bool(expected) and value.endswith(expected)
+    return bool(expected) and expected in value
+
+
+def _match_compound(compound, element, states, safelist):
+    if compound.state and not states:
+        return False
+    if compound.tag and compound.tag != element.tag:
+        return False
+    if compound.root and element.tag != 'html':
+        return False
+    if any(element.id != identifier for identifier in compound.ids):
+        return False
+    if any(name not in element.classes and name not in safelist for name in compound.classes):
+        return False
+    return all(_match_attr(element, *attr) for attr in compound.attrs)
+
+
+def _match_parts(parts, i, element, states, safelist):
+    combinator, compound = parts[i]
+    if not _match_compound(compound, element, states, safelist):
+        return False
+    if i == 0:
+        return True
+    # เดินขึ้น parent (' ' '>') หรือย้อนพี่น้อง ('+' '~') - หลุดจาก root ที่ detached = อาจตรง
+    upward = combinator in ' >'
+    last = element
+    relative = element.parent if upward else element.prev
+    while relative is not None:
+        if _match_parts(parts, i - 1, relative, states, safelist):
+            return True
+        if combinator in '>+':
+            return False
+        last = relative
+        relative = relative.parent if upward else relative.prev
+    return last.detached
+
+
+class DocumentIndex:
+    """element ของหน้า + ดัชนี tag/class/id สำหรับเช็ค selector
+    attributes = ชื่อ attribute ที่ selector ใช้: กำหนดแล้ว element ที่ tag/class/id/attribute เหล่านี้
+    และ parent/พี่น้องก่อนหน้าเหมือนกันเก็บครั้งเดียว - หลายพันหน้าจาก template เดียวกันเหลือขนาดราวหน้าเดียว"""
+
+    def __init__(self, attributes=None):
+        self.elements = []
+        self.by_tag = {}
+        self.by_class = {}
+        self.by_id = {}
+        # class ที่ script เติม/สร้างแบบคำนวณ - ถือว่าอาจอยู่บน element ไหนก็ได้
+        self.dynamic_classes = set()
+        self.attributes = None if attributes is None else frozenset(attributes) | {'id', 'class'}
+        self._interned = {} if attributes is not None else None
+        self._safelists = {}
+
+    def add(self, element):
+        self.elements.append(element)
+        self.by_tag.setdefault(element.tag, []).append(element)
+        for name in element.classes:
+            self.by_class.setdefault(name, []).append(element)
+        if element.id:
+            self.by_id.setdefault(element.id, []).append(element)
+
+    def element(self, token, parent, prev, detached=False):
+        """Element ของแท็กเปิด (ตัวเดิมถ้าเคยเห็นโครงสร้างนี้แล้ว) คืนค่า (element, ใหม่ไหม)"""
+        attrs = {name: value if value is not None else '' for name, value, _, _ in token.attrs
+                 if self.attributes is None or name in self.attributes}
+        if self._interned is None:
+            return Element(token.name, attrs, parent, prev, detached), True
+        key = (token.name, tuple(sorted(attrs.items())), id(parent), id(prev), detached)
+        element = self._interned.get(key)
+        if element is not None:
+            return element, False
+        element = self._interned[key] = Element(token.name, attrs, parent, prev, detached)
+        return element, True
+
+    @classmethod
+    def from_html(cls, html, fold=None, max_elements=None):
+        index = cls()
+        index.add_html(html, fold=fold, max_elements=max_elements)
+        return index
+
+    def add_html(self, html, fold=None, max_elements=None, scripts=False, detached=False):
+        """เพิ่ม element ทั้งหน้า หรือถ้ากำหนด fold/max_elements เฉพาะที่อยู่ก่อน element แรกที่ตรง fold
+        (element ของ <head> ไม่นับ ยกเว้น html/head เอง)
+        scripts=True: รวม element/class ที่ inline script และ on* attribute สร้าง และเนื้อหาของ <noscript>"""
+        fold_parts = [parts for parts in map(compile_selector, split_selectors(fold or '')) if parts]
+        stack = []
+        last_child = {}
+        rendered = 0
+        in_head = False
+        script_type = None
+        for token in _expand_noscript(tokenize(html)) if scripts else tokenize(html):
+            if token.kind == 'raw' and script_type is not None:
+                if script_type in ('', 'text/javascript', 'application/javascript', 'module'):
+                    self.add_script(token.raw)
+                script_type = None
+                continue
+            if token.kind == 'end':
+                script_type = None
+                for depth in range(len(stack) - 1, -1, -1):
+                    if stack[depth].tag == token.name:
+                        del stack[depth:]
+                        break
+                if token.name == 'head':
+                    in_head = False
+                continue
+            if token.kind != 'start':
+                continue
+            if scripts:
+                if token.name == 'script':
+                    script_type = (token.attr('type') or '').strip().lower()
+                for name, value, _, _ in token.attrs:
+                    if name.startswith('on') and value:
+                        self.add_script(value)
+            closes = IMPLIED_END_TAGS.get(token.name)
+            while closes and stack and stack[-1].tag in closes:
+                stack.pop()
+            parent = stack[-1] if stack else None
+            element, new = self.element(token, parent, last_child.get(id(parent)), detached and parent is None)
+            last_child[id(parent)] = element
+            if element.tag == 'head':
+                in_head = True
+            if not in_head or element.tag == 'head':
+                if element.tag not in NON_RENDERED_ELEMENTS and stack and any(e.tag == 'body' for e in stack):
+                    if any(_match_parts(parts, len(parts) - 1, element, True, ()) for parts in fold_parts):
+                        break
+                    rendered += 1
+                    if max_elements is not None and rendered > max_elements:
+                        break
+                if new:
+                    self.add(element)
+            if element.tag not in VOID_ELEMENTS and not token.self_closing:
+                stack.append(element)
+
+    def add_script(self, script):
+        """HTML ใน string/template literal เป็น element แบบ detached, คำอื่นใน string เป็น dynamic class"""
+        fragments, words = script_markup(script)
+        self.dynamic_classes.update(words)
+        for fragment in fragments:
+            self.add_html(fragment, detached=True)
+
+    def candidates(self, compound, safelist=()):
+        """element ที่อาจตรง compound นี้ (จากดัชนีที่เล็กที่สุด)"""
+        if compound.ids:
+            return self.by_id.get(compound.ids[0], ())
+        classes = [name for name in compound.classes if name not in safelist]
+        if classes:
+            return min((self.by_class.get(name, ()) for name in classes), key=len)
+        if compound.root:
+            return self.by_tag.get('html', ())
+        if compound.tag:
+            return self.by_tag.get(compound.tag, ())
+        return self.elements
+
+    def matches(self, selector, states=True, safelist=()):
+        """มี element ที่ตรง selector ไหม - อ่าน selector ไม่ออก = ตรง
+        states=False: selector ที่มี :hover/:focus/... ไม่ตรง (ใช้กับ critical CSS)
+        safelist: class ที่ถือว่ามีเสมอ (รวม dynamic_classes ที่ script ของหน้าเติม)"""
+        parts = compile_selector(selector)
+        if parts is None:
+            return True
+        if self.dynamic_classes:
+            key = (frozenset(safelist), len(self.dynamic_classes))
+            if key not in self._safelists:
+                self._safelists[key] = key[0] | self.dynamic_classes
+            safelist = self._safelists[key]
+        last = len(parts) - 1
+        return any(_match_parts(parts, last, element, states, safelist)
+                   for element in self.candidates(parts[last][1], safelist))
+
+
+def _expand_noscript(tokens):
+    """แท็กใน <noscript> เป็น token ปกติ (เบราว์เซอร์ที่ปิด JavaScript แสดงส่วนนี้)"""
+    for token in tokens:
+        if token.kind == 'raw' and token.name == 'noscript':
+            yield from tokenize(token.raw)
+        else:
+            yield token
+
+
+def _template_parts(body):
+    """template literal -> (ข้อความที่แทน ${...} ด้วยช่องว่าง, [นิพจน์ใน ${...}])"""
+    text = []
+    expressions = []
+    pos = 0
+    while True:
+        start = body.find('${', pos)
+        if start == -1:
+            text.append(body[pos:])
+            return ''.join(text), expressions
+        text.append(body[pos:start] + ' ')
+        depth = 1
+        end = start + 2
+        while end < len(body) and depth:
+            depth += {'{': 1, '}': -1}.get(body[end], 0)
+            end += 1
+        expressions.append(body[start + 2:end - 1])
+        pos = end
+
+
+def script_markup(script):
+    """HTML ที่ JavaScript สร้าง: (fragments, คำที่อาจเป็น class)
+    string ที่มีแท็ก = fragment, string อื่น (เช่น classList.add('active'), ' active') = คำ,
+    createElement('picture') = fragment <picture>"""
+    fragments = []
+    words = set()
+    for match in _JS_LITERAL_RE.finditer(script):
+        literal = match.group()
+        if literal.startswith('/'):
+            continue
+        if literal.startswith('`'):
+            text, expressions = _template_parts(literal[1:-1] if literal.endswith('`') else literal[1:])
+            for expression in expressions:
+                nested_fragments, nested_words = script_markup(expression)
+                fragments.extend(nested_fragments)
+                words.update(nested_words)
+        else:
+            closed = len(literal) > 1 and literal[-1] == literal[0]
+            text = re.sub(r'\\(.)', r'\1', literal[1:-1] if closed else literal[1:])
+        if _MARKUP_RE.search(text):
+            fragments.append(text)
+        else:
+            words.update(word for word in text.split() if _CLASS_WORD_RE.fullmatch(word))
+    fragments.extend(f'<{tag}>' for tag in _CREATE_ELEMENT_RE.findall(script))
+    return fragments, words
+
+
+def _font_families(block):
+    match = _FONT_FAMILY_RE.search(block)
+    if not match:
+        return []
+    return [name.strip().strip('"\'').lower() for name in match.group(1).split(',')]
+
+
+def filter_rules(rules, document, critical=False, safelist=()):
+    """กฎที่มี element ใน document ใช้ (selector list เหลือเฉพาะตัวที่ตรง)
+    critical=True: ตัด state selector, @media print, @keyframes, @import/@charset/@page
+    @font-face/@keyframes เหลือเฉพาะที่กฎที่เหลือใช้ชื่อ"""
+    kept = _filter(rules, document, critical, frozenset(safelist))
+    used = serialize(style_rules(kept)).lower()
+    return _drop_unreferenced(kept, used)
+
+
+def _filter(rules, document, critical, safelist):
+    kept = []
+    for rule in rules:
+        if isinstance(rule, StyleRule):
+            selectors = [selector for selector in rule.selectors
+                         if document.matches(selector, states=not critical, safelist=safelist)]
+            if selectors:
+                kept.append(rule if len(selectors) == len(rule.selectors) else StyleRule(selectors, rule.declarations))
+        elif rule.rules is not None:
+            if critical and rule.name == 'media' and re.match(r'@media\s+print\b', rule.prelude, re.I):
+                continue
+            children = _filter(rule.rules, document, critical, safelist)
+            if children:
+                kept.append(AtRule(rule.prelude, rules=children))
+            elif rule.name == 'layer' and not critical:
+                kept.append(AtRule(rule.prelude, rules=[]))
+        elif critical and rule.name in ('import', 'charset', 'page', 'keyframes', '-webkit-keyframes'):
+            continue
+        else:
+            kept.append(rule)
+    return kept
+
+
+def _walk(rules):
+    for rule in rules:
+        yield rule
+        if isinstance(rule, AtRule) and rule.rules:
+            yield from _walk(rule.rules)
+
+
+def style_rules(rules):
+    """StyleRule ทั้งหมด รวมที่ซ้อนใน @media/@supports"""
+    return (rule for rule in _walk(rules) if isinstance(rule, StyleRule))
+
+
+def _drop_unreferenced(rules, used):
+    kept = []
+    for rule in rules:
+        if isinstance(rule, AtRule):
+            if rule.name == 'font-face':
+                families = _font_families(rule.block or '')
+                if families and not any(family in used for family in families):
+                    continue
+            elif rule.name.endswith('keyframes'):
+                match = _ANIMATION_NAME_RE.match(rule.prelude)
+                if match and match.group(1).strip('"\'').lower() not in used:
+                    continue
+            elif rule.rules:
+                rule = AtRule(rule.prelude, rules=_drop_unreferenced(rule.rules, used))
+        kept.append(rule)
+    return kept
+
+
+def critical_css(html, stylesheets, fold=FOLD_SELECTOR, max_elements=ABOVE_FOLD_ELEMENTS, safelist=()):
+    """CSS ที่ element เหนือ fold ของหน้านี้ใช้ จาก stylesheets (ข้อความ CSS ตามลำดับที่ลิงก์) แบบ minify"""
+    document = DocumentIndex.from_html(html, fold=fold, max_elements=max_elements)
+    rules = [rule for css in stylesheets for rule in parse_stylesheet(css)]
+    return serialize(filter_rules(rules, document, critical=True, safelist=frozenset(safelist)))
+
+
+# ---------------------------------------------------------------- HTML
+
+def is_stylesheet_link(token):
+    """<link rel=stylesheet> สำหรับจอ หรือ preload ที่ inline_critical_css เลื่อนโหลดไว้แล้ว"""
+    rel = (token.attr('rel') or '').lower().split()
+    media = (token.attr('media') or 'all').strip().lower()
+    if media not in ('all', 'screen'):
+        return False
+    return 'stylesheet' in rel or ('preload' in rel and token.attr('onload') == DEFER_ONLOAD)
+
+
+def resolve_stylesheet(href, page_path):
+    """path ของไฟล์ CSS ที่ href ของหน้าชี้ (URL ภายนอก/absolute/ไม่มีไฟล์ = None)"""
+    if not href or re.match(r'^(?:[a-zA-Z][\w+.-]*:|/)', href):
+        return None
+    path = os.path.normpath(os.path.join(os.path.dirname(str(page_path)), re.split(r'[?#]', href)[0]))
+    return path if os.path.isfile(path) else None
+
+
+@lru_cache(maxsize=64)
+def _read_stylesheet(path, mtime_ns, size):
+    with open(path, 'r', encoding='utf-8') as f:
+        return f.read()
+
+
+def read_stylesheet(path):
+    stat = os.stat(path)
+    return _read_stylesheet(path, stat.st_mtime_ns, stat.st_size)
+
+
+def deferred_stylesheet_html(href):
+    """โหลด stylesheet โดยไม่ block render (ไม่มี JavaScript = <noscript> โหลดแบบปกติ)"""
+    quoted = html_lib.escape(href, quote=True)
+    return (f'<link rel="preload" href="{quoted}" as="style" onload="{DEFER_ONLOAD}">'
+            f'<noscript><link rel="stylesheet" href="{quoted}"></noscript>')
+
+
+def inlined_stylesheets(page_path, paths):
+    """เนื้อหา stylesheet ที่ url()/@import ปรับให้ถูกเมื่อ inline ไว้ในหน้า (หน้าใน car-detail/ ลิงก์ ../style.css)"""
+    page_dir = os.path.dirname(os.path.abspath(page_path))
+    return [rebase_urls(read_stylesheet(path), os.path.dirname(os.path.abspath(path)), page_dir) for path in paths]
+
+
+def inline_critical_css(html, page_path, fold=FOLD_SELECTOR, max_elements=ABOVE_FOLD_ELEMENTS, safelist=()):
+    """ใส่ critical CSS ของหน้าก่อน stylesheet แรกที่เป็นไฟล์ในเว็บ และเลื่อนโหลดไฟล์เหล่านั้น
+    stylesheet ภายนอก/ไม่มีไฟล์ไม่แตะ, critical เดิม (<style data-critical>) ถูกคำนวณใหม่"""
+    local = {}
+    for token in tokenize(html):
+        if token.kind == 'start' and token.name == 'link' and is_stylesheet_link(token):
+            path = resolve_stylesheet(token.attr('href'), page_path)
+            if path:
+                local.setdefault(token.attr('href'), path)
+    if not local:
+        return html
+
+    html = replace_elements(html, 'style', '', match=lambda token, text: token.has_attr(CRITICAL_ATTR))
+    css = critical_css(html, inlined_stylesheets(page_path, local.values()),
+                       fold=fold, max_elements=max_elements, safelist=safelist)
+    critical_block = f'<style {CRITICAL_ATTR}>{css}</style>' if css else ''
+
+    def defer(token):
+        nonlocal critical_block
+        rel = (token.attr('rel') or '').lower().split()
+        replacement = deferred_stylesheet_html(token.attr('href')) if 'stylesheet' in rel else token.raw
+        replacement, critical_block = critical_block + replacement, ''
+        return replacement
+
+    return replace_tags(html, 'link', defer,
+                        match=lambda token: is_stylesheet_link(token) and token.attr('href') in local)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="เครื่องมือ CSS สำหรับหน้าที่ generate แล้ว")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    critical_parser = subparsers.add_parser("critical", help="แสดง critical CSS ของหน้า (ไม่แก้ไฟล์)")
+    critical_parser.add_argument("page", help="ไฟล์ HTML")
+    critical_parser.add_argument("--fold", default=FOLD_SELECTOR, help="selector ของส่วนแรกที่อยู่ใต้ fold")
+    critical_parser.add_argument("--max-elements", type=int, default=ABOVE_FOLD_ELEMENTS,
+                                 help="จำนวน element เหนือ fold สูงสุด")
+    critical_parser.add_argument("--safelist", default="", help="class ที่ถือว่ามีเสมอ (คั่นด้วย comma)")
+    args = parser.parse_args()
+
+    with open(args.page, 'r', encoding='utf-8') as f:
+        html = f.read()
+    paths = []
+    for token in tokenize(html):
+        if token.kind == 'start' and token.name == 'link' and is_stylesheet_link(token):
+            path = resolve_stylesheet(token.attr('href'), args.page)
+            if path and path not in paths:
+                paths.append(path)
+    if not paths:
+        print("⚠️ หน้านี้ไม่มี stylesheet ที่เป็นไฟล์ในเว็บ", file=sys.stderr)
+        return 1
+    stylesheets = inlined_stylesheets(args.page, paths)
+    safelist = [name.strip() for name in args.safelist.split(',') if name.strip()]
+    css = critical_css(html, stylesheets, fold=args.fold, max_elements=args.max_elements, safelist=safelist)
+    print(css)
+    total = sum(len(serialize(parse_stylesheet(text))) for text in stylesheets)
+    print(f"🎨 critical {len(css):,} / {total:,} ไบต์ (minified) จาก {', '.join(paths)}", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,314 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+🛠️ HTML Rewrite Engine - แก้ไฟล์ HTML ที่ generate แล้วด้วยกฎหลายข้อในรอบเดียว
+
+- สคริปต์ update_*.py แต่ละตัวลงทะเบียนการแก้ของตัวเองเป็นกฎ (RULES)
+- อ่านแต่ละไฟล์ครั้งเดียว ผ่านทุกกฎที่ใช้กับไฟล์นั้นตามลำดับ แล้วเขียนกลับไม่เกินหนึ่งครั้ง (เฉพาะเมื่อเปลี่ยน)
+- ไฟล์กระจายไปทำบน process pool - เวลารวมขึ้นกับจำนวนไฟล์ ไม่ใช่จำนวนไฟล์ x จำนวนสคริปต์
+- ผลเท่ากับรันสคริปต์ทีละตัวตามลำดับใน RULE_MODULES
+- manifest เก็บ hash/ขนาด/mtime ของแต่ละไฟล์และเวอร์ชันกฎที่แก้ล่าสุด:
+  ไฟล์ที่ stat เท่าเดิมและกฎไม่เปลี่ยนถูกข้ามโดยไม่ต้องเปิดไฟล์ (stat เปลี่ยนแต่ hash เท่าเดิมก็ข้าม)
+  แก้ข้อมูลที่กฎใช้ (template/ข้อมูลติดต่อ) ต้องเพิ่ม version ของกฎ หรือรันด้วย --force
+
+การใช้งาน:
+    python html_rewrite.py                 # ทุกกฎของทุกสคริปต์
+    python html_rewrite.py --rules cta-css,cta-buttons
+    python html_rewrite.py --dry-run --diff
+    python html_rewrite.py --list
+"""
+
+import argparse
+import difflib
+import glob
+import hashlib
+import importlib
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from fnmatch import fnmatch, filter as fnmatch_filter
+from pathlib import Path
+
+# สคริปต์ที่มีกฎ เรียงตามลำดับที่เคยรันทีละตัว
+RULE_MODULES = [
+    "update_all_to_enterprise",
+    "update_car_detail_css",
+    "update_cta_buttons",
+    "update_cta_css",
+    "update_contact_info",
+]
+
+CAR_DETAIL_PAGES = ("car-detail/*.html",)
+
+# ไฟล์น้อยกว่านี้ทำใน process เดียว (ไม่คุ้มค่าเริ่ม pool)
+MIN_FILES_FOR_POOL = 8
+
+DEFAULT_MANIFEST = Path(".ssr-cache") / "rewrite-manifest.json"
+
+
+class Rule:
+    """กฎแก้ HTML หนึ่งข้อ: transform(content) -> content (คืนค่าเดิมถ้าไม่มีอะไรต้องแก้)
+    patterns/exclude เป็น glob ของ path เทียบกับโฟลเดอร์ root (เช่น docs)
+    transform ต้องเป็นฟังก์ชันระดับโมดูล (ส่งข้าม process ได้)
+    with_path=True: transform(content, path) สำหรับกฎที่อ่านไฟล์ข้างเคียงของหน้า (เช่น stylesheet ที่ลิงก์)
+    depends = glob (เทียบกับ root) ของไฟล์ที่กฎอ่าน - เนื้อหาไฟล์เหล่านั้นเป็นส่วนหนึ่งของเวอร์ชันกฎใน manifest"""
+
+    def __init__(self, name, transform, patterns=CAR_DETAIL_PAGES, exclude=(), version=1,
+                 with_path=False, depends=()):
+        self.name = name
+        self.transform = transform
+        self.patterns = tuple(patterns)
+        self.exclude = tuple(exclude)
+        self.version = version
+        self.with_path = with_path
+        self.depends = tuple(depends)
+
+    def applies(self, relative_path):
+        return (any(fnmatch(relative_path, pattern) for pattern in self.patterns)
+                and not any(fnmatch(relative_path, pattern) for pattern in self.exclude))
+
+    def __repr__(self):
+        return f"Rule({self.name!r}, v{self.version})"
+
+
+def load_rules(names=None):
+    """กฎจากทุกสคริปต์ใน RULE_MODULES ตามลำดับ (names = เลือกเฉพาะบางกฎ)"""
+    rules = []
+    for module_name in RULE_MODULES:
+        rules.extend(importlib.import_module(module_name).RULES)
+    if names:
+        unknown = set(names) - {rule.name for rule in rules}
+        if unknown:
+            raise ValueError(f"ไม่รู้จักกฎ: {', '.join(sorted(unknown))}")
+        rules = [rule for rule in rules if rule.name in names]
+    return rules
+
+
+def rule_tag(rule, root):
+    """name@version ของกฎ (+ hash ของไฟล์ใน depends เช่น stylesheet - แก้ไฟล์นั้นแล้วหน้าต้องผ่านกฎใหม่)"""
+    tag = f"{rule.name}@{rule.version}"
+    if rule.depends:
+        prefix = glob.escape(os.path.join(str(root), ""))
+        digest = hashlib.sha256()
+        for path in sorted({path for pattern in rule.depends for path in glob.glob(prefix + pattern)}):
+            digest.update(path.encode("utf-8") + b"\0")
+            with open(path, "rb") as f:
+                digest.update(f.read())
+        tag += f"+{digest.hexdigest()[:12]}"
+    return tag
+
+
+def rules_signature(tags):
+    """tag ของกฎที่ใช้กับไฟล์ ตามลำดับ - เปลี่ยนเมื่อไหร่ไฟล์ต้องผ่านกฎใหม่"""
+    return ",".join(tags)
+
+
+def apply_rules(content, rules, path=None):
+    """ผ่าน content ทุกกฎตามลำดับ คืนค่า (content ใหม่, ชื่อกฎที่เปลี่ยนไฟล์)"""
+    changed_by = []
+    for rule in rules:
+        updated = rule.transform(content, path) if rule.with_path else rule.transform(content)
+        if updated != content:
+            changed_by.append(rule.name)
+            content = updated
+    return content, changed_by
+
+
+_worker_rules = []
+
+
+def _init_worker(rules):
+    # ส่งกฎไป worker ครั้งเดียว งานแต่ละไฟล์ส่งแค่ path กับลำดับกฎ
+    global _worker_rules
+    _worker_rules = rules
+
+
+def rewrite_file(task):
+    """อ่าน -> ผ่านทุกกฎ -> เขียนกลับถ้าเปลี่ยน (รันใน worker process)
+    known_hash = hash ที่ผ่านกฎชุดนี้แล้ว (เนื้อหาเท่าเดิม = ไม่ต้องผ่านกฎซ้ำ)
+    dry_run = ไม่เขียนไฟล์, with_diff = แนบ unified diff ของสิ่งที่จะเปลี่ยน"""
+    path, rule_indexes, known_hash, dry_run, with_diff = task
+    result = {'path': path, 'changed_by': [], 'error': None, 'skipped': False, 'diff': None}
+    try:
+        # อ่าน/เขียนเป็น bytes - ไม่แปลงท้ายบรรทัด (CRLF คงเดิม) และ hash ตรงกับไฟล์จริง
+        with open(path, "rb") as f:
+            data = f.read()
+        digest = hashlib.sha256(data).hexdigest()
+        if digest == known_hash:
+            result['skipped'] = True
+        else:
+            content = data.decode("utf-8")
+            updated, changed_by = apply_rules(content, [_worker_rules[i] for i in rule_indexes], path)
+            result['changed_by'] = changed_by
+            if changed_by and with_diff:
+                result['diff'] = ''.join(difflib.unified_diff(
+                    content.splitlines(keepends=True), updated.splitlines(keepends=True),
+                    fromfile=path, tofile=f"{path} (ใหม่)"))
+            if changed_by and not dry_run:
+                data = updated.encode("utf-8")
+                digest = hashlib.sha256(data).hexdigest()
+                tmp_path = f"{path}.tmp"
+                with open(tmp_path, "wb") as f:
+                    f.write(data)
+                os.replace(tmp_path, path)
+        stat = os.stat(path)
+        result.update(sha256=digest, size=stat.st_size, mtime_ns=stat.st_mtime_ns)
+    except Exception as e:
+        result['error'] = str(e)
+    return result
+
+
+class HTMLRewriter:
+    def __init__(self, rules, root="docs", workers=None, manifest_file=DEFAULT_MANIFEST, force=False):
+        self.rules = list(rules)
+        self.root = Path(root)
+        self.workers = workers or os.cpu_count() or 1
+        self.manifest_file = Path(manifest_file) if manifest_file else None
+        # force = ไม่เชื่อ manifest ผ่านกฎทุกไฟล์ใหม่
+        self.force = force
+        self.manifest = self.load_manifest()
+
+    def load_manifest(self):
+        if not self.manifest_file:
+            return {}
+        try:
+            with open(self.manifest_file, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return {}
+
+    def save_manifest(self):
+        if not self.manifest_file:
+            return
+        self.manifest_file.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.manifest_file.with_suffix(".tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self.manifest, f, ensure_ascii=False, separators=(",", ":"))
+        os.replace(tmp_path, self.manifest_file)
+
+    def plan(self):
+        """[(path, [ลำดับกฎที่ใช้กับไฟล์])] ของทุกไฟล์ที่มีกฎอย่างน้อยหนึ่งข้อ
+        glob แต่ละ pattern ครั้งเดียว แล้วกรอง exclude ทั้งชุด (ไม่ fnmatch ทีละไฟล์ x ทีละกฎ)"""
+        prefix = os.path.join(str(self.root), "")
+        matches = {}
+        for pattern in {pattern for rule in self.rules for pattern in rule.patterns}:
+            found = glob.glob(glob.escape(prefix) + pattern)
+            matches[pattern] = {path[len(prefix):].replace(os.sep, "/") for path in found}
+        indexes_by_path = {}
+        for i, rule in enumerate(self.rules):
+            selected = set().union(*(matches[pattern] for pattern in rule.patterns))
+            for pattern in rule.exclude:
+                selected.difference_update(fnmatch_filter(selected, pattern))
+            for relative in selected:
+                indexes_by_path.setdefault(relative, []).append(i)
+        return [(prefix + relative, indexes_by_path[relative]) for relative in sorted(indexes_by_path)
+                if os.path.isfile(prefix + relative)]
+
+    def run(self, verbose=True, dry_run=False, diff=False):
+        """แก้ทุกไฟล์ในรอบเดียว คืนค่าผลต่อไฟล์ (dry_run = รายงานอย่างเดียว ไม่เขียนไฟล์/manifest)"""
+        started = time.perf_counter()
+        tasks = []
+        results = []
+        planned = self.plan()
+        tags = [rule_tag(rule, self.root) for rule in self.rules]
+        for path, indexes in planned:
+            signature = rules_signature([tags[i] for i in indexes])
+            entry = None if self.force else self.manifest.get(path)
+            if entry and signature not in entry['rules']:
+                entry = None
+            if entry:
+                stat = os.stat(path)
+                if stat.st_size == entry['size'] and stat.st_mtime_ns == entry['mtime_ns']:
+                    # ไม่ต้องเปิดไฟล์เลย
+                    results.append({'path': path, 'changed_by': [], 'error': None, 'skipped': True, 'diff': None})
+                    continue
+            tasks.append((path, indexes, entry['sha256'] if entry else None, dry_run, diff))
+
+        if len(tasks) < MIN_FILES_FOR_POOL or self.workers == 1:
+            _init_worker(self.rules)
+            results.extend(rewrite_file(task) for task in tasks)
+        else:
+            with ProcessPoolExecutor(max_workers=self.workers, initializer=_init_worker,
+                                     initargs=(self.rules,)) as executor:
+                results.extend(executor.map(rewrite_file, tasks, chunksize=max(1, len(tasks) // (self.workers * 4))))
+
+        if not dry_run:
+            self.update_manifest(tasks, results, {path for path, _ in planned}, tags)
+        elapsed = time.perf_counter() - started
+
+        if verbose:
+            self.report(results, elapsed, dry_run)
+        return results
+
+    def update_manifest(self, tasks, results, planned_paths, tags):
+        """บันทึก hash/stat หลังแก้ของไฟล์ที่เปิดในรอบนี้ และลบไฟล์ที่ไม่มีแล้ว
+        rules = ทุกชุดกฎที่ผ่านเนื้อหา hash นี้แล้วไม่เปลี่ยน (รันบางกฎสลับกับทุกกฎก็ยังข้ามได้)"""
+        indexes_by_path = {path: indexes for path, indexes, _, _, _ in tasks}
+        changed = False
+        for result in results:
+            indexes = indexes_by_path.get(result['path'])
+            if indexes is None or result['error']:
+                continue
+            signature = rules_signature([tags[i] for i in indexes])
+            previous = self.manifest.get(result['path'])
+            passed = previous['rules'] if previous and previous['sha256'] == result['sha256'] else []
+            self.manifest[result['path']] = {
+                'sha256': result['sha256'],
+                'size': result['size'],
+                'mtime_ns': result['mtime_ns'],
+                'rules': passed + [signature] if signature not in passed else passed,
+            }
+            changed = True
+        for path in [path for path in self.manifest if path not in planned_paths and not os.path.exists(path)]:
+            del self.manifest[path]
+            changed = True
+        if changed:
+            self.save_manifest()
+
+    def report(self, results, elapsed, dry_run=False):
+        changed = [r for r in results if r['changed_by']]
+        errors = [r for r in results if r['error']]
+        skipped = sum(1 for r in results if r['skipped'])
+        for result in changed:
+            if result['diff']:
+                print(result['diff'], end='' if result['diff'].endswith('\n') else '\n')
+            action = "จะแก้" if dry_run else "✅ อัปเดต:"
+            print(f"{action} {os.path.basename(result['path'])} ({', '.join(result['changed_by'])})")
+        for result in errors:
+            print(f"❌ ข้อผิดพลาดกับไฟล์ {result['path']}: {result['error']}")
+        per_rule = {}
+        for result in changed:
+            for name in result['changed_by']:
+                per_rule[name] = per_rule.get(name, 0) + 1
+        verb = "🔍 (dry run) จะแก้" if dry_run else "🛠️ แก้"
+        print(f"{verb} {len(changed)}/{len(results)} ไฟล์ด้วย {len(self.rules)} กฎ ใน {elapsed * 1000:.0f} ms"
+              f" (ข้ามตาม manifest {skipped}, ไม่เปลี่ยน {len(results) - len(changed) - len(errors) - skipped},"
+              f" ผิดพลาด {len(errors)})")
+        for rule in self.rules:
+            print(f"   - {rule.name}: {per_rule.get(rule.name, 0)} ไฟล์")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="แก้ไฟล์ HTML ด้วยกฎจากสคริปต์ update_*.py ทั้งหมดในรอบเดียว")
+    parser.add_argument("--root", default="docs", help="โฟลเดอร์เว็บที่ generate แล้ว")
+    parser.add_argument("--rules", default=None, help="เลือกเฉพาะบางกฎ คั่นด้วย ,")
+    parser.add_argument("--workers", type=int, default=None, help="จำนวน worker processes (ค่าเริ่มต้น = จำนวน CPU)")
+    parser.add_argument("--list", action="store_true", help="แสดงรายการกฎแล้วออก")
+    parser.add_argument("--dry-run", action="store_true", help="รายงานไฟล์ที่จะเปลี่ยน ไม่เขียนไฟล์")
+    parser.add_argument("--diff", action="store_true", help="แสดง unified diff ของสิ่งที่เปลี่ยน (ใช้คู่กับ --dry-run)")
+    parser.add_argument("--force", action="store_true", help="ไม่ใช้ manifest ผ่านกฎทุกไฟล์ใหม่")
+    parser.add_argument("--manifest", default=str(DEFAULT_MANIFEST), help="ไฟล์ manifest (hash/เวอร์ชันกฎของแต่ละไฟล์)")
+    args = parser.parse_args()
+
+    try:
+        selected = load_rules(args.rules.split(",") if args.rules else None)
+    except ValueError as e:
+        parser.error(str(e))
+    if args.list:
+        for rule in selected:
+            exclude = f" ยกเว้น {', '.join(rule.exclude)}" if rule.exclude else ""
+            print(f"{rule.name} v{rule.version}: {', '.join(rule.patterns)}{exclude}")
+    else:
+        HTMLRewriter(selected, root=args.root, workers=args.workers, manifest_file=args.manifest,
+                     force=args.force).run(dry_run=args.dry_run, diff=args.diff)
@@ -0,0 +1,374 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+🧩 HTML Tokens - tokenizer แบบ streaming สำหรับแก้ HTML ที่ generate แล้วโดยไม่ใช้ regex ทั้งไฟล์
+
+- แยก HTML เป็น token (text, comment, declaration, start, end, raw) ต่อกันกลับได้ไฟล์เดิมทุกไบต์
+- อ่านไปข้างหน้าอย่างเดียว ไม่ backtrack: เวลาเป็นเส้นตรงกับขนาดไฟล์แม้ input จะเพี้ยน
+  (แท็ก/quote/comment ที่ไม่ปิด = ส่วนที่เหลือทั้งหมดเป็น token เดียวแล้วจบ)
+- เนื้อหาของ script/style/textarea/title/noscript เป็น raw token เดียว (ไม่แยกแท็กข้างใน)
+- การแก้ระดับ element/attribute แก้เฉพาะช่วงของ token นั้น ส่วนอื่นของไฟล์ไม่เปลี่ยน
+  และรันซ้ำได้ผลเท่าเดิม (set-if-absent, แทน JSON-LD ตาม @type)
+
+ตรวจ tokenizer กับ input เพี้ยนแบบสุ่ม (lossless, idempotent, เวลาเป็นเส้นตรง):
+    python html_tokens.py fuzz --iterations 2000
+"""
+
+import argparse
+import html as html_lib
+import json
+import random
+import re
+import sys
+import time
+
+RAW_TEXT_ELEMENTS = {'script', 'style', 'textarea', 'title', 'noscript'}
+
+_SPACE_RE = re.compile(r'[ \t\n\r\f/]*')
+_TAG_NAME_RE = re.compile(r'[a-zA-Z][^ \t\n\r\f/>]*')
+_ATTR_NAME_RE = re.compile(r'[^ \t\n\r\f/>=]+|=')
+_WHITESPACE_RE = re.compile(r'[ \t\n\r\f]*')
+_UNQUOTED_RE = re.compile(r'[^ \t\n\r\f>]*')
+_raw_end_patterns = {}
+
+
+class Token:
+    """token หนึ่งตัว raw = ข้อความเดิมในไฟล์
+    start tag มี attrs = [(ชื่อตัวเล็ก, ค่าที่ decode แล้ว หรือ None, ตำแหน่งเริ่ม, ตำแหน่งจบ ใน raw)]"""
+
+    __slots__ = ('kind', 'raw', 'name', 'attrs', 'self_closing')
+
+    def __init__(self, kind, raw, name=None, attrs=None, self_closing=False):
+        self.kind = kind
+        self.raw = raw
+        self.name = name
+        self.attrs = attrs or []
+        self.self_closing = self_closing
+
+    def attr(self, name, default=None):
+        for attr_name, value, _, _ in self.attrs:
+            if attr_name == name:
+                return value if value is not None else ''
+        return default
+
+    def has_attr(self, name):
+        return any(attr_name == name for attr_name, _, _, _ in self.attrs)
+
+    def __repr__(self):
+        return f"Token({self.kind!r}, {self.raw[:40]!r})"
+
+
+def _raw_end_pattern(name):
+    if name not in _raw_end_patterns:
+        _raw_end_patterns[name] = re.compile(r'</' + re.escape(name) + r'(?=[ \t\n\r\f/>])', re.IGNORECASE)
+    return _raw_end_patterns[name]
+
+
+def _parse_start_tag(html, start):
+    """start tag ที่ตำแหน่ง start คืนค่า (Token, ตำแหน่งถัดไป) หรือ None ถ้าแท็กไม่ปิดจนจบไฟล์"""
+    n = len(html)
+    name_match = _TAG_NAME_RE.match(html, start + 1)
+    name = name_match.group().lower()
+    pos = name_match.end()
+    attrs = []
+    while True:
+        pos = _SPACE_RE.match(html, pos).end()
+        if pos >= n:
+            return None
+        if html[pos] == '>':
+            # "/" ก่อน ">" ที่ไม่ใช่ส่วนของค่า attribute (เช่น <a href=x/>)
+            last_end = start + attrs[-1][3] if attrs else name_match.end()
+            self_closing = html[pos - 1] == '/' and pos - 1 >= last_end
+            pos += 1
+            break
+        attr_start = pos
+        pos = _ATTR_NAME_RE.match(html, pos).end()
+        attr_name = html[attr_start:pos].lower()
+        value = None
+        after_name = _WHITESPACE_RE.match(html, pos).end()
+        if after_name < n and html[after_name] == '=':
+            value_start = _WHITESPACE_RE.match(html, after_name + 1).end()
+            if value_start >= n:
+                return None
+            quote = html[value_start]
+            if quote in '"\'':
+                close = html.find(quote, value_start + 1)
+                if close == -1:
+                    return None
+                value = html[value_start + 1:close]
+                pos = close + 1
+            else:
+                pos = _UNQUOTED_RE.match(html, value_start).end()
+                value = html[value_start:pos]
+            value = html_lib.unescape(value)
+        attrs.append((attr_name, value, attr_start - start, pos - start))
+    return Token('start', html[start:pos], name, attrs, self_closing), pos
+
+
+def tokenize(html):
+    """แยก HTML เป็น token ตามลำดับ (generator) - ''.join(t.raw) == html เสมอ"""
+    n = len(html)
+    pos = 0
+    while pos < n:
+        lt = html.find('<', pos)
+        if lt == -1:
+            yield Token('text', html[pos:])
+            return
+        if lt > pos:
+            yield Token('text', html[pos:lt])
+
+        if html.startswith('<!--', lt):
+            end = html.find('-->', lt + 4)
+            end = n if end == -1 else end + 3
+            yield Token('comment', html[lt:end])
+            pos = end
+        elif html.startswith('<!', lt) or html.startswith('<?', lt):
+            end = html.find('>', lt + 2)
+            end = n if end == -1 else end + 1
+            yield Token('declaration', html[lt:end])
+            pos = end
+        elif html.startswith('</', lt) and _TAG_NAME_RE.match(html, lt + 2):
+            end = html.find('>', lt + 2)
+            if end == -1:
+                yield Token('text', html[lt:])
+                return
+            name = _TAG_NAME_RE.match(html, lt + 2).group().lower()
+            yield Token('end', html[lt:end + 1], name)
+            pos = end + 1
+        elif _TAG_NAME_RE.match(html, lt + 1):
+            parsed = _parse_start_tag(html, lt)
+            if parsed is None:
+                yield Token('text', html[lt:])
+                return
+            token, pos = parsed
+            yield token
+            # HTML ไม่สนใจ "/>" ของ script/style - เนื้อหาตามมาเสมอ
+            if token.name in RAW_TEXT_ELEMENTS:
+                match = _raw_end_pattern(token.name).search(html, pos)
+                raw_end = match.start() if match else n
+                if raw_end > pos:
+                    yield Token('raw', html[pos:raw_end], token.name)
+                pos = raw_end
+        else:
+            # '<' ที่ไม่ใช่แท็ก (เช่น "a < b") เป็นข้อความธรรมดา
+            yield Token('text', '<')
+            pos = lt + 1
+
+
+def serialize(tokens):
+    return ''.join(token.raw for token in tokens)
+
+
+def _quote(value):
+    return '"' + value.replace('&', '&amp;').replace('"', '&quot;') + '"'
+
+
+def with_attribute(token, name, value):
+    """raw ของ start tag ที่ตั้ง attribute name=value (แทนค่าเดิม หรือเติมท้ายแท็ก)"""
+    for attr_name, _, start, end in token.attrs:
+        if attr_name == name:
+            return token.raw[:start] + f'{name}={_quote(value)}' + token.raw[end:]
+    insert_at = len(token.raw) - (2 if token.self_closing else 1)
+    separator = '' if token.raw[insert_at - 1] in ' \t\n\r\f' else ' '
+    return token.raw[:insert_at] + f'{separator}{name}={_quote(value)}' + token.raw[insert_at:]
+
+
+def _matches(token, tag, match):
+    return token.kind == 'start' and token.name == tag and (match is None or match(token))
+
+
+def set_attribute(html, tag, name, value, match=None):
+    """ตั้ง attribute ของทุกแท็ก tag ที่ผ่าน match(token) (แทนค่าเดิม)"""
+    out = []
+    for token in tokenize(html):
+        if _matches(token, tag, match) and token.attr(name) != value:
+            out.append(with_attribute(token, name, value))
+        else:
+            out.append(token.raw)
+    return ''.join(out)
+
+
+def set_attribute_if_absent(html, tag, name, value, match=None):
+    """เติม attribute ให้แท็กที่ยังไม่มี - แท็กที่มีแล้ว (ค่าอะไรก็ตาม) ไม่แตะ รันซ้ำไม่เพิ่มซ้ำ"""
+    out = []
+    for token in tokenize(html):
+        if _matches(token, tag, match) and not token.has_attr(name):
+            out.append(with_attribute(token, name, value))
+        else:
+            out.append(token.raw)
+    return ''.join(out)
+
+
+def replace_tags(html, tag, replacement, match=None, count=None):
+    """แทนแท็กเปิด/void tag (เช่น <link>, <meta>) ที่ผ่าน match(token)
+    replacement = ข้อความ หรือฟังก์ชัน token -> ข้อความ, count = แทนไม่เกินกี่แท็ก"""
+    out = []
+    replaced = 0
+    for token in tokenize(html):
+        if (count is None or replaced < count) and _matches(token, tag, match):
+            out.append(replacement(token) if callable(replacement) else replacement)
+            replaced += 1
+        else:
+            out.append(token.raw)
+    return ''.join(out)
+
+
+def replace_elements(html, tag, replacement, match=None):
+    """แทนทั้ง element ของ raw-text tag (script/style/noscript...) ที่ผ่าน match(token, เนื้อหา)
+    replacement = ข้อความ หรือฟังก์ชัน (token, เนื้อหา) -> ข้อความ"""
+    if tag not in RAW_TEXT_ELEMENTS:
+        raise ValueError(f"replace_elements ใช้ได้กับ {sorted(RAW_TEXT_ELEMENTS)} เท่านั้น")
+    tokens = list(tokenize(html))
+    out = []
+    i = 0
+    while i < len(tokens):
+        token = tokens[i]
+        if token.kind == 'start' and token.name == tag:
+            # start, [raw], end - ไม่มี end (ไม่ปิดจนจบไฟล์) ไม่แตะ
+            j = i + 1
+            text = ''
+            if j < len(tokens) and tokens[j].kind == 'raw':
+                text = tokens[j].raw
+                j += 1
+            if j < len(tokens) and tokens[j].kind == 'end' and tokens[j].name == tag:
+                if match is None or match(token, text):
+                    out.append(replacement(token, text) if callable(replacement) else replacement)
+                else:
+                    out.append(serialize(tokens[i:j + 1]))
+                i = j + 1
+                continue
+        out.append(token.raw)
+        i += 1
+    return ''.join(out)
+
+
+def insert_before_end_tag(html, tag, snippet):
+    """แทรก snippet ก่อน </tag> ตัวแรก (ไม่มีก็คืนค่าเดิม)"""
+    pos = 0
+    for token in tokenize(html):
+        if token.kind == 'end' and token.name == tag:
+            return html[:pos] + snippet + html[pos:]
+        pos += len(token.raw)
+    return html
+
+
+def _is_json_ld(token):
+    return (token.attr('type') or '').strip().lower() == 'application/ld+json'
+
+
+def json_ld_types(text):
+    """@type ทั้งหมดในบล็อก JSON-LD (อ่านไม่ได้ = ว่าง)"""
+    try:
+        data = json.loads(text)
+    except ValueError:
+        return set()
+    types = set()
+    for item in data if isinstance(data, list) else [data]:
+        if isinstance(item, dict):
+            value = item.get('@type')
+            types.update(value if isinstance(value, list) else [value])
+    return types
+
+
+def replace_json_ld(html, schema_type, data, insert_before='head'):
+    """แทนเนื้อหาบล็อก JSON-LD ที่มี @type = schema_type ด้วย data (เพิ่มก่อน </insert_before> ถ้าไม่มี)
+    เขียน JSON แบบเดิมทุกครั้ง ข้อมูลเท่าเดิม = ไฟล์เท่าเดิม"""
+    body = '\n' + json.dumps(data, ensure_ascii=False, indent=2) + '\n'
+    found = []
+
+    def replace(token, text):
+        found.append(token)
+        return token.raw + body + f'</{token.name}>'
+
+    updated = replace_elements(html, 'script', replace,
+                               match=lambda token, text: _is_json_ld(token) and schema_type in json_ld_types(text))
+    if found:
+        return updated
+    return insert_before_end_tag(html, insert_before, f'<script type="application/ld+json">{body}</script>\n')
+
+
+# ---------- fuzz ----------
+
+FUZZ_FRAGMENTS = [
+    '<', '>', '</', '/>', '<!--', '-->', '<!', '<?', '"', "'", '=', ' ', '\n', 'a', 'div', 'img', 'script',
+    '<img', '<img src=x', ' onerror="x"', "<a href='", '<script>', '</script>', '<style>', '</style',
+    '<script type="application/ld+json">', '{"@type": "LocalBusiness"}', '</head>', '&amp;', '&quot;',
+    '<p class=a b=c>', '<br/>', '<SCRIPT>', '</SCRIPT >', 'ก', '😀',
+]
+
+# input ที่ทำให้ regex แบบเดิม backtrack หนัก
+PATHOLOGICAL_PATTERNS = [
+    '<img a="',
+    '<',
+    '<!--',
+    '<a x=y ',
+    '<script type="application/ld+json">{"@type": "LocalBusiness", "a": "',
+    '{"@type": "LocalBusiness"',
+    '</',
+]
+
+
+def _check(html, failures):
+    if serialize(tokenize(html)) != html:
+        failures.append(('lossless', html))
+        return
+    once = set_attribute_if_absent(html, 'img', 'onerror', "this.style.display='none'")
+    if set_attribute_if_absent(once, 'img', 'onerror', "this.style.display='none'") != once:
+        failures.append(('idempotent set_attribute_if_absent', html))
+    schema = {'@context': 'https://schema.org', '@type': 'LocalBusiness', 'name': 'ทดสอบ'}
+    once = replace_json_ld(html, 'LocalBusiness', schema)
+    if replace_json_ld(once, 'LocalBusiness', schema) != once:
+        failures.append(('idempotent replace_json_ld', html))
+
+
+def _time_rewrite(html, repeat=3):
+    durations = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        set_attribute_if_absent(html, 'img', 'onerror', "this.style.display='none'")
+        replace_json_ld(html, 'LocalBusiness', {'@type': 'LocalBusiness'})
+        durations.append(time.perf_counter() - started)
+    return min(durations)
+
+
+def fuzz(iterations, seed, max_length, scale):
+    """สุ่ม input เพี้ยน ตรวจ lossless/idempotent แล้ววัดว่าเวลาโตเป็นเส้นตรงกับ input แบบ pathological"""
+    rng = random.Random(seed)
+    failures = []
+    for _ in range(iterations):
+        html = ''.join(rng.choice(FUZZ_FRAGMENTS) for _ in range(rng.randint(0, max_length)))
+        _check(html, failures)
+    print(f"🎲 สุ่ม {iterations} input (seed {seed}): ผิดพลาด {len(failures)}")
+    for kind, html in failures[:5]:
+        print(f"   ❌ {kind}: {html[:200]!r}")
+
+    slow = []
+    for pattern in PATHOLOGICAL_PATTERNS:
+        small = pattern * scale
+        large = pattern * (scale * 8)
+        _check(small, failures)
+        small_seconds = max(_time_rewrite(small), 1e-4)
+        large_seconds = _time_rewrite(large)
+        ratio = large_seconds / small_seconds
+        # ขนาด 8 เท่า: เส้นตรง ~8 เท่า, กำลังสองจะ ~64 เท่า
+        status = "✅" if ratio < 24 else "❌"
+        if ratio >= 24:
+            slow.append(pattern)
+        print(f"   {status} {pattern[:30]!r} x{scale}: {small_seconds * 1000:.1f} ms,"
+              f" x{scale * 8}: {large_seconds * 1000:.1f} ms ({ratio:.1f} เท่า)")
+    return not failures and not slow
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="HTML tokenizer สำหรับ rewrite rules")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    fuzz_parser = subparsers.add_parser("fuzz", help="ตรวจ tokenizer/การแก้กับ input สุ่มและ pathological")
+    fuzz_parser.add_argument("--iterations", type=int, default=2000, help="จำนวน input สุ่ม")
+    fuzz_parser.add_argument("--seed", type=int, default=0, help="seed ของการสุ่ม")
+    fuzz_parser.add_argument("--max-length", type=int, default=60, help="จำนวน fragment สูงสุดต่อ input")
+    fuzz_parser.add_argument("--scale", type=int, default=2000, help="จำนวนครั้งที่ซ้ำ pattern pathological (ชุดเล็ก)")
+    args = parser.parse_args()
+
+    ok = fuzz(args.iterations, args.seed, args.max_length, args.scale)
+    print("✅ ผ่านทั้งหมด" if ok else "❌ มีกรณีที่ไม่ผ่าน")
+    sys.exit(0 if ok else 1)
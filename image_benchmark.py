@@ -0,0 +1,413 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+⏱️ Image Pipeline Benchmark - วัดความเร็วระบบรูปภาพบนเครื่องนี้ ผลเป็น JSON
+
+- ชุดรูปทดสอบ: รูปสังเคราะห์ขนาดเท่ารูปรถจริง (กล้อง/มือถือ) + รูป JPEG ตัวอย่าง (--samples)
+- วัดแยกขั้น: decode, resize (ทุกความกว้างของ variant), encode ต่อ format ต่อ quality
+- วัด throughput ของ render_variant บน process pool ตั้งแต่ 1 worker ถึงทุก core
+- วัด ImageOptimizer ทั้งเส้นทาง: cold (แคชว่าง) และ warm (แคชเต็ม แต่ทุกงานถูกหยิบใหม่)
+  รูปเสิร์ฟจาก HTTP server ในเครื่อง ทุกอย่างรันในโฟลเดอร์ชั่วคราว ไม่แตะแคชจริงของโปรเจค
+- ผลใช้เลือกจำนวน workers และ format/quality ที่เหมาะกับฮาร์ดแวร์
+
+การใช้งาน:
+    python image_benchmark.py --output benchmark.json
+    python image_benchmark.py --samples .image-cache/objects --workers 1,2,4 --skip-optimizer
+"""
+
+import argparse
+import contextlib
+import functools
+import io
+import json
+import os
+import platform
+import random
+import shutil
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+from optimize_images import (FORMAT_SETTINGS, ImageOptimizer, avif_supported, render_variant,
+                             variant_settings, variant_widths)
+
+try:
+    from PIL import Image, ImageDraw, ImageFilter, ImageOps
+    import PIL
+except ImportError:  # pragma: no cover - ต้องติดตั้ง pillow
+    Image = None
+
+# ขนาดรูปรถที่เจอจริง: กล้องลงประกาศ, DSLR ย่อแล้ว, มือถือเต็มขนาด
+CORPUS_SIZES = [(1024, 768), (1600, 1200), (2048, 1536), (4032, 3024)]
+
+# quality ที่ทดสอบต่อ format (ค่ากลางคือค่าที่ใช้จริงใน FORMAT_SETTINGS)
+BENCHMARK_QUALITIES = {
+    'jpg': [70, FORMAT_SETTINGS['jpg']['quality'], 90],
+    'webp': [60, FORMAT_SETTINGS['webp']['quality'], 90],
+    'avif': [40, FORMAT_SETTINGS['avif']['quality'], 70],
+}
+
+# จำนวน workers ที่แนะนำ = น้อยสุดที่ได้ throughput อย่างน้อยเท่านี้ของค่าสูงสุด
+RECOMMENDED_WORKERS_RATIO = 0.95
+
+
+def log(message):
+    """ข้อความความคืบหน้าไป stderr (stdout เก็บไว้สำหรับ JSON)"""
+    print(message, file=sys.stderr, flush=True)
+
+
+def synthetic_car_photo(size, seed):
+    """รูปสังเคราะห์ที่บีบอัดได้ใกล้เคียงรูปถ่ายจริง: ท้องฟ้าไล่สี, พื้น, ตัวรถ, ขอบคม และ noise ของเซนเซอร์"""
+    rng = random.Random(seed)
+    width, height = size
+    horizon = int(height * rng.uniform(0.45, 0.6))
+    sky_top = tuple(rng.randint(90, 200) for _ in range(3))
+    sky_bottom = tuple(min(255, c + rng.randint(30, 60)) for c in sky_top)
+    ground = tuple(rng.randint(60, 140) for _ in range(3))
+
+    gradient = Image.linear_gradient('L').resize((width, horizon))
+    image = Image.new('RGB', size, ground)
+    image.paste(Image.composite(Image.new('RGB', (width, horizon), sky_bottom),
+                                Image.new('RGB', (width, horizon), sky_top), gradient), (0, 0))
+
+    draw = ImageDraw.Draw(image)
+    for _ in range(rng.randint(8, 14)):
+        # ฉากหลัง (ต้นไม้/อาคาร/รถคันอื่น)
+        x, y = rng.randint(0, width), rng.randint(int(horizon * 0.6), horizon)
+        w, h = rng.randint(width // 20, width // 5), rng.randint(height // 20, height // 4)
+        draw.rectangle((x, y - h, x + w, y), fill=tuple(rng.randint(20, 200) for _ in range(3)))
+    body = tuple(rng.randint(0, 255) for _ in range(3))
+    left, right = int(width * rng.uniform(0.1, 0.25)), int(width * rng.uniform(0.75, 0.9))
+    bottom = int(height * rng.uniform(0.75, 0.85))
+    roof = bottom - int(height * 0.28)
+    draw.rounded_rectangle((left, bottom - int(height * 0.16), right, bottom), radius=height // 30, fill=body)
+    draw.polygon([(left + (right - left) // 5, bottom - int(height * 0.16)), (left + (right - left) // 3, roof),
+                  (right - (right - left) // 4, roof), (right - (right - left) // 8, bottom - int(height * 0.16))],
+                 fill=body)
+    for wheel_x in (left + (right - left) // 5, right - (right - left) // 5):
+        radius = height // 14
+        draw.ellipse((wheel_x - radius, bottom - radius, wheel_x + radius, bottom + radius), fill=(25, 25, 25))
+    image = image.filter(ImageFilter.GaussianBlur(1.2))
+
+    # noise ทำให้ได้ ~1.5-2 บิต/พิกเซลที่ quality 92 ใกล้เคียงรูปประกาศจริง
+    noise = Image.effect_noise(size, rng.uniform(30, 50)).convert('RGB')
+    return Image.blend(image, noise, 0.1)
+
+
+def build_corpus(corpus_dir, per_size, sample_paths):
+    """เขียนรูปสังเคราะห์เป็น JPEG (quality เท่ากล้อง) แล้วคัดลอกรูปตัวอย่าง คืนค่ารายการรูป"""
+    corpus_dir.mkdir(parents=True, exist_ok=True)
+    corpus = []
+    seed = 0
+    for size in CORPUS_SIZES:
+        for _ in range(per_size):
+            seed += 1
+            path = corpus_dir / f"synthetic-{size[0]}x{size[1]}-{seed}.jpg"
+            synthetic_car_photo(size, seed).save(path, 'JPEG', quality=92)
+            corpus.append({'path': path, 'kind': 'synthetic'})
+    for index, sample in enumerate(sample_paths):
+        path = corpus_dir / f"sample-{index}{sample.suffix.lower()}"
+        shutil.copyfile(sample, path)
+        corpus.append({'path': path, 'kind': 'sample'})
+    for entry in corpus:
+        with Image.open(entry['path']) as image:
+            entry['width'], entry['height'] = ImageOps.exif_transpose(image).size
+        entry['bytes'] = entry['path'].stat().st_size
+    return corpus
+
+
+def find_samples(paths, limit):
+    """ไฟล์ JPEG ใน path ที่ระบุ (ไฟล์หรือโฟลเดอร์ ค้นลึก) ที่เปิดได้จริง"""
+    samples = []
+    for root in paths:
+        root = Path(root)
+        candidates = [root] if root.is_file() else sorted(p for p in root.rglob('*') if p.is_file())
+        for path in candidates:
+            if len(samples) >= limit:
+                return samples
+            try:
+                with Image.open(path) as image:
+                    if image.format == 'JPEG':
+                        samples.append(path)
+            except Exception:
+                continue
+    return samples
+
+
+def timed(func, repeat):
+    """เวลามัธยฐาน (มิลลิวินาที) และผลลัพธ์ของครั้งสุดท้าย"""
+    durations = []
+    result = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = func()
+        durations.append((time.perf_counter() - started) * 1000)
+    return statistics.median(durations), result
+
+
+def summarize(samples):
+    """รวมผลหลายรูป: ms เฉลี่ย, ms ต่อเมกะพิกเซล (ใช้เทียบรูปต่างขนาด)"""
+    total_ms = sum(ms for ms, _ in samples)
+    total_mp = sum(mp for _, mp in samples)
+    return {
+        'count': len(samples),
+        'ms_mean': round(total_ms / len(samples), 3),
+        'ms_per_megapixel': round(total_ms / total_mp, 3) if total_mp else None,
+    }
+
+
+def decode(path):
+    with Image.open(path) as original:
+        image = ImageOps.exif_transpose(original)
+        image.load()
+        return image.convert('RGB') if image.mode != 'RGB' else image
+
+
+def encode(image, fmt, quality):
+    settings = variant_settings(fmt, quality)
+    save_format = settings.pop('format')
+    buffer = io.BytesIO()
+    image.save(buffer, save_format, **settings)
+    return buffer.tell()
+
+
+def benchmark_stages(corpus, formats, repeat):
+    """decode / resize / encode แยกขั้นใน process เดียว"""
+    decode_samples = []
+    resize_samples = {}
+    encode_samples = {}
+    for entry in corpus:
+        source_mp = entry['width'] * entry['height'] / 1e6
+        ms, image = timed(functools.partial(decode, entry['path']), repeat)
+        decode_samples.append((ms, source_mp))
+
+        for width in variant_widths(image.size):
+            height = max(1, round(image.height * width / image.width))
+            if (width, height) == image.size:
+                # ความกว้างเท่าต้นฉบับ render_variant ไม่ resize
+                resized = image
+            else:
+                ms, resized = timed(functools.partial(image.resize, (width, height), Image.LANCZOS), repeat)
+                # เวลา resize ขึ้นกับขนาดต้นฉบับ (ต้องอ่านทุกพิกเซล)
+                resize_samples.setdefault(width, []).append((ms, source_mp))
+
+            output_mp = width * height / 1e6
+            for fmt in formats:
+                for quality in BENCHMARK_QUALITIES[fmt]:
+                    ms, size = timed(functools.partial(encode, resized, fmt, quality), repeat)
+                    encode_samples.setdefault((fmt, quality), []).append((ms, output_mp, size, width * height))
+        log(f"   - {entry['path'].name}: decode/resize/encode เสร็จ")
+
+    encode_results = {}
+    for (fmt, quality), samples in sorted(encode_samples.items()):
+        summary = summarize([(ms, mp) for ms, mp, _, _ in samples])
+        summary['bytes_mean'] = round(sum(size for _, _, size, _ in samples) / len(samples))
+        summary['bits_per_pixel'] = round(8 * sum(size for _, _, size, _ in samples)
+                                          / sum(pixels for _, _, _, pixels in samples), 4)
+        encode_results.setdefault(fmt, {})[str(quality)] = summary
+    return {
+        'decode': summarize(decode_samples),
+        'resize': {str(width): summarize(samples) for width, samples in sorted(resize_samples.items())},
+        'encode': encode_results,
+    }
+
+
+def worker_counts(requested):
+    cores = os.cpu_count() or 1
+    if requested:
+        return sorted({int(n) for n in requested.split(',') if int(n) > 0})
+    counts = []
+    n = 1
+    while n < cores:
+        counts.append(n)
+        n *= 2
+    return counts + [cores]
+
+
+def benchmark_workers(corpus, formats, counts, work_dir):
+    """render_variant ของทุกรูปทุกความกว้างบน process pool ขนาดต่างๆ (ไม่มีแคช)"""
+    results = []
+    for workers in counts:
+        output_dir = work_dir / f"workers-{workers}"
+        tasks = []
+        for entry in corpus:
+            for width in variant_widths((entry['width'], entry['height'])):
+                name = f"{entry['path'].stem}_{width}w"
+                tasks.append({
+                    'source': str(entry['path']),
+                    'size_name': f"{width}w",
+                    'width': width,
+                    'formats': formats,
+                    'outputs': {fmt: str(output_dir / f"{name}.{fmt}") for fmt in formats},
+                })
+        started = time.perf_counter()
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            # รวมเวลาเริ่ม pool ด้วย เหมือนการรันจริง
+            rendered = list(executor.map(render_variant, tasks))
+        elapsed = time.perf_counter() - started
+        shutil.rmtree(output_dir, ignore_errors=True)
+
+        images_per_second = len(corpus) / elapsed
+        results.append({
+            'workers': workers,
+            'seconds': round(elapsed, 3),
+            'variants': len(rendered),
+            'images_per_second': round(images_per_second, 3),
+            'images_per_second_per_worker': round(images_per_second / workers, 3),
+            'task_seconds_mean': round(statistics.mean(r['seconds'] for r in rendered), 4),
+        })
+        log(f"   - {workers} workers: {images_per_second:.2f} รูป/วินาที ({elapsed:.2f} วินาที)")
+    return results
+
+
+class QuietHandler(SimpleHTTPRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+
+@contextlib.contextmanager
+def serve_directory(directory):
+    """HTTP server ในเครื่องสำหรับให้ ImageOptimizer ดาวน์โหลดรูปทดสอบ"""
+    server = ThreadingHTTPServer(('127.0.0.1', 0), functools.partial(QuietHandler, directory=str(directory)))
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        yield f"http://127.0.0.1:{server.server_address[1]}"
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+def run_optimizer(formats, workers):
+    """generate_variants หนึ่งรอบ (ในโฟลเดอร์ปัจจุบัน) คืนค่าเวลาและสถิติแคช"""
+    started = time.perf_counter()
+    # log ของ optimizer ไป stderr ไม่ปน JSON
+    with contextlib.redirect_stdout(sys.stderr):
+        optimizer = ImageOptimizer()
+        results = optimizer.generate_variants(formats=formats, workers=workers)
+    elapsed = time.perf_counter() - started
+    stats = {
+        'seconds': round(elapsed, 3),
+        'variants': len(results),
+        'variants_from_cache': sum(1 for r in results if r.get('cached')),
+        'cache_hits': optimizer.cache.stats['hits'],
+        'cache_misses': optimizer.cache.stats['misses'],
+    }
+    optimizer.jobs.close()
+    optimizer.cache.close()
+    return stats
+
+
+def benchmark_optimizer(corpus, formats, workers, work_dir):
+    """ImageOptimizer ทั้งเส้นทาง (ดาวน์โหลด -> แคช -> process pool -> docs)
+    cold = แคชว่าง, warm = แคชเดิมแต่ล้างคิวงาน ทุกรูปถูกหยิบใหม่และต้องเช็คแคชทุก variant"""
+    project_dir = work_dir / "project"
+    project_dir.mkdir()
+    previous_dir = os.getcwd()
+    with serve_directory(corpus[0]['path'].parent) as base_url:
+        cars = [{'handle': entry['path'].stem, 'title': entry['path'].stem,
+                 'images': [f"{base_url}/{entry['path'].name}"]} for entry in corpus]
+        (project_dir / "cars.json").write_text(json.dumps(cars), encoding="utf-8")
+        os.chdir(project_dir)
+        try:
+            log("   - cold cache")
+            cold = run_optimizer(formats, workers)
+            (project_dir / ".image-cache" / "jobs.sqlite3").unlink()
+            log("   - warm cache")
+            warm = run_optimizer(formats, workers)
+        finally:
+            os.chdir(previous_dir)
+    for stats in (cold, warm):
+        stats['images_per_second'] = round(len(corpus) / stats['seconds'], 3)
+    return {'workers': workers, 'cold': cold, 'warm': warm,
+            'warm_speedup': round(cold['seconds'] / warm['seconds'], 2) if warm['seconds'] else None}
+
+
+def recommend(report):
+    """จำนวน workers ที่คุ้มสุด และ format/quality ที่ encode เร็ว/เล็กสุดต่อเมกะพิกเซล"""
+    recommendation = {}
+    if report.get('workers'):
+        best = max(r['images_per_second'] for r in report['workers'])
+        recommendation['workers'] = min(r['workers'] for r in report['workers']
+                                        if r['images_per_second'] >= best * RECOMMENDED_WORKERS_RATIO)
+    encode_results = report['stages']['encode']
+    recommendation['formats'] = {
+        fmt: {
+            'quality': FORMAT_SETTINGS[fmt]['quality'],
+            'ms_per_megapixel': by_quality[str(FORMAT_SETTINGS[fmt]['quality'])]['ms_per_megapixel'],
+            'bits_per_pixel': by_quality[str(FORMAT_SETTINGS[fmt]['quality'])]['bits_per_pixel'],
+        }
+        for fmt, by_quality in encode_results.items()
+    }
+    return recommendation
+
+
+def main():
+    parser = argparse.ArgumentParser(description="วัดความเร็วระบบรูปภาพ (decode/resize/encode, workers, แคช) เป็น JSON")
+    parser.add_argument("--output", default=None, help="ไฟล์ JSON ผลลัพธ์ (ค่าเริ่มต้น = stdout)")
+    parser.add_argument("--per-size", type=int, default=2, help="จำนวนรูปสังเคราะห์ต่อขนาด")
+    parser.add_argument("--samples", nargs="*", default=[], help="ไฟล์/โฟลเดอร์ JPEG ตัวอย่าง (เช่น .image-cache/objects)")
+    parser.add_argument("--max-samples", type=int, default=8, help="จำนวนรูปตัวอย่างสูงสุด")
+    parser.add_argument("--formats", default=None, help="format ที่วัด คั่นด้วย , (ค่าเริ่มต้น = ทุก format ที่รองรับ)")
+    parser.add_argument("--workers", default=None, help="จำนวน workers ที่วัด คั่นด้วย , (ค่าเริ่มต้น = 1, 2, 4 ... ถึงทุก core)")
+    parser.add_argument("--repeat", type=int, default=3, help="จำนวนครั้งต่อการวัดแยกขั้น (ใช้ค่ามัธยฐาน)")
+    parser.add_argument("--skip-workers", action="store_true", help="ไม่วัด throughput ตามจำนวน workers")
+    parser.add_argument("--skip-optimizer", action="store_true", help="ไม่วัด ImageOptimizer cold/warm")
+    args = parser.parse_args()
+
+    if Image is None:
+        log("❌ ต้องติดตั้ง pillow ก่อน: pip install pillow")
+        sys.exit(1)
+
+    supported = [fmt for fmt in FORMAT_SETTINGS if fmt != 'avif' or avif_supported()]
+    formats = [fmt for fmt in args.formats.split(',') if fmt in supported] if args.formats else supported
+    counts = worker_counts(args.workers)
+
+    work_dir = Path(tempfile.mkdtemp(prefix="image-benchmark-"))
+    try:
+        log("🧪 สร้างชุดรูปทดสอบ...")
+        corpus = build_corpus(work_dir / "corpus", args.per_size, find_samples(args.samples, args.max_samples))
+        if not corpus:
+            log("❌ ไม่มีรูปทดสอบ (--per-size 0 และไม่พบ JPEG ใน --samples)")
+            sys.exit(1)
+        report = {
+            'machine': {
+                'cpu_count': os.cpu_count(),
+                'platform': platform.platform(),
+                'python': platform.python_version(),
+                'pillow': PIL.__version__,
+                'avif': avif_supported(),
+            },
+            'formats': formats,
+            'corpus': [{'name': entry['path'].name, 'kind': entry['kind'], 'width': entry['width'],
+                        'height': entry['height'], 'bytes': entry['bytes']} for entry in corpus],
+        }
+
+        log(f"⏱️ วัดแยกขั้น ({len(corpus)} รูป, {', '.join(formats)})...")
+        report['stages'] = benchmark_stages(corpus, formats, args.repeat)
+        if not args.skip_workers:
+            log(f"🏭 วัด throughput ตามจำนวน workers {counts}...")
+            report['workers'] = benchmark_workers(corpus, formats, counts, work_dir)
+        report['recommendation'] = recommend(report)
+        if not args.skip_optimizer:
+            workers = report['recommendation'].get('workers', counts[-1])
+            log(f"🗄️ วัด ImageOptimizer cold/warm cache ({workers} workers)...")
+            report['optimizer'] = benchmark_optimizer(corpus, formats, workers, work_dir)
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    output = json.dumps(report, ensure_ascii=False, indent=2)
+    if args.output:
+        Path(args.output).write_text(output + "\n", encoding="utf-8")
+        log(f"✅ บันทึกผลที่ {args.output}")
+    else:
+        print(output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,232 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+🗄️ Image Cache - แคชรูปภาพบนดิสก์แบบ content-addressed
+
+- ต้นฉบับเก็บตาม SHA-256 ของเนื้อไฟล์ (URL -> digest จำไว้ใน index)
+- รูป variant เก็บตาม digest ของต้นฉบับ + พารามิเตอร์การแปลง
+- Index เป็น SQLite: เปิดได้ทันทีไม่ว่าจะมีกี่ไฟล์ (ไม่ต้องโหลดทั้งหมดตอนเริ่ม)
+- จำกัดขนาดรวม ลบไฟล์ที่ไม่ได้ใช้นานที่สุดก่อน (LRU)
+"""
+
+import filecmp
+import hashlib
+import json
+import os
+import shutil
+import sqlite3
+import time
+from pathlib import Path
+from urllib.parse import urlparse
+
+import requests
+
+
+class ImageCache:
+    def __init__(self, root=".image-cache", max_bytes=2 * 1024 ** 3):
+        self.root = Path(root)
+        self.objects_dir = self.root / "objects"
+        self.partial_dir = self.root / "partial"
+        self.max_bytes = max_bytes
+        self.objects_dir.mkdir(parents=True, exist_ok=True)
+
+        self.db = sqlite3.connect(self.root / "index.sqlite3")
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.executescript("""
+            CREATE TABLE IF NOT EXISTS sources (
+                url TEXT PRIMARY KEY,
+                digest TEXT NOT NULL,
+                etag TEXT,
+                fetched_at REAL
+            );
+            CREATE TABLE IF NOT EXISTS objects (
+                key TEXT PRIMARY KEY,
+                path TEXT NOT NULL,
+                bytes INTEGER NOT NULL,
+                kind TEXT NOT NULL,
+                last_access REAL NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS objects_lru ON objects (last_access);
+            CREATE TABLE IF NOT EXISTS meta (
+                name TEXT PRIMARY KEY,
+                value INTEGER NOT NULL
+            );
+            INSERT OR IGNORE INTO meta (name, value) VALUES ('total_bytes', 0);
+        """)
+        self.stats = {"hits": 0, "misses": 0, "evicted": 0}
+        # ขนาดรวมเก็บไว้ใน meta - เช็คเพดานได้ทันทีโดยไม่ต้องสแกนทั้ง index
+        self.evict()
+        self.db.commit()
+
+    # ---------- keys ----------
+
+    @staticmethod
+    def content_digest(data):
+        return hashlib.sha256(data).hexdigest()
+
+    @staticmethod
+    def file_digest(path, chunk_size=1024 * 1024):
+        digest = hashlib.sha256()
+        with open(path, "rb") as f:
+            for chunk in iter(lambda: f.read(chunk_size), b""):
+                digest.update(chunk)
+        return digest.hexdigest()
+
+    @staticmethod
+    def variant_key(digest, params):
+        """key ของ variant = digest ต้นฉบับ + พารามิเตอร์การแปลง (เรียง key ให้คงที่)"""
+        encoded = json.dumps(params, sort_keys=True, separators=(",", ":"))
+        return hashlib.sha256(f"{digest}|{encoded}".encode()).hexdigest()
+
+    def object_path(self, key, suffix=""):
+        return self.objects_dir / key[:2] / f"{key}{suffix}"
+
+    def partial_path(self, url):
+        """ไฟล์ดาวน์โหลดค้างของ URL (ใช้ต่อด้วย Range ได้)"""
+        return self.partial_dir / f"{hashlib.sha256(url.encode()).hexdigest()[:32]}.part"
+
+    # ---------- lookups ----------
+
+    def get(self, key):
+        """คืนค่า path ถ้ามีในแคช (และอัปเดตเวลาใช้งานล่าสุด)"""
+        row = self.db.execute("SELECT path FROM objects WHERE key = ?", (key,)).fetchone()
+        if row and Path(row[0]).exists():
+            self.db.execute("UPDATE objects SET last_access = ? WHERE key = ?", (time.time(), key))
+            self.stats["hits"] += 1
+            return Path(row[0])
+        if row:
+            # ไฟล์หายไปจากดิสก์ - ล้าง index ทิ้ง
+            self._forget(key)
+        self.stats["misses"] += 1
+        return None
+
+    def lookup_source(self, url):
+        """คืนค่า (digest, etag, path) ของต้นฉบับที่เคยดาวน์โหลด หรือ None"""
+        row = self.db.execute("SELECT digest, etag FROM sources WHERE url = ?", (url,)).fetchone()
+        if not row:
+            return None
+        path = self.get(row[0])
+        if path is None:
+            return None
+        return row[0], row[1], path
+
+    # ---------- writes ----------
+
+    def put_original(self, url, data, etag=None, suffix=".jpg"):
+        """เก็บต้นฉบับจาก bytes ในหน่วยความจำ"""
+        tmp_path = self.partial_path(url).with_suffix(".tmp")
+        tmp_path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path.write_bytes(data)
+        return self.put_original_file(url, tmp_path, etag=etag, suffix=suffix)
+
+    def put_original_file(self, url, file_path, etag=None, suffix=".jpg"):
+        """ย้ายไฟล์ที่ดาวน์โหลดเสร็จเข้าแคชตาม digest ของเนื้อไฟล์
+        (URL ต่างกันแต่ไฟล์เดียวกันเก็บครั้งเดียว - ไฟล์ต้นทางถูกย้ายหรือลบ)"""
+        file_path = Path(file_path)
+        digest = self.file_digest(file_path)
+        path = self.get(digest)
+        if path is None:
+            path = self.object_path(digest, suffix)
+            path.parent.mkdir(parents=True, exist_ok=True)
+            os.replace(file_path, path)
+            self._register(digest, path, "original")
+        else:
+            file_path.unlink(missing_ok=True)
+        self.db.execute(
+            "INSERT OR REPLACE INTO sources (url, digest, etag, fetched_at) VALUES (?, ?, ?, ?)",
+            (url, digest, etag, time.time()),
+        )
+        self.commit()
+        return digest, path
+
+    def register_file(self, key, path, kind="variant"):
+        """บันทึกไฟล์ที่ worker เขียนไว้แล้วใน object_path(key)"""
+        self._register(key, Path(path), kind)
+
+    def _register(self, key, path, kind):
+        size = path.stat().st_size
+        old = self.db.execute("SELECT bytes FROM objects WHERE key = ?", (key,)).fetchone()
+        self.db.execute(
+            "INSERT OR REPLACE INTO objects (key, path, bytes, kind, last_access) VALUES (?, ?, ?, ?, ?)",
+            (key, str(path), size, kind, time.time()),
+        )
+        self._add_total(size - (old[0] if old else 0))
+        self.evict()
+
+    def _forget(self, key):
+        row = self.db.execute("SELECT bytes FROM objects WHERE key = ?", (key,)).fetchone()
+        if row:
+            self.db.execute("DELETE FROM objects WHERE key = ?", (key,))
+            self._add_total(-row[0])
+
+    def _add_total(self, delta):
+        self.db.execute("UPDATE meta SET value = value + ? WHERE name = 'total_bytes'", (delta,))
+
+    def total_bytes(self):
+        return self.db.execute("SELECT value FROM meta WHERE name = 'total_bytes'").fetchone()[0]
+
+    def evict(self):
+        """ลบไฟล์ที่ใช้ล่าสุดนานที่สุดจนขนาดรวมไม่เกิน max_bytes"""
+        total = self.total_bytes()
+        if total <= self.max_bytes:
+            return
+        for key, path, size in self.db.execute(
+            "SELECT key, path, bytes FROM objects ORDER BY last_access ASC"
+        ).fetchall():
+            if total <= self.max_bytes:
+                break
+            Path(path).unlink(missing_ok=True)
+            self._forget(key)
+            total -= size
+            self.stats["evicted"] += 1
+
+    def commit(self):
+        self.db.commit()
+
+    def close(self):
+        self.db.commit()
+        self.db.close()
+
+    @staticmethod
+    def publish(cached_path, target_path):
+        """วางไฟล์จากแคชไปยังตำแหน่งที่เว็บใช้ (hard link ถ้าได้ ไม่งั้น copy)
+        ไฟล์เดิมที่เนื้อหาไม่ตรง (เช่น เคยลิงก์ไปรูปอื่น) ถูกแทนที่"""
+        target_path = Path(target_path)
+        if target_path.exists():
+            if os.path.samefile(cached_path, target_path) or filecmp.cmp(cached_path, target_path, shallow=False):
+                return target_path
+        target_path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = target_path.with_name(target_path.name + ".tmp")
+        tmp_path.unlink(missing_ok=True)
+        try:
+            os.link(cached_path, tmp_path)
+        except OSError:
+            shutil.copyfile(cached_path, tmp_path)
+        os.replace(tmp_path, target_path)
+        return target_path
+
+
+def fetch_original(cache, image_url, timeout=30):
+    """คืนค่า (digest, path) ของต้นฉบับ - เคยโหลดแล้วใช้จากแคชโดยไม่ดาวน์โหลดซ้ำ
+    ไฟล์ในเครื่องใช้ได้เลย (ไม่คัดลอกเข้าแคช)"""
+    if not urlparse(image_url).scheme.startswith("http"):
+        local_path = Path(image_url)
+        if not local_path.exists():
+            return None
+        return ImageCache.content_digest(local_path.read_bytes()), local_path
+
+    cached = cache.lookup_source(image_url)
+    if cached:
+        digest, _, path = cached
+        return digest, path
+
+    try:
+        response = requests.get(image_url, timeout=timeout)
+        response.raise_for_status()
+    except requests.RequestException as e:
+        print(f"   ⚠️ ดาวน์โหลดไม่ได้: {image_url} ({e})")
+        return None
+
+    suffix = Path(urlparse(image_url).path).suffix or ".jpg"
+    return cache.put_original(image_url, response.content,
+                              etag=response.headers.get("ETag"), suffix=suffix)
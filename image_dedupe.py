@@ -0,0 +1,270 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+👯 Image Dedupe - หารูปที่เกือบเหมือนกันด้วย perceptual hash
+
+- dHash (ความต่างของพิกเซลติดกัน) และ pHash (DCT ความถี่ต่ำ) ขนาด 64 บิตต่อรูป
+- รูปเดียวกันที่ถูกย่อ/บีบอัดใหม่/ใส่คนละ URL ได้ hash ต่างกันแค่ไม่กี่บิต
+- ค้นหาคู่ที่ใกล้กันด้วยการแบ่ง hash เป็นช่วง (band): ถ้าต่างกันไม่เกิน k บิต
+  และแบ่งเป็น k+1 ช่วง ต้องมีอย่างน้อยหนึ่งช่วงที่ตรงกันทุกบิต - ไม่ต้องเทียบทุกคู่
+- hash ดูแค่ความสว่าง: รถรุ่นเดียวกันคนละสีบนฉากเดียวกันได้ hash ใกล้กัน
+  จึงยืนยันทุกคู่ด้วยภาพย่อสี 8x8 (RMSE ของ RGB) ก่อนถือว่าเป็นรูปเดียวกัน
+- hash แคชตาม digest ของต้นฉบับ คำนวณบน process pool
+"""
+
+import asyncio
+import json
+import os
+from pathlib import Path
+
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover - ไม่มี numpy ใช้ dHash อย่างเดียว
+    np = None
+
+try:
+    from PIL import Image, ImageOps
+except ImportError:  # pragma: no cover
+    Image = None
+
+HASH_BITS = 64
+PHASH_SIZE = 32
+
+# ภาพย่อสีสำหรับยืนยันคู่ที่ hash ใกล้กัน: รูปเดียวกันที่ย่อ/บีบอัดใหม่ต่างกันราว 1 ระดับ
+# รูปคนละสี (ตัวรถ ~1/3 ของภาพ) ต่างกันหลายสิบ
+COLOR_THUMB_SIZE = 8
+COLOR_RMSE_THRESHOLD = 6.0
+
+
+def _bits_to_int(bits):
+    value = 0
+    for bit in bits:
+        value = (value << 1) | int(bool(bit))
+    return value
+
+
+def dhash(gray):
+    """เทียบพิกเซลซ้าย-ขวาบนภาพ 9x8"""
+    small = gray.resize((9, 8), Image.LANCZOS)
+    pixels = list(small.getdata())
+    return _bits_to_int(pixels[row * 9 + col] > pixels[row * 9 + col + 1]
+                        for row in range(8) for col in range(8))
+
+
+def _dct_matrix(n):
+    k = np.arange(n)[:, None]
+    i = np.arange(n)[None, :]
+    matrix = np.cos(np.pi * (2 * i + 1) * k / (2 * n)) * np.sqrt(2.0 / n)
+    matrix[0] /= np.sqrt(2.0)
+    return matrix
+
+
+def phash(gray):
+    """DCT 2 มิติของภาพ 32x32 เก็บความถี่ต่ำ 8x8 เทียบกับค่ากลาง (ไม่มี numpy คืน None)"""
+    if np is None:
+        return None
+    pixels = np.asarray(gray.resize((PHASH_SIZE, PHASH_SIZE), Image.LANCZOS), dtype=np.float64)
+    dct = _dct_matrix(PHASH_SIZE)
+    low = (dct @ pixels @ dct.T)[:8, :8].flatten()
+    median = np.median(low[1:])  # ไม่นับ DC (ความสว่างเฉลี่ย)
+    return _bits_to_int(low > median)
+
+
+def color_thumbnail(image):
+    """ภาพย่อ RGB 8x8 (hex ของพิกเซล)"""
+    return image.convert('RGB').resize((COLOR_THUMB_SIZE, COLOR_THUMB_SIZE), Image.BOX).tobytes().hex()
+
+
+def color_distance(a, b):
+    """RMSE ของภาพย่อสีสองภาพ (0-255)"""
+    pixels_a, pixels_b = bytes.fromhex(a), bytes.fromhex(b)
+    if len(pixels_a) != len(pixels_b):
+        return float('inf')
+    return (sum((x - y) ** 2 for x, y in zip(pixels_a, pixels_b)) / len(pixels_a)) ** 0.5
+
+
+def hash_image(task):
+    """คำนวณ hash ของต้นฉบับหนึ่งรูป (รันใน worker process)"""
+    with Image.open(task['source']) as original:
+        width, height = original.size
+        # JPEG ถอดรหัสแบบย่อได้เลย ไม่ต้อง decode เต็มขนาด
+        original.draft('RGB', (PHASH_SIZE * 2, PHASH_SIZE * 2))
+        drafted = original.size
+        image = ImageOps.exif_transpose(original)
+        if image.size != drafted:
+            # EXIF หมุน 90 องศา - ขนาดที่แสดงจริงสลับกัน
+            width, height = height, width
+        gray = image.convert('L')
+        perceptual = phash(gray)
+        return {
+            'digest': task['digest'],
+            'dhash': f"{dhash(gray):016x}",
+            'phash': f"{perceptual:016x}" if perceptual is not None else None,
+            'rgb': color_thumbnail(image),
+            'width': width,
+            'height': height,
+            'bytes': os.path.getsize(task['source']),
+        }
+
+
+def hamming(a, b):
+    return bin(a ^ b).count("1")
+
+
+class HammingIndex:
+    """ดัชนีค้นหา hash ที่ต่างกันไม่เกิน max_distance บิต (แบ่งเป็น max_distance + 1 ช่วง)"""
+
+    def __init__(self, max_distance, bits=HASH_BITS):
+        self.max_distance = max_distance
+        band_count = max_distance + 1
+        edges = [round(i * bits / band_count) for i in range(band_count + 1)]
+        self.bands = [(start, end - start) for start, end in zip(edges, edges[1:])]
+        self.buckets = {}
+        self.values = {}
+
+    def _band_keys(self, value):
+        for index, (start, width) in enumerate(self.bands):
+            yield index, (value >> start) & ((1 << width) - 1)
+
+    def add(self, key, value):
+        self.values[key] = value
+        for band_key in self._band_keys(value):
+            self.buckets.setdefault(band_key, []).append(key)
+
+    def query(self, value):
+        """คืนค่า [(distance, key)] เรียงจากใกล้สุด"""
+        candidates = set()
+        for band_key in self._band_keys(value):
+            candidates.update(self.buckets.get(band_key, ()))
+        matches = [(hamming(value, self.values[key]), key) for key in candidates]
+        return sorted(m for m in matches if m[0] <= self.max_distance)
+
+
+class DuplicateFinder:
+    """จัดกลุ่มต้นฉบับที่เกือบเหมือนกัน แต่ละกลุ่มมีตัวแทน (ความละเอียดสูงสุด) หนึ่งรูป"""
+
+    def __init__(self, store_file, threshold=6):
+        self.store_file = Path(store_file)
+        self.threshold = threshold
+        self.hashes = {}
+        self.dirty = False
+        self.load()
+        self.reset()
+
+    def load(self):
+        try:
+            with open(self.store_file, "r", encoding="utf-8") as f:
+                self.hashes = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            self.hashes = {}
+
+    def save(self):
+        if not self.dirty:
+            return
+        self.store_file.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.store_file.with_suffix(".tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self.hashes, f)
+        os.replace(tmp_path, self.store_file)
+        self.dirty = False
+
+    def reset(self):
+        """เริ่มรอบใหม่ (ตัวแทนกลุ่มนับเฉพาะรูปที่เจอในรอบนี้)"""
+        self.primary = 'phash' if np is not None else 'dhash'
+        self.index = HammingIndex(self.threshold)
+        self.representatives = {}
+
+    def remember(self, result):
+        self.hashes[result.pop('digest')] = result
+        self.dirty = True
+
+    def spec(self):
+        """ค่าที่กำหนดว่ารูปไหนซ้ำกัน - เปลี่ยนแล้วรูปที่เคยใช้ variants ร่วมกันต้องตัดสินใหม่"""
+        return {'bits': self.threshold, 'rgb_rmse': COLOR_RMSE_THRESHOLD}
+
+    def has_hash(self, digest):
+        # hash จากรุ่นก่อนที่ไม่มีภาพย่อสีต้องคำนวณใหม่
+        return 'rgb' in self.hashes.get(digest, {})
+
+    def _hash_value(self, digest, kind):
+        value = self.hashes.get(digest, {}).get(kind)
+        return int(value, 16) if value else None
+
+    def is_near(self, a, b):
+        """ยืนยันด้วยภาพย่อสี แล้วด้วย hash อีกชนิด (เผื่อระยะไว้สองเท่า) กันรูปที่บังเอิญชนกันชนิดเดียว"""
+        color_a, color_b = self.hashes.get(a, {}).get('rgb'), self.hashes.get(b, {}).get('rgb')
+        if not color_a or not color_b or color_distance(color_a, color_b) > COLOR_RMSE_THRESHOLD:
+            return False
+        secondary = 'dhash' if self.primary == 'phash' else 'phash'
+        value_a, value_b = self._hash_value(a, secondary), self._hash_value(b, secondary)
+        if value_a is None or value_b is None:
+            return True
+        return hamming(value_a, value_b) <= self.threshold * 2
+
+    def pixels(self, digest):
+        entry = self.hashes[digest]
+        return entry['width'] * entry['height'], entry['bytes']
+
+    async def hash_source(self, executor, digest, source_path):
+        if not self.has_hash(digest):
+            try:
+                result = await asyncio.wrap_future(executor.submit(
+                    hash_image, {'source': str(source_path), 'digest': digest}))
+            except Exception as e:
+                print(f"   ⚠️ คำนวณ perceptual hash ไม่สำเร็จ: {e}")
+                return None
+            self.remember(result)
+        return self.hashes[digest]
+
+    def hash_sources(self, executor, sources):
+        """คำนวณ hash ของ {digest: path} ที่ยังไม่มี (แบบ batch)"""
+        futures = [executor.submit(hash_image, {'source': str(path), 'digest': digest})
+                   for digest, path in sources.items() if not self.has_hash(digest)]
+        for future in futures:
+            try:
+                self.remember(future.result())
+            except Exception as e:
+                print(f"   ⚠️ คำนวณ perceptual hash ไม่สำเร็จ: {e}")
+        return len(futures)
+
+    def assign(self, digest):
+        """ตัวแทนกลุ่มของรูปที่เพิ่งโหลดเสร็จ (ใช้ระหว่าง pipeline ที่รูปทยอยเข้ามา)
+        ใช้ตัวแทนเดิมได้เฉพาะเมื่อตัวแทนละเอียดไม่น้อยกว่า - รูปที่ใหญ่กว่าเป็นตัวแทนเอง"""
+        value = self._hash_value(digest, self.primary)
+        if value is None:
+            return digest
+        for _, other in self.index.query(value):
+            if self.is_near(digest, other) and self.pixels(other)[0] >= self.pixels(digest)[0]:
+                self.representatives[digest] = other
+                return other
+        self.index.add(digest, value)
+        self.representatives[digest] = digest
+        return digest
+
+    def groups(self, digests):
+        """จัดกลุ่มทั้งชุดพร้อมกัน คืนค่า [[ตัวแทน, สมาชิก...]] เฉพาะกลุ่มที่มีมากกว่าหนึ่งรูป"""
+        digests = [d for d in dict.fromkeys(digests) if self._hash_value(d, self.primary) is not None]
+        parent = {d: d for d in digests}
+
+        def find(d):
+            while parent[d] != d:
+                parent[d] = parent[parent[d]]
+                d = parent[d]
+            return d
+
+        index = HammingIndex(self.threshold)
+        for digest in digests:
+            for _, other in index.query(self._hash_value(digest, self.primary)):
+                if self.is_near(digest, other):
+                    parent[find(digest)] = find(other)
+            index.add(digest, self._hash_value(digest, self.primary))
+
+        members = {}
+        for digest in digests:
+            members.setdefault(find(digest), []).append(digest)
+        groups = []
+        for group in members.values():
+            if len(group) > 1:
+                group.sort(key=self.pixels, reverse=True)
+                groups.append(group)
+        return groups
@@ -0,0 +1,156 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+⬇️ Async Image Downloader - ดาวน์โหลดรูปต้นฉบับทั้งแคตตาล็อกแบบขนาน
+
+- จำกัดจำนวน connection รวมและต่อ host (ใช้ connection ซ้ำผ่าน session เดียว)
+- สตรีมลงดิสก์ทีละ chunk ไม่เก็บทั้งไฟล์ในหน่วยความจำ
+- ดาวน์โหลดค้างต่อได้ด้วย Range + If-Range (ETag)
+- รูปที่มีในแคชแล้วส่ง If-None-Match -> 304 ไม่ต้องโหลดใหม่
+- ส่งผลลัพธ์ออกทันทีที่แต่ละรูปเสร็จ ให้ขั้นตอนถัดไปเริ่มงานได้เลย
+"""
+
+import asyncio
+import json
+import random
+import time
+from pathlib import Path
+from urllib.parse import urlparse
+
+import aiohttp
+
+from image_cache import fetch_original
+
+
+class AsyncImageDownloader:
+    def __init__(self, cache, max_connections=16, per_host=4, timeout=60, chunk_size=64 * 1024,
+                 max_retries=3, revalidate=True):
+        self.cache = cache
+        self.max_connections = max_connections
+        self.per_host = per_host
+        self.timeout = timeout
+        self.chunk_size = chunk_size
+        self.max_retries = max_retries
+        self.revalidate = revalidate
+        self.stats = {"downloaded": 0, "bytes": 0, "resumed": 0, "not_modified": 0, "cached": 0, "failed": 0}
+
+    def _load_partial_etag(self, part_path):
+        try:
+            with open(part_path.with_suffix(".json"), "r", encoding="utf-8") as f:
+                return json.load(f).get("etag")
+        except (FileNotFoundError, json.JSONDecodeError):
+            return None
+
+    def _save_partial_etag(self, part_path, url, etag):
+        part_path.parent.mkdir(parents=True, exist_ok=True)
+        with open(part_path.with_suffix(".json"), "w", encoding="utf-8") as f:
+            json.dump({"url": url, "etag": etag}, f)
+
+    @staticmethod
+    def _resumable(etag):
+        # If-Range ใช้ได้กับ strong ETag เท่านั้น
+        return bool(etag) and not etag.startswith("W/")
+
+    async def fetch(self, session, image_url):
+        """ดาวน์โหลดหนึ่งรูปเข้าแคช คืนค่า (url, digest, path) หรือ None"""
+        if not urlparse(image_url).scheme.startswith("http"):
+            original = fetch_original(self.cache, image_url)
+            return (image_url, *original) if original else None
+
+        cached = self.cache.lookup_source(image_url)
+        if cached and not (self.revalidate and cached[1]):
+            self.stats["cached"] += 1
+            return image_url, cached[0], cached[2]
+
+        part_path = self.cache.partial_path(image_url)
+        etag = self._load_partial_etag(part_path) if part_path.exists() else None
+        attempt = 0
+        while True:
+            headers = {}
+            offset = part_path.stat().st_size if part_path.exists() else 0
+            if cached:
+                headers["If-None-Match"] = cached[1]
+            elif offset and self._resumable(etag):
+                headers["Range"] = f"bytes={offset}-"
+                headers["If-Range"] = etag
+
+            try:
+                async with session.get(image_url, headers=headers,
+                                       timeout=aiohttp.ClientTimeout(total=None, sock_read=self.timeout)) as response:
+                    if response.status == 304 and cached:
+                        self.stats["not_modified"] += 1
+                        return image_url, cached[0], cached[2]
+                    if response.status == 206 and "Range" in headers:
+                        mode = "ab"
+                        self.stats["resumed"] += 1
+                    elif response.status == 200:
+                        mode = "wb"
+                    elif response.status == 416:
+                        # ไฟล์ค้างไม่ตรงกับของบน server แล้ว - เริ่มใหม่
+                        part_path.unlink(missing_ok=True)
+                        raise aiohttp.ClientResponseError(response.request_info, (), status=response.status)
+                    elif response.status in (429, 500, 502, 503, 504):
+                        raise aiohttp.ClientResponseError(response.request_info, (), status=response.status)
+                    else:
+                        print(f"   ⚠️ ดาวน์โหลดไม่ได้: {image_url} (status {response.status})")
+                        self.stats["failed"] += 1
+                        return None
+
+                    etag = response.headers.get("ETag")
+                    if etag:
+                        self._save_partial_etag(part_path, image_url, etag)
+                    else:
+                        part_path.with_suffix(".json").unlink(missing_ok=True)
+                    part_path.parent.mkdir(parents=True, exist_ok=True)
+                    with open(part_path, mode) as f:
+                        async for chunk in response.content.iter_chunked(self.chunk_size):
+                            f.write(chunk)
+                            self.stats["bytes"] += len(chunk)
+                break
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                # เก็บไฟล์ค้างไว้ รอบถัดไปขอเฉพาะส่วนที่ขาด
+                if attempt >= self.max_retries:
+                    if cached:
+                        return image_url, cached[0], cached[2]
+                    print(f"   ⚠️ ดาวน์โหลดไม่ได้: {image_url} ({type(e).__name__})")
+                    self.stats["failed"] += 1
+                    return None
+                attempt += 1
+                await asyncio.sleep(random.uniform(0, 0.5 * (2 ** attempt)))
+
+        suffix = Path(urlparse(image_url).path).suffix or ".jpg"
+        digest, path = self.cache.put_original_file(image_url, part_path, etag=etag, suffix=suffix)
+        part_path.with_suffix(".json").unlink(missing_ok=True)
+        self.stats["downloaded"] += 1
+        return image_url, digest, path
+
+    async def iter_downloads(self, image_urls, max_seconds=None):
+        """ดาวน์โหลดทุก URL แบบขนาน แล้ว yield (url, digest, path) ตามลำดับที่เสร็จ
+        เกิน max_seconds แล้วหยุดรอ - ที่ค้างอยู่ถูกยกเลิก (ไฟล์ .part ดาวน์โหลดต่อได้รอบหน้า)"""
+        connector = aiohttp.TCPConnector(limit=self.max_connections, limit_per_host=self.per_host)
+        started = time.perf_counter()
+        async with aiohttp.ClientSession(connector=connector) as session:
+            tasks = [asyncio.create_task(self.fetch(session, url)) for url in dict.fromkeys(image_urls) if url]
+            try:
+                for next_done in asyncio.as_completed(tasks, timeout=max_seconds):
+                    try:
+                        result = await next_done
+                    except asyncio.TimeoutError:
+                        print(f"⏱️ ดาวน์โหลดเกิน {max_seconds:.1f} วินาที - ใช้เท่าที่มีในแคช")
+                        break
+                    if result:
+                        yield result
+            finally:
+                for task in tasks:
+                    task.cancel()
+                # รอให้งานที่ยกเลิกปิดไฟล์/connection ก่อนปิด session
+                await asyncio.gather(*tasks, return_exceptions=True)
+        self.cache.commit()
+        elapsed = time.perf_counter() - started
+        print(f"⬇️ ดาวน์โหลด {self.stats['downloaded']} รูป ({self.stats['bytes'] / 1024 / 1024:.1f} MB) ใน {elapsed:.2f} วินาที"
+              f" | resume {self.stats['resumed']} | 304 {self.stats['not_modified']}"
+              f" | แคช {self.stats['cached']} | ล้มเหลว {self.stats['failed']}")
+
+    async def download_all(self, image_urls, max_seconds=None):
+        """ดาวน์โหลดทั้งหมด (ภายใน max_seconds) คืนค่า {url: (digest, path)} ของที่ได้"""
+        return {url: (digest, path) async for url, digest, path in self.iter_downloads(image_urls, max_seconds)}
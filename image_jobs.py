@@ -0,0 +1,326 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+📋 Image Job Queue - คิวงานรูปภาพที่อยู่รอดข้ามการรีสตาร์ท
+
+- หนึ่งงานต่อ URL รูป เก็บใน SQLite: สถานะ, จำนวนครั้งที่ลอง, priority
+- รูป hero และรถหน้าแรกได้ priority สูงกว่า ทำก่อน
+- โปรเซสตายกลางทาง: งานที่ค้าง running จะกลับเป็น pending เมื่อเริ่มใหม่ งานที่ done แล้วไม่ต้องทำซ้ำ
+  งานผูกกับรอบการทำงาน (run: host, PID, เวลาเริ่ม, heartbeat) ไม่ใช่ PID อย่างเดียว
+  - PID ซ้ำ (container ที่เป็น PID 1 ทุกครั้ง, PID ถูกใช้ใหม่) หรือเครื่องอื่นก็กู้งานได้
+- แคตตาล็อกมีรูปใหม่ (sync/webhook) แค่ enqueue เพิ่ม ไม่กระทบงานเดิม
+- งานที่ทำเสร็จด้วยค่าการสร้างรูปชุดอื่น (format/quality/render version) ถูกหยิบมาทำใหม่
+
+การใช้งาน:
+    python image_jobs.py status
+    python image_jobs.py reset-failed
+"""
+
+import argparse
+import json
+import os
+import socket
+import sqlite3
+import time
+import uuid
+from pathlib import Path
+
+DEFAULT_DB = Path(".image-cache") / "jobs.sqlite3"
+
+# รถที่แสดงในหน้า listing หน้าแรก (ตรงกับ listing_limit ของ SSR)
+FIRST_PAGE_CARS = 6
+PRIORITY_FIRST_PAGE = 200
+PRIORITY_HERO = 100
+
+STATES = ("pending", "running", "done", "failed")
+
+# รอบที่ไม่มี heartbeat นานเกินนี้ (วินาที) ถือว่าตายแล้ว - ใช้กับรอบจากเครื่องอื่น/PID ที่ถูกใช้ใหม่
+RUN_LEASE_SECONDS = 30 * 60
+HEARTBEAT_INTERVAL = 30
+
+
+def catalog_jobs(image_lists, first_page_cars=FIRST_PAGE_CARS):
+    """{url: priority} จากรายการรูปของรถแต่ละคันตามลำดับที่แสดงบนเว็บ
+    URL ที่อยู่หลายที่ได้ priority สูงสุดของทุกที่"""
+    jobs = {}
+    for position, images in enumerate(image_lists):
+        for index, image_url in enumerate(images):
+            if not image_url:
+                continue
+            priority = (PRIORITY_FIRST_PAGE if position < first_page_cars else 0) + (PRIORITY_HERO if index == 0 else 0)
+            jobs[image_url] = max(priority, jobs.get(image_url, 0))
+    return jobs
+
+
+def _pid_alive(pid):
+    if not pid:
+        return False
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+class ImageJobQueue:
+    def __init__(self, db_path=DEFAULT_DB, max_attempts=3):
+        self.db_path = Path(db_path)
+        self.max_attempts = max_attempts
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self.db = sqlite3.connect(self.db_path)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.executescript("""
+            CREATE TABLE IF NOT EXISTS jobs (
+                url TEXT PRIMARY KEY,
+                priority INTEGER NOT NULL DEFAULT 0,
+                state TEXT NOT NULL DEFAULT 'pending',
+                attempts INTEGER NOT NULL DEFAULT 0,
+                spec TEXT,
+                digest TEXT,
+                owner INTEGER,
+                last_error TEXT,
+                enqueued_at REAL NOT NULL,
+                started_at REAL,
+                finished_at REAL
+            );
+            CREATE INDEX IF NOT EXISTS jobs_next ON jobs (state, priority DESC, enqueued_at);
+            CREATE TABLE IF NOT EXISTS runs (
+                run_id TEXT PRIMARY KEY,
+                host TEXT NOT NULL,
+                pid INTEGER NOT NULL,
+                started_at REAL NOT NULL,
+                heartbeat_at REAL NOT NULL
+            );
+        """)
+        columns = {row[1] for row in self.db.execute("PRAGMA table_info(jobs)")}
+        if "run_id" not in columns:
+            self.db.execute("ALTER TABLE jobs ADD COLUMN run_id TEXT")
+        self.db.commit()
+
+        # รอบการทำงานของ queue นี้ (ลงทะเบียนตอน claim ครั้งแรก)
+        self.host = socket.gethostname()
+        self.run_id = uuid.uuid4().hex
+        self.run_started = False
+        self.last_heartbeat = 0.0
+
+    def enqueue(self, jobs):
+        """เพิ่มงาน {url: priority} - URL ที่มีอยู่แล้วแค่ปรับ priority (สถานะเดิมคงไว้)
+        คืนค่าจำนวนงานใหม่"""
+        now = time.time()
+        before = self.count()
+        self.db.executemany(
+            "INSERT INTO jobs (url, priority, enqueued_at) VALUES (?, ?, ?) "
+            "ON CONFLICT(url) DO UPDATE SET priority = excluded.priority WHERE priority != excluded.priority",
+            [(url, priority, now) for url, priority in jobs.items()],
+        )
+        self.db.commit()
+        return self.count() - before
+
+    def count(self):
+        return self.db.execute("SELECT COUNT(*) FROM jobs").fetchone()[0]
+
+    def heartbeat(self, force=False):
+        """บอกว่ารอบนี้ยังทำงานอยู่ (เรียกบ่อยได้ เขียนจริงทุก HEARTBEAT_INTERVAL วินาที)"""
+        now = time.time()
+        if not self.run_started or (not force and now - self.last_heartbeat < HEARTBEAT_INTERVAL):
+            return
+        self.db.execute("UPDATE runs SET heartbeat_at = ? WHERE run_id = ?", (now, self.run_id))
+        self.last_heartbeat = now
+
+    def _run_alive(self, run_id, owner, now):
+        """รอบที่ถือ job running ยังทำงานอยู่หรือไม่"""
+        if run_id == self.run_id:
+            return True
+        if run_id is None:
+            # งานจากรุ่นก่อนที่มีแค่ PID - PID ของเราเองแปลว่ารอบนั้นจบไปแล้ว
+            return owner != os.getpid() and _pid_alive(owner)
+        row = self.db.execute("SELECT host, pid, heartbeat_at FROM runs WHERE run_id = ?", (run_id,)).fetchone()
+        if row is None:
+            return False
+        host, pid, heartbeat_at = row
+        if now - heartbeat_at > RUN_LEASE_SECONDS:
+            return False
+        if host == self.host:
+            return pid != os.getpid() and _pid_alive(pid)
+        return True
+
+    def stale_running(self):
+        """URL ของงาน running ที่รอบเจ้าของตายไปแล้ว"""
+        now = time.time()
+        alive = {}
+        stale = []
+        for url, run_id, owner in self.db.execute(
+            "SELECT url, run_id, owner FROM jobs WHERE state = 'running'"
+        ).fetchall():
+            key = (run_id, owner)
+            if key not in alive:
+                alive[key] = self._run_alive(run_id, owner, now)
+            if not alive[key]:
+                stale.append(url)
+        return stale
+
+    def recover(self):
+        """งานที่ค้าง running ของรอบที่ตายไปแล้ว กลับเป็น pending"""
+        stale = self.stale_running()
+        self.db.executemany(
+            "UPDATE jobs SET state = 'pending', owner = NULL, run_id = NULL WHERE url = ? AND state = 'running'",
+            [(url,) for url in stale],
+        )
+        # รอบที่ไม่เหลืองาน running แล้วไม่ต้องเก็บ
+        self.db.execute(
+            "DELETE FROM runs WHERE run_id != ? AND run_id NOT IN"
+            " (SELECT run_id FROM jobs WHERE state = 'running' AND run_id IS NOT NULL)",
+            (self.run_id,),
+        )
+        self.db.commit()
+        return len(stale)
+
+    def claim(self, spec, limit=None):
+        """หยิบงานที่ต้องทำเรียงตาม priority แล้วตั้งเป็น running คืนค่ารายการ URL
+        spec = ค่าการสร้างรูป งาน done ที่ทำด้วย spec อื่นถูกหยิบมาทำใหม่"""
+        spec = json.dumps(spec, sort_keys=True)
+        rows = self.db.execute(
+            "SELECT url FROM jobs WHERE state = 'pending'"
+            " OR (state = 'failed' AND attempts < ?)"
+            " OR (state = 'done' AND (spec IS NULL OR spec != ?))"
+            " ORDER BY priority DESC, enqueued_at, rowid"
+            + (" LIMIT ?" if limit else ""),
+            (self.max_attempts, spec) + ((limit,) if limit else ()),
+        ).fetchall()
+        urls = [row[0] for row in rows]
+        now = time.time()
+        if not self.run_started:
+            self.db.execute(
+                "INSERT OR REPLACE INTO runs (run_id, host, pid, started_at, heartbeat_at) VALUES (?, ?, ?, ?, ?)",
+                (self.run_id, self.host, os.getpid(), now, now),
+            )
+            self.run_started = True
+            self.last_heartbeat = now
+        self.db.executemany(
+            "UPDATE jobs SET state = 'running', attempts = CASE WHEN state = 'done' THEN 1 ELSE attempts + 1 END,"
+            " spec = ?, owner = ?, run_id = ?, started_at = ?, finished_at = NULL, last_error = NULL WHERE url = ?",
+            [(spec, os.getpid(), self.run_id, now, url) for url in urls],
+        )
+        self.db.commit()
+        return urls
+
+    def complete(self, url, digest=None):
+        self.db.execute(
+            "UPDATE jobs SET state = 'done', digest = COALESCE(?, digest), owner = NULL, run_id = NULL,"
+            " finished_at = ? WHERE url = ?",
+            (digest, time.time(), url),
+        )
+        self.heartbeat()
+        self.db.commit()
+
+    def fail(self, url, error):
+        self.db.execute(
+            "UPDATE jobs SET state = 'failed', owner = NULL, run_id = NULL, last_error = ?, finished_at = ? WHERE url = ?",
+            (str(error)[:500], time.time(), url),
+        )
+        self.heartbeat()
+        self.db.commit()
+
+    def fail_unfinished(self, urls, error):
+        """งานที่หยิบไปแล้วแต่จบรอบโดยไม่เสร็จ (เช่น ดาวน์โหลดไม่ได้)"""
+        for url in urls:
+            if self.state(url) == "running":
+                self.fail(url, error)
+
+    def reset_failed(self):
+        cursor = self.db.execute("UPDATE jobs SET state = 'pending', attempts = 0, last_error = NULL WHERE state = 'failed'")
+        self.db.commit()
+        return cursor.rowcount
+
+    def state(self, url):
+        row = self.db.execute("SELECT state FROM jobs WHERE url = ?", (url,)).fetchone()
+        return row[0] if row else None
+
+    def done_digests(self):
+        """digest ของต้นฉบับที่ทำเสร็จแล้ว เรียงตามเวลาที่เสร็จ"""
+        return [row[0] for row in self.db.execute(
+            "SELECT digest FROM jobs WHERE state = 'done' AND digest IS NOT NULL ORDER BY finished_at"
+        )]
+
+    def status(self, window=900):
+        """สรุปสถานะคิว: จำนวนแต่ละสถานะ, backlog ตาม priority, ความเร็วช่วง window วินาทีล่าสุด"""
+        now = time.time()
+        counts = dict.fromkeys(STATES, 0)
+        counts.update(self.db.execute("SELECT state, COUNT(*) FROM jobs GROUP BY state").fetchall())
+        # backlog = งานที่รอบหน้าจะหยิบ (รวม running ของโปรเซสที่หยุดไปแล้ว)
+        backlog = {}
+        stale = 0
+        alive = {}
+        for priority, state, attempts, run_id, owner in self.db.execute(
+            "SELECT priority, state, attempts, run_id, owner FROM jobs WHERE state != 'done'"
+        ).fetchall():
+            if state == "running":
+                if (run_id, owner) not in alive:
+                    alive[(run_id, owner)] = self._run_alive(run_id, owner, now)
+                if alive[(run_id, owner)]:
+                    continue
+                stale += 1
+            elif state == "failed" and attempts >= self.max_attempts:
+                continue
+            backlog[priority] = backlog.get(priority, 0) + 1
+        recent, average = self.db.execute(
+            "SELECT COUNT(*), AVG(finished_at - started_at) FROM jobs WHERE state = 'done' AND finished_at >= ?",
+            (now - window,),
+        ).fetchone()
+        errors = self.db.execute(
+            "SELECT url, attempts, last_error FROM jobs WHERE state = 'failed' ORDER BY finished_at DESC LIMIT 5"
+        ).fetchall()
+        return {
+            "counts": counts,
+            "stale": stale,
+            "backlog": sorted(backlog.items(), reverse=True),
+            "per_minute": recent / (window / 60),
+            "average_seconds": average,
+            "recent_errors": errors,
+        }
+
+    def close(self):
+        self.db.commit()
+        self.db.close()
+
+
+def print_status(queue):
+    status = queue.status()
+    counts = status["counts"]
+    print(f"📋 คิวงานรูปภาพ ({queue.db_path}):")
+    stale = f" (ค้างจากโปรเซสที่หยุดไปแล้ว {status['stale']} - ทำต่อในรอบหน้า)" if status["stale"] else ""
+    print(f"   - pending {counts['pending']} | running {counts['running']}{stale}"
+          f" | done {counts['done']} | failed {counts['failed']}")
+    labels = {
+        PRIORITY_FIRST_PAGE + PRIORITY_HERO: "hero หน้าแรก",
+        PRIORITY_FIRST_PAGE: "หน้าแรก",
+        PRIORITY_HERO: "hero",
+        0: "ทั่วไป",
+    }
+    backlog_total = sum(count for _, count in status["backlog"])
+    if backlog_total:
+        print(f"   - backlog {backlog_total}: " + ", ".join(
+            f"{labels.get(priority, f'priority {priority}')} {count}" for priority, count in status["backlog"]))
+    if status["per_minute"]:
+        eta = backlog_total / status["per_minute"]
+        print(f"   - ความเร็ว 15 นาทีล่าสุด: {status['per_minute']:.1f} งาน/นาที"
+              f" (หยิบจนเสร็จเฉลี่ย {status['average_seconds']:.1f} วินาที/งาน), ที่เหลือประมาณ {eta:.1f} นาที")
+    else:
+        print("   - ไม่มีงานเสร็จใน 15 นาทีล่าสุด")
+    for url, attempts, error in status["recent_errors"]:
+        print(f"   ⚠️ [{attempts} ครั้ง] {url}: {error}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="คิวงานรูปภาพ (สถานะ/ความเร็ว/backlog)")
+    parser.add_argument("command", choices=["status", "reset-failed"], help="status = สรุปคิว, reset-failed = ลองงานที่ล้มเหลวใหม่")
+    parser.add_argument("--db", default=str(DEFAULT_DB), help="ไฟล์ฐานข้อมูลคิว")
+    args = parser.parse_args()
+
+    job_queue = ImageJobQueue(args.db)
+    if args.command == "reset-failed":
+        print(f"🔁 ตั้งงานที่ล้มเหลว {job_queue.reset_failed()} งานกลับเป็น pending")
+    print_status(job_queue)
+    job_queue.close()
@@ -0,0 +1,148 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+🌫️ Image Placeholders - ภาพเบลอขนาดเล็ก (LQIP) แสดงก่อนรูปจริงโหลดเสร็จ
+
+- ย่อรูป hero ให้กว้าง ~16px แล้วเข้ารหัสเป็น WebP inline (~100 ไบต์รวม data URI)
+- เบราว์เซอร์ขยายพื้นหลังแบบ smooth จึงเห็นเป็นภาพเบลอสีตรงกับรูปจริง
+- สร้างเป็น batch บน process pool แคชตาม digest ของต้นฉบับ
+- ต้นฉบับดึงผ่าน AsyncImageDownloader (ขนาน, retry, ต่อไฟล์ค้าง) - มีในแคชแล้วไม่โหลดซ้ำ
+- MISSING_IMAGE_SVG ใช้แทน placeholder service ภายนอกเมื่อไม่มีรูป/รูปโหลดไม่ได้
+"""
+
+import asyncio
+import base64
+import io
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pathlib import Path
+from urllib.parse import quote
+
+from image_cache import ImageCache
+from image_downloader import AsyncImageDownloader
+
+try:
+    from PIL import Image, ImageOps
+except ImportError:  # pragma: no cover - ต้องติดตั้ง pillow สำหรับการสร้าง placeholder
+    Image = None
+
+# รูปสำรองเมื่อไม่มีรูป (inline ไม่ต้องเรียก server ภายนอก)
+MISSING_IMAGE_SVG = "data:image/svg+xml," + quote(
+    "<svg xmlns='http://www.w3.org/2000/svg' viewBox='0 0 300 200'>"
+    "<rect width='300' height='200' fill='#e9ecef'/>"
+    "<path d='M95 125l15-30h80l15 30v20h-110z' fill='#adb5bd'/>"
+    "<circle cx='120' cy='145' r='10' fill='#868e96'/><circle cx='180' cy='145' r='10' fill='#868e96'/>"
+    "<text x='150' y='180' font-family='sans-serif' font-size='14' fill='#868e96' text-anchor='middle'>No Image</text>"
+    "</svg>",
+    safe="/:= ",
+)
+
+def render_placeholder(task):
+    """สร้าง LQIP หนึ่งรูป (รันใน worker process) คืนค่า data URI"""
+    with Image.open(task['source']) as original:
+        image = ImageOps.exif_transpose(original).convert('RGB')
+        width = task['width']
+        height = max(1, round(image.height * width / image.width))
+        image = image.resize((width, height), Image.BILINEAR)
+
+    buffer = io.BytesIO()
+    image.save(buffer, 'WEBP', quality=task['quality'], method=6)
+    return {
+        'digest': task['digest'],
+        'data_uri': "data:image/webp;base64," + base64.b64encode(buffer.getvalue()).decode(),
+    }
+
+
+class PlaceholderBuilder:
+    """สร้างและจำ LQIP ของรูป (URL -> digest ต้นฉบับ -> data URI)"""
+
+    def __init__(self, cache_root=".image-cache", width=16, quality=30, workers=None):
+        self.cache_root = Path(cache_root)
+        self.store_file = self.cache_root / "placeholders.json"
+        self.width = width
+        self.quality = quality
+        self.workers = workers
+        self.urls = {}
+        self.placeholders = {}
+        self.load()
+
+    def load(self):
+        try:
+            with open(self.store_file, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            self.urls = data.get("urls", {})
+            self.placeholders = data.get("placeholders", {})
+        except (FileNotFoundError, json.JSONDecodeError):
+            self.urls, self.placeholders = {}, {}
+
+    def save(self):
+        self.store_file.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.store_file.with_suffix(".tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"urls": self.urls, "placeholders": self.placeholders}, f)
+        os.replace(tmp_path, self.store_file)
+
+    def get(self, image_url):
+        """data URI ของ LQIP (None ถ้ายังไม่ได้สร้าง)"""
+        return self.placeholders.get(self.urls.get(image_url))
+
+    def build(self, image_urls, cache=None, max_seconds=None):
+        """สร้าง LQIP ของทุก URL ที่ยังไม่มี (ต้นฉบับดึงผ่าน ImageCache)
+        cache = ImageCache ที่ผู้เรียกเปิดไว้แล้ว (ใช้ connection เดียวกัน ไม่แย่ง write lock กัน)
+        เกิน max_seconds แล้วหยุด (ทั้งดาวน์โหลดและเรนเดอร์) รูปที่เหลือทำต่อรอบหน้า"""
+        if Image is None:
+            print("❌ ต้องติดตั้ง pillow ก่อน: pip install pillow")
+            return 0
+
+        image_urls = [url for url in dict.fromkeys(image_urls) if url and not self.get(url)]
+        started = time.perf_counter()
+        tasks = {}
+        if not image_urls:
+            return 0
+        # เปิด cache ในเธรดที่เรียก (SQLite connection ใช้ข้ามเธรดไม่ได้)
+        own_cache = cache is None
+        if own_cache:
+            cache = ImageCache(self.cache_root)
+        try:
+            downloader = AsyncImageDownloader(cache, revalidate=False)
+            originals = asyncio.run(downloader.download_all(image_urls, max_seconds=max_seconds))
+            for image_url, (digest, source_path) in originals.items():
+                self.urls[image_url] = digest
+                if digest not in self.placeholders:
+                    tasks[digest] = {'source': str(source_path), 'digest': digest,
+                                     'width': self.width, 'quality': self.quality}
+        finally:
+            if own_cache:
+                cache.close()
+            else:
+                cache.commit()
+
+        if tasks:
+            with ProcessPoolExecutor(max_workers=self.workers or os.cpu_count() or 1) as executor:
+                futures = [executor.submit(render_placeholder, task) for task in tasks.values()]
+                for future in as_completed(futures):
+                    if max_seconds and time.perf_counter() - started > max_seconds:
+                        for pending in futures:
+                            pending.cancel()
+                    if future.cancelled():
+                        continue
+                    try:
+                        result = future.result()
+                    except Exception as e:
+                        print(f"   ⚠️ สร้าง placeholder ไม่สำเร็จ: {e}")
+                        continue
+                    self.placeholders[result['digest']] = result['data_uri']
+            sizes = [len(self.placeholders[d]) for d in tasks if d in self.placeholders]
+            print(f"🌫️ สร้าง LQIP {len(sizes)} รูป ใน {time.perf_counter() - started:.2f} วินาที"
+                  f" (เฉลี่ย {sum(sizes) / max(1, len(sizes)):.0f} ไบต์)")
+        self.save()
+        return len(tasks)
+
+    def background_style(self, image_url):
+        """style สำหรับแสดง LQIP เป็นพื้นหลังของ <img> ระหว่างรอรูปจริง"""
+        data_uri = self.get(image_url)
+        if not data_uri:
+            return ""
+        return f"background: #e9ecef url({data_uri}) center / cover no-repeat;"
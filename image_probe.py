@@ -0,0 +1,317 @@
+#!/usr/bin/env python3
+"""
+Image Dimension Probe
+อ่านเฉพาะส่วนหัวไฟล์ (JPEG/PNG/WebP/AVIF) เพื่อหาขนาดจริงของรูปโดยไม่ต้องโหลดทั้งไฟล์
+- URL ใช้ HTTP Range อ่านทีละ chunk จนพอ (server ที่ไม่รองรับ Range ก็ตัดการเชื่อมต่อเมื่อได้ข้อมูลพอ)
+- ไฟล์ในเครื่องอ่านเฉพาะส่วนต้น
+- ผลลัพธ์แคชตาม URL ไว้ในไฟล์ JSON
+"""
+
+import asyncio
+import json
+import logging
+import os
+import struct
+from pathlib import Path
+from typing import Dict, Iterable, Optional, Tuple
+from urllib.parse import urlparse
+
+import aiohttp
+
+logger = logging.getLogger(__name__)
+
+# SOF markers ที่มีขนาดรูป (ไม่รวม DHT=C4, JPG=C8, DAC=CC)
+JPEG_SOF_MARKERS = {0xC0, 0xC1, 0xC2, 0xC3, 0xC5, 0xC6, 0xC7, 0xC9, 0xCA, 0xCB, 0xCD, 0xCE, 0xCF}
+JPEG_STANDALONE_MARKERS = {0x01, 0xD8} | set(range(0xD0, 0xD8))
+
+
+class NeedMoreData(Exception):
+    """ข้อมูลยังไม่พอจะอ่านส่วนหัว - ต้องอ่านอย่างน้อย needed ไบต์"""
+
+    def __init__(self, needed: int):
+        super().__init__(f"need {needed} bytes")
+        self.needed = needed
+
+
+def _jpeg_orientation(segment: bytes) -> int:
+    """อ่าน EXIF orientation จาก APP1 (คืนค่า 1 ถ้าไม่มี)"""
+    if not segment.startswith(b'Exif\x00\x00') or len(segment) < 14:
+        return 1
+    tiff = segment[6:]
+    endian = '<' if tiff[:2] == b'II' else '>'
+    try:
+        ifd_offset = struct.unpack(endian + 'I', tiff[4:8])[0]
+        count = struct.unpack(endian + 'H', tiff[ifd_offset:ifd_offset + 2])[0]
+        for i in range(count):
+            entry = tiff[ifd_offset + 2 + i * 12:ifd_offset + 14 + i * 12]
+            if len(entry) < 12:
+                break
+            tag = struct.unpack(endian + 'H', entry[:2])[0]
+            if tag == 0x0112:
+                return struct.unpack(endian + 'H', entry[8:10])[0]
+    except struct.error:
+        pass
+    return 1
+
+
+def _jpeg_dimensions(data: bytes) -> Optional[Tuple[int, int]]:
+    orientation = 1
+    pos = 2
+    while True:
+        if pos + 4 > len(data):
+            raise NeedMoreData(pos + 4)
+        if data[pos] != 0xFF:
+            return None
+        marker = data[pos + 1]
+        if marker == 0xFF:
+            # fill byte
+            pos += 1
+            continue
+        if marker in JPEG_STANDALONE_MARKERS:
+            pos += 2
+            continue
+        length = struct.unpack('>H', data[pos + 2:pos + 4])[0]
+        if marker in JPEG_SOF_MARKERS:
+            if pos + 9 > len(data):
+                raise NeedMoreData(pos + 9)
+            height, width = struct.unpack('>HH', data[pos + 5:pos + 9])
+            # orientation 5-8 = หมุน 90/270 องศา เบราว์เซอร์แสดงกว้างสลับกับสูง
+            return (height, width) if orientation >= 5 else (width, height)
+        if marker == 0xE1 and orientation == 1:
+            orientation = _jpeg_orientation(data[pos + 4:pos + 2 + length])
+        if marker == 0xDA:
+            return None
+        pos += 2 + length
+
+
+def _png_dimensions(data: bytes) -> Optional[Tuple[int, int]]:
+    if len(data) < 24:
+        raise NeedMoreData(24)
+    if data[12:16] != b'IHDR':
+        return None
+    return struct.unpack('>II', data[16:24])
+
+
+def _webp_dimensions(data: bytes) -> Optional[Tuple[int, int]]:
+    if len(data) < 30:
+        raise NeedMoreData(30)
+    chunk = data[12:16]
+    if chunk == b'VP8 ':
+        if data[23:26] != b'\x9d\x01\x2a':
+            return None
+        width, height = struct.unpack('<HH', data[26:30])
+        return width & 0x3FFF, height & 0x3FFF
+    if chunk == b'VP8L':
+        if data[20] != 0x2F:
+            return None
+        bits = struct.unpack('<I', data[21:25])[0]
+        return (bits & 0x3FFF) + 1, ((bits >> 14) & 0x3FFF) + 1
+    if chunk == b'VP8X':
+        width = int.from_bytes(data[24:27], 'little') + 1
+        height = int.from_bytes(data[27:30], 'little') + 1
+        return width, height
+    return None
+
+
+def _iter_boxes(data: bytes, start: int, end: int):
+    """วนกล่อง ISOBMFF คืนค่า (type, payload_start, box_end)"""
+    pos = start
+    while pos + 8 <= end:
+        size, box_type = struct.unpack('>I4s', data[pos:pos + 8])
+        header = 8
+        if size == 1:
+            if pos + 16 > len(data):
+                raise NeedMoreData(pos + 16)
+            size = struct.unpack('>Q', data[pos + 8:pos + 16])[0]
+            header = 16
+        elif size == 0:
+            size = end - pos
+        if size < header:
+            return
+        yield box_type, pos + header, pos + size
+        pos += size
+
+
+def _avif_dimensions(data: bytes) -> Optional[Tuple[int, int]]:
+    """หา ispe (ขนาดภาพ) ใน meta/iprp/ipco และ irot (การหมุน)"""
+    for box_type, payload, box_end in _iter_boxes(data, 0, max(len(data), 16)):
+        if box_type != b'meta':
+            continue
+        if box_end > len(data):
+            raise NeedMoreData(box_end)
+        # meta เป็น full box: ข้าม version/flags 4 ไบต์
+        for child, child_payload, child_end in _iter_boxes(data, payload + 4, box_end):
+            if child != b'iprp':
+                continue
+            for prop, prop_payload, prop_end in _iter_boxes(data, child_payload, child_end):
+                if prop != b'ipco':
+                    continue
+                size = None
+                rotated = False
+                for item, item_payload, _ in _iter_boxes(data, prop_payload, prop_end):
+                    # ispe แรกเป็นของภาพหลักในไฟล์ทั่วไป (ภาพ alpha/thumbnail ตามมาทีหลัง)
+                    if item == b'ispe' and size is None:
+                        size = struct.unpack('>II', data[item_payload + 4:item_payload + 12])
+                    elif item == b'irot':
+                        rotated = data[item_payload] & 0x3 in (1, 3)
+                if size:
+                    return (size[1], size[0]) if rotated else size
+        return None
+    if len(data) < 64 * 1024:
+        raise NeedMoreData(len(data) * 2)
+    return None
+
+
+def parse_dimensions(data: bytes) -> Optional[Tuple[int, int]]:
+    """คืนค่า (width, height) ตามที่เบราว์เซอร์แสดงผล, None ถ้าไม่รู้จัก format
+    raise NeedMoreData ถ้าต้องอ่านเพิ่ม"""
+    if len(data) < 16:
+        raise NeedMoreData(16)
+    if data[:2] == b'\xff\xd8':
+        return _jpeg_dimensions(data)
+    if data[:8] == b'\x89PNG\r\n\x1a\n':
+        return _png_dimensions(data)
+    if data[:4] == b'RIFF' and data[8:12] == b'WEBP':
+        return _webp_dimensions(data)
+    if data[4:8] == b'ftyp' and data[8:12] in (b'avif', b'avis', b'mif1', b'msf1'):
+        return _avif_dimensions(data)
+    return None
+
+
+class ImageProbe:
+    """หาขนาดรูปจากส่วนหัวไฟล์ พร้อมแคชตาม URL"""
+
+    def __init__(self, cache_file: Path, max_bytes: int = 256 * 1024, chunk_size: int = 4096,
+                 concurrency: int = 8, timeout: int = 15):
+        self.cache_file = Path(cache_file)
+        self.max_bytes = max_bytes
+        self.chunk_size = chunk_size
+        self.concurrency = concurrency
+        self.timeout = timeout
+        self.dimensions: Dict[str, Tuple[int, int]] = {}
+        self.dirty = False
+        self.stats = {'probed': 0, 'bytes_read': 0, 'failed': 0}
+        self.load()
+
+    def load(self):
+        try:
+            with open(self.cache_file, 'r', encoding='utf-8') as f:
+                self.dimensions = {url: tuple(size) for url, size in json.load(f).items()}
+        except (FileNotFoundError, json.JSONDecodeError):
+            self.dimensions = {}
+
+    def save(self):
+        if not self.dirty:
+            return
+        self.cache_file.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.cache_file.with_suffix('.tmp')
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(self.dimensions, f)
+        os.replace(tmp_path, self.cache_file)
+        self.dirty = False
+
+    def get(self, url: str) -> Optional[Tuple[int, int]]:
+        return self.dimensions.get(url)
+
+    def remember(self, url: str, size: Tuple[int, int]):
+        self.dimensions[url] = tuple(size)
+        self.dirty = True
+
+    def _parse_progressive(self, data: bytes) -> Tuple[Optional[Tuple[int, int]], int]:
+        """คืนค่า (ขนาด, จำนวนไบต์ที่ต้องมีก่อนลองใหม่)"""
+        try:
+            return parse_dimensions(data), 0
+        except NeedMoreData as e:
+            return None, e.needed
+
+    def probe_file(self, path: Path) -> Optional[Tuple[int, int]]:
+        with open(path, 'rb') as f:
+            data = f.read(self.chunk_size)
+            while True:
+                size, needed = self._parse_progressive(data)
+                if not needed or len(data) >= self.max_bytes:
+                    self.stats['bytes_read'] += len(data)
+                    return size
+                more = f.read(max(needed - len(data), self.chunk_size))
+                if not more:
+                    self.stats['bytes_read'] += len(data)
+                    return None
+                data += more
+
+    async def probe_url(self, session: aiohttp.ClientSession, url: str) -> Optional[Tuple[int, int]]:
+        headers = {'Range': f'bytes=0-{self.max_bytes - 1}'}
+        async with session.get(url, headers=headers, timeout=self.timeout) as response:
+            if response.status not in (200, 206):
+                raise Exception(f"status {response.status}")
+            data = b''
+            needed = 16
+            async for chunk in response.content.iter_chunked(self.chunk_size):
+                data += chunk
+                if len(data) < needed:
+                    continue
+                size, needed = self._parse_progressive(data)
+                if not needed or len(data) >= self.max_bytes:
+                    break
+            else:
+                size, _ = self._parse_progressive(data)
+            self.stats['bytes_read'] += len(data)
+            # ออกจาก context โดยไม่อ่านต่อ - server ที่ไม่รองรับ Range จะถูกตัดตรงนี้
+            return size
+
+    async def probe_many(self, urls: Iterable[str], session: Optional[aiohttp.ClientSession] = None
+                         ) -> Dict[str, Tuple[int, int]]:
+        """หาขนาดของทุก URL ที่ยังไม่อยู่ในแคช คืนค่าขนาดของทุก URL ที่รู้"""
+        urls = list(dict.fromkeys(url for url in urls if url))
+        missing = [url for url in urls if url not in self.dimensions]
+        if missing:
+            semaphore = asyncio.Semaphore(self.concurrency)
+            own_session = session is None
+            if own_session:
+                session = aiohttp.ClientSession()
+            try:
+                async def probe_one(url: str):
+                    async with semaphore:
+                        try:
+                            if urlparse(url).scheme in ('http', 'https'):
+                                size = await self.probe_url(session, url)
+                            else:
+                                size = await asyncio.to_thread(self.probe_file, Path(url))
+                        except Exception as e:
+                            logger.warning(f"⚠️ Cannot probe image size {url}: {str(e)}")
+                            size = None
+                        self.stats['probed'] += 1
+                        if size:
+                            self.remember(url, size)
+                        else:
+                            self.stats['failed'] += 1
+
+                await asyncio.gather(*[probe_one(url) for url in missing])
+            finally:
+                if own_session:
+                    await session.close()
+                # ถูกยกเลิกเพราะหมดเวลาก็เก็บขนาดที่อ่านได้แล้วไว้
+                self.save()
+            logger.info(f"📐 Probed {len(missing)} images ({self.stats['bytes_read'] / 1024:.1f} KB read, "
+                        f"{self.stats['failed']} failed)")
+        return {url: self.dimensions[url] for url in urls if url in self.dimensions}
+
+
+def scaled_height(size: Optional[Tuple[int, int]], width: int) -> Optional[int]:
+    """ความสูงเมื่อย่อรูปให้กว้าง width ตามสัดส่วนจริง"""
+    if not size or not size[0]:
+        return None
+    return max(1, round(size[1] * width / size[0]))
+
+
+if __name__ == '__main__':
+    import argparse
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    parser = argparse.ArgumentParser(description='อ่านขนาดรูปจากส่วนหัวไฟล์')
+    parser.add_argument('urls', nargs='+', help='URL หรือ path ของรูป')
+    parser.add_argument('--cache', default='.image-cache/dimensions.json', help='ไฟล์แคชขนาดรูป')
+    args = parser.parse_args()
+
+    probe = ImageProbe(Path(args.cache))
+    for url, (width, height) in asyncio.run(probe.probe_many(args.urls)).items():
+        print(f"{width}x{height}\t{url}")
@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+🎯 Perceptual Quality Search - หา quality ต่ำสุดที่ยังดูเหมือนต้นฉบับ
+
+- วัดความเหมือนด้วย SSIM (ช่องความสว่าง) เทียบกับต้นฉบับที่ย่อขนาดเท่ากัน
+- binary search quality ของ WebP/AVIF จนได้ค่าต่ำสุดที่ SSIM ยังถึงเป้า
+- รูปเรียบๆ ได้ quality ต่ำ (ไฟล์เล็ก) รูปรายละเอียดเยอะได้ quality สูง (ไม่มี artifact)
+"""
+
+import io
+
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover - ต้องติดตั้ง numpy สำหรับการวัด SSIM
+    np = None
+
+try:
+    from PIL import Image, ImageOps
+except ImportError:  # pragma: no cover
+    Image = None
+
+# ช่วง quality ที่ค้นหาของแต่ละ format
+QUALITY_RANGES = {
+    'webp': (30, 95),
+    'avif': (20, 90),
+}
+
+SSIM_WINDOW = 8
+
+
+def _box_mean(x, k=SSIM_WINDOW):
+    """ค่าเฉลี่ยในหน้าต่าง k x k ทุกตำแหน่ง (integral image - ไม่ต้องใช้ scipy)"""
+    s = np.pad(x, ((1, 0), (1, 0))).cumsum(axis=0).cumsum(axis=1)
+    return (s[k:, k:] - s[:-k, k:] - s[k:, :-k] + s[:-k, :-k]) / (k * k)
+
+
+def ssim(reference, candidate):
+    """SSIM เฉลี่ยของภาพ grayscale สองภาพขนาดเท่ากัน (1.0 = เหมือนกันทุกพิกเซล)"""
+    a = np.asarray(reference, dtype=np.float64)
+    b = np.asarray(candidate, dtype=np.float64)
+    if min(a.shape) < SSIM_WINDOW:
+        return 1.0 if np.array_equal(a, b) else float(1.0 - np.abs(a - b).mean() / 255.0)
+
+    c1 = (0.01 * 255) ** 2
+    c2 = (0.03 * 255) ** 2
+    mu_a = _box_mean(a)
+    mu_b = _box_mean(b)
+    var_a = _box_mean(a * a) - mu_a ** 2
+    var_b = _box_mean(b * b) - mu_b ** 2
+    covar = _box_mean(a * b) - mu_a * mu_b
+    ssim_map = ((2 * mu_a * mu_b + c1) * (2 * covar + c2)) / ((mu_a ** 2 + mu_b ** 2 + c1) * (var_a + var_b + c2))
+    return float(ssim_map.mean())
+
+
+def encode(image, save_format, settings, quality):
+    buffer = io.BytesIO()
+    image.save(buffer, save_format, **dict(settings, quality=quality))
+    return buffer.getvalue()
+
+
+def score(image, reference_luma, save_format, settings, quality):
+    """encode แล้ว decode กลับมาวัด SSIM คืนค่า (ssim, bytes)"""
+    data = encode(image, save_format, settings, quality)
+    with Image.open(io.BytesIO(data)) as decoded:
+        return ssim(reference_luma, decoded.convert('L')), len(data)
+
+
+def search_quality(task):
+    """หา quality ต่ำสุดที่ SSIM >= เป้า ของแต่ละ format (รันใน worker process)
+
+    task: source, width (ขนาดอ้างอิงที่ใช้วัด), target, formats = {fmt: settings ของ Pillow}
+    คืนค่า {fmt: {quality, ssim, bytes, baseline_quality, baseline_bytes, encodes}}"""
+    with Image.open(task['source']) as original:
+        image = ImageOps.exif_transpose(original).convert('RGB')
+    width = min(task['width'], image.width)
+    if width != image.width:
+        image = image.resize((width, max(1, round(image.height * width / image.width))), Image.LANCZOS)
+    reference_luma = image.convert('L')
+
+    results = {}
+    for fmt, settings in task['formats'].items():
+        settings = dict(settings)
+        save_format = settings.pop('format')
+        baseline_quality = settings.pop('quality')
+        baseline_bytes = len(encode(image, save_format, settings, baseline_quality))
+
+        lo, hi = QUALITY_RANGES[fmt]
+        best = None
+        encodes = 1
+        while lo <= hi:
+            mid = (lo + hi) // 2
+            value, size = score(image, reference_luma, save_format, settings, mid)
+            encodes += 1
+            if value >= task['target']:
+                best = (mid, value, size)
+                hi = mid - 1
+            else:
+                lo = mid + 1
+
+        if best is None:
+            # ถึงเป้าไม่ได้ในช่วงที่ค้น - ใช้ quality สูงสุดของช่วง
+            top = QUALITY_RANGES[fmt][1]
+            value, size = score(image, reference_luma, save_format, settings, top)
+            best = (top, value, size)
+            encodes += 1
+
+        results[fmt] = {
+            'quality': best[0],
+            'ssim': round(best[1], 5),
+            'bytes': best[2],
+            'baseline_quality': baseline_quality,
+            'baseline_bytes': baseline_bytes,
+            'encodes': encodes,
+        }
+    return results
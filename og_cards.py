@@ -0,0 +1,292 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+🪪 Open Graph Cards - รูปแชร์ขนาด 1200x630 ของรถแต่ละคัน
+
+- รูปรถเต็มการ์ด + แถบไล่สีด้านล่าง + ชื่อรถ + ราคา (บาท) + ชื่อเว็บ
+- เรนเดอร์บน process pool ต้นฉบับดึงผ่าน ImageCache (ใช้ร่วมกับ optimize_images)
+- แคชตาม hash ของข้อมูลที่ใช้สร้าง (digest รูป, ชื่อ, ราคา, template) - สร้างใหม่เฉพาะคันที่เปลี่ยน
+- จำกัดเวลาได้ (max_seconds) การ์ดที่ยังไม่ได้ทำจะทำต่อใน build รอบหน้า
+- ฟอนต์ไทย: fonts/Prompt-SemiBold.ttf (Google Fonts, SIL OFL) หรือ OG_CARD_FONT - ไม่มีฟอนต์ไทยจะไม่สร้างการ์ด
+
+การใช้งาน:
+    python og_cards.py --api local
+"""
+
+import asyncio
+import hashlib
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pathlib import Path
+
+from image_cache import ImageCache
+from image_downloader import AsyncImageDownloader
+
+try:
+    from PIL import Image, ImageDraw, ImageFont, ImageOps
+except ImportError:  # pragma: no cover - ต้องติดตั้ง pillow สำหรับการสร้างการ์ด
+    Image = None
+
+CARD_SIZE = (1200, 630)
+# เปลี่ยนค่านี้เมื่อแก้หน้าตาการ์ด เพื่อให้สร้างใหม่ทั้งหมด
+OG_CARD_VERSION = 1
+BRAND_COLOR = (244, 123, 32)
+BACKGROUND_COLOR = (52, 58, 64)
+
+# ฟอนต์ที่มาพร้อม repo (Prompt, SIL OFL) - อ้างจากที่อยู่ของไฟล์นี้ ไม่ขึ้นกับ working directory
+FONT_DIR = Path(__file__).resolve().parent / "fonts"
+
+# ฟอนต์ที่มีตัวอักษรไทย (ตั้ง OG_CARD_FONT เพื่อใช้ฟอนต์อื่น)
+THAI_FONT_CANDIDATES = [
+    str(FONT_DIR / "Prompt-SemiBold.ttf"),
+    "/usr/share/fonts/truetype/noto/NotoSansThai-Bold.ttf",
+    "/usr/share/fonts/opentype/noto/NotoSansThai-Bold.ttf",
+    "/usr/share/fonts/truetype/tlwg/Garuda-Bold.ttf",
+    "/usr/share/fonts/opentype/tlwg/Garuda-Bold.otf",
+    "/usr/share/fonts/truetype/thai-tlwg/Garuda-Bold.ttf",
+    "/Library/Fonts/Thonburi.ttc",
+    "/System/Library/Fonts/Thonburi.ttc",
+    "C:/Windows/Fonts/leelawdb.ttf",
+    "C:/Windows/Fonts/tahomabd.ttf",
+]
+
+
+def find_font():
+    """path ฟอนต์ไทยที่ใช้ได้ (None = ไม่มี - ไม่สร้างการ์ด เพราะฟอนต์เริ่มต้นของ Pillow แสดงภาษาไทยไม่ได้)"""
+    configured = os.environ.get("OG_CARD_FONT")
+    for candidate in ([configured] if configured else []) + THAI_FONT_CANDIDATES:
+        if Path(candidate).exists():
+            return str(candidate)
+    return None
+
+
+def load_font(font_path, size):
+    if font_path:
+        return ImageFont.truetype(font_path, size)
+    return ImageFont.load_default(size)
+
+
+def wrap_text(draw, text, font, max_width, max_lines):
+    """ตัดบรรทัดตามความกว้างจริงของตัวอักษร (ภาษาไทยไม่มีช่องว่างระหว่างคำ - ตัดตามตัวอักษรได้)"""
+    lines = []
+    current = ""
+    for word in text.split():
+        candidate = f"{current} {word}".strip()
+        if draw.textlength(candidate, font=font) <= max_width:
+            current = candidate
+            continue
+        if current:
+            lines.append(current)
+        current = ""
+        for char in word:
+            if draw.textlength(current + char, font=font) > max_width and current:
+                lines.append(current)
+                current = ""
+            current += char
+    if current:
+        lines.append(current)
+
+    if len(lines) > max_lines:
+        last = lines[max_lines - 1]
+        while last and draw.textlength(last + "…", font=font) > max_width:
+            last = last[:-1]
+        lines = lines[:max_lines - 1] + [last.rstrip() + "…"]
+    return lines
+
+
+def cover(image, size):
+    """ย่อ/crop ให้เต็มกรอบโดยไม่บิดสัดส่วน"""
+    return ImageOps.fit(image, size, Image.LANCZOS, centering=(0.5, 0.5))
+
+
+def render_og_card(task):
+    """สร้างการ์ดหนึ่งใบ (รันใน worker process)"""
+    width, height = CARD_SIZE
+    if task.get('source'):
+        with Image.open(task['source']) as original:
+            # JPEG ถอดรหัสแบบย่อได้ ไม่ต้อง decode รูปเต็มขนาด
+            original.draft('RGB', CARD_SIZE)
+            card = cover(ImageOps.exif_transpose(original).convert('RGB'), CARD_SIZE)
+    else:
+        card = Image.new('RGB', CARD_SIZE, BACKGROUND_COLOR)
+
+    # แถบไล่สีดำด้านล่างให้ตัวหนังสืออ่านง่ายบนทุกรูป
+    shade_top = int(height * 0.42)
+    gradient = Image.linear_gradient('L').resize((1, height - shade_top)).point(lambda v: int(v * 0.85))
+    shade = Image.new('RGB', (width, height - shade_top), (0, 0, 0))
+    card.paste(shade, (0, shade_top), gradient.resize((width, height - shade_top)))
+
+    draw = ImageDraw.Draw(card)
+    font_path = task.get('font')
+    title_font = load_font(font_path, 58)
+    price_font = load_font(font_path, 68)
+    site_font = load_font(font_path, 30)
+    margin = 60
+
+    price_text = f"฿{task['price']}"
+    price_box = draw.textbbox((0, 0), price_text, font=price_font)
+    price_y = height - margin - (price_box[3] - price_box[1]) - price_box[1]
+
+    title_lines = wrap_text(draw, task['title'], title_font, width - margin * 2, max_lines=2)
+    line_height = int(title_font.size * 1.25) if hasattr(title_font, 'size') else 64
+    title_y = price_y - 24 - line_height * len(title_lines)
+    for i, line in enumerate(title_lines):
+        draw.text((margin, title_y + i * line_height), line, font=title_font, fill=(255, 255, 255))
+
+    draw.text((margin, price_y), price_text, font=price_font, fill=BRAND_COLOR)
+
+    if task.get('site_name'):
+        site_width = draw.textlength(task['site_name'], font=site_font)
+        draw.rounded_rectangle((margin - 16, margin - 10, margin + site_width + 16, margin + 46),
+                               radius=12, fill=BRAND_COLOR)
+        draw.text((margin, margin), task['site_name'], font=site_font, fill=(255, 255, 255))
+
+    output = Path(task['output'])
+    output.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = output.with_suffix('.tmp')
+    card.save(tmp_path, 'JPEG', quality=85, optimize=True, progressive=True)
+    os.replace(tmp_path, output)
+    return {'handle': task['handle'], 'key': task['key'], 'bytes': output.stat().st_size}
+
+
+class OGCardBuilder:
+    """สร้างและจำการ์ด OG ของรถแต่ละคัน (handle -> hash ของข้อมูลที่ใช้สร้าง)"""
+
+    def __init__(self, output_dir="docs/og", cache_root=".image-cache", site_name="", workers=None,
+                 font_path=None):
+        self.output_dir = Path(output_dir)
+        self.cache_root = Path(cache_root)
+        self.store_file = self.cache_root / "og-cards.json"
+        self.site_name = site_name
+        self.workers = workers
+        self.font_path = font_path or find_font()
+        self.cards = {}
+        self.load()
+
+    def load(self):
+        try:
+            with open(self.store_file, "r", encoding="utf-8") as f:
+                self.cards = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            self.cards = {}
+
+    def save(self):
+        self.store_file.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.store_file.with_suffix(".tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self.cards, f)
+        os.replace(tmp_path, self.store_file)
+
+    def card_path(self, handle):
+        return self.output_dir / f"{handle}.jpg"
+
+    def card_url(self, handle):
+        """path ของการ์ดเทียบกับ docs/ (None ถ้ายังไม่ได้สร้างหรือไม่มีฟอนต์ไทย)"""
+        if self.font_path and handle in self.cards and self.card_path(handle).exists():
+            return f"{self.output_dir.name}/{handle}.jpg"
+        return None
+
+    def card_key(self, digest, title, price):
+        payload = {
+            'source': digest,
+            'title': title,
+            'price': price,
+            'site': self.site_name,
+            'font': Path(self.font_path).name if self.font_path else None,
+            'version': OG_CARD_VERSION,
+        }
+        return hashlib.sha256(json.dumps(payload, sort_keys=True, ensure_ascii=False).encode()).hexdigest()
+
+    def remove(self, handle):
+        """ลบการ์ดของรถที่ถูกลบออกจากร้าน"""
+        self.card_path(handle).unlink(missing_ok=True)
+        if self.cards.pop(handle, None):
+            self.save()
+
+    def build(self, cars, max_seconds=None):
+        """สร้างการ์ดของรถที่ข้อมูลเปลี่ยน cars = [(handle, title, ราคาที่จัดรูปแบบแล้ว, URL รูปแรก)]
+        max_seconds ครอบทั้งการดาวน์โหลดและการเรนเดอร์ - เกินแล้วหยุด ที่เหลือทำต่อรอบหน้า
+        คืนค่าจำนวนการ์ดที่สร้าง"""
+        if Image is None:
+            print("❌ ต้องติดตั้ง pillow ก่อน: pip install pillow")
+            return 0
+        if not self.font_path:
+            # การ์ดที่ตัวอักษรไทยเป็นกล่องแย่กว่าไม่มีการ์ด - หน้าเว็บใช้ og_image เดิมต่อ
+            print(f"⚠️ ไม่พบฟอนต์ภาษาไทย (วางไว้ที่ {FONT_DIR} หรือตั้ง OG_CARD_FONT) - ข้ามการสร้าง OG cards")
+            return 0
+
+        started = time.perf_counter()
+        cars = [car for car in cars if car[0]]
+        # เปิด cache ในเธรดที่เรียก (SQLite connection ใช้ข้ามเธรดไม่ได้)
+        cache = ImageCache(self.cache_root)
+        try:
+            downloader = AsyncImageDownloader(cache, revalidate=False)
+            originals = asyncio.run(downloader.download_all(
+                (image_url for _, _, _, image_url in cars if image_url), max_seconds=max_seconds))
+        finally:
+            cache.close()
+        if max_seconds and time.perf_counter() - started > max_seconds:
+            # ต้นฉบับที่ยังไม่มาจะได้การ์ดที่ไม่มีรูปรถ - รอให้ดาวน์โหลดครบในรอบหน้าแทน
+            print(f"⏱️ OG cards: หมดเวลา {max_seconds:.1f} วินาทีระหว่างดาวน์โหลด - ใช้การ์ดเดิมไปก่อน")
+            return 0
+
+        tasks = []
+        for handle, title, price, image_url in cars:
+            digest, source_path = originals.get(image_url, (None, None))
+            key = self.card_key(digest, title, price)
+            if self.cards.get(handle) == key and self.card_path(handle).exists():
+                continue
+            tasks.append({'handle': handle, 'key': key, 'title': title, 'price': price,
+                          'source': str(source_path) if source_path else None, 'site_name': self.site_name,
+                          'font': self.font_path, 'output': str(self.card_path(handle))})
+
+        built = []
+        if tasks:
+            with ProcessPoolExecutor(max_workers=self.workers or os.cpu_count() or 1) as executor:
+                futures = [executor.submit(render_og_card, task) for task in tasks]
+                for future in as_completed(futures):
+                    if max_seconds and time.perf_counter() - started > max_seconds:
+                        # งานที่ยังไม่เริ่มยกเลิกได้ - เหลือไว้ทำรอบหน้า
+                        for pending in futures:
+                            pending.cancel()
+                    if future.cancelled():
+                        continue
+                    try:
+                        result = future.result()
+                    except Exception as e:
+                        print(f"   ⚠️ สร้าง OG card ไม่สำเร็จ: {e}")
+                        continue
+                    self.cards[result['handle']] = result['key']
+                    built.append(result)
+            self.save()
+
+        elapsed = time.perf_counter() - started
+        print(f"🪪 OG cards: สร้าง {len(built)}/{len(tasks)} ใบ (ไม่เปลี่ยน {len(cars) - len(tasks)})"
+              f" ใน {elapsed:.2f} วินาที, เฉลี่ย {sum(r['bytes'] for r in built) / max(1, len(built)) / 1024:.1f} KB")
+        return len(built)
+
+
+if __name__ == "__main__":
+    import argparse
+
+    from python_ssr_generator import PythonSSRGenerator
+
+    parser = argparse.ArgumentParser(description="สร้างรูป Open Graph 1200x630 ของรถทุกคัน (เฉพาะคันที่เปลี่ยน)")
+    parser.add_argument("--api", default="local", help="แหล่งข้อมูลรถ (เหมือน python_ssr_generator.py)")
+    parser.add_argument("--workers", type=int, default=None, help="จำนวน worker processes (ค่าเริ่มต้น = จำนวน CPU)")
+    parser.add_argument("--max-seconds", type=float, default=None, help="เวลาสูงสุด ที่เหลือทำต่อรอบหน้า")
+    args = parser.parse_args()
+
+    generator = PythonSSRGenerator()
+    raw_data = asyncio.run(generator.fetch_api_data(args.api)) or {}
+    # ทุกคันในแคตตาล็อก (process_car_data ตัดเหลือแค่หน้า listing)
+    all_cars = []
+    for product in raw_data.get("products", []) if isinstance(raw_data, dict) else raw_data:
+        try:
+            all_cars.append(generator.normalize_car(product))
+        except Exception as e:
+            print(f"   ⚠️ ข้ามรถ {product.get('id', 'unknown')}: {e}")
+    generator.og_cards.workers = args.workers
+    generator.og_cards.build(generator.og_card_inputs(all_cars), max_seconds=args.max_seconds)
@@ -12,18 +12,311 @@ Features:
 """
 
 import json
+import os
+import re
+import time
 import requests
 from pathlib import Path
 import argparse
+import asyncio
 from urllib.parse import urlparse
 import hashlib
+from concurrent.futures import ProcessPoolExecutor
+
+from image_cache import ImageCache, fetch_original
+from image_dedupe import DuplicateFinder
+from image_jobs import ImageJobQueue, catalog_jobs
+from image_downloader import AsyncImageDownloader
+from image_placeholders import PlaceholderBuilder
+from image_quality import QUALITY_RANGES, np, search_quality
+from image_probe import ImageProbe, scaled_height
+from shopify_cdn import is_shopify_cdn, shopify_variants
+
+try:
+    from PIL import Image, ImageOps, features
+except ImportError:  # pragma: no cover - ต้องติดตั้ง pillow สำหรับการสร้างรูปจริง
+    Image = None
+
+# ขนาดรูป responsive (ความกว้าง x ความสูงอ้างอิง 4:3)
+VARIANT_SIZES = {
+    'thumb': (300, 225),     # Thumbnail
+    'medium': (600, 450),    # Medium
+    'large': (900, 675),     # Large
+    'xl': (1200, 900)        # Extra Large
+}
+
+# ค่าการบันทึกของแต่ละ format
+FORMAT_SETTINGS = {
+    'avif': {'format': 'AVIF', 'quality': 55, 'speed': 6},
+    'webp': {'format': 'WEBP', 'quality': 80, 'method': 6},
+    'jpg': {'format': 'JPEG', 'quality': 82, 'optimize': True, 'progressive': True},
+}
+
+# เปลี่ยนค่านี้เมื่อแก้ขั้นตอนใน render_variant เพื่อให้ variant เดิมในแคชใช้ไม่ได้
+RENDER_VERSION = 1
+
+# ความกว้างอ้างอิงที่ใช้ค้นหา quality ต่อรูป (ผลใช้กับทุกความกว้างของรูปนั้น)
+QUALITY_SEARCH_WIDTH = 600
+
+# สำเนาแคตตาล็อกสำหรับ deploy (รูปชุดเดียวกับ cars.json บางส่วน)
+MIRROR_CATALOGS = [
+    Path("online-deploy") / "api" / "cars.json",
+    Path("online-ready") / "api" / "cars.json",
+]
+
+# บริการรูปตัวอย่าง ไม่ใช่รูปรถจริง ไม่ต้องดาวน์โหลด/สร้าง variant
+PLACEHOLDER_HOSTS = {"via.placeholder.com"}
+
+# ความกว้างที่ห่างกันน้อยกว่านี้ (สัดส่วน) ถือว่าซ้ำกัน เก็บไว้แค่ตัวที่ใหญ่กว่า
+NEAR_DUPLICATE_RATIO = 1.15
+
+# sizes ของรูปใน gallery ตัวอย่าง
+GALLERY_SIZES = "(max-width: 600px) 300px, (max-width: 900px) 600px, 900px"
+
+# รูปแรกของ gallery ที่อยู่ใน HTML เลย รูปที่เหลืออยู่ใน manifest JSON โหลดเมื่อเลื่อนใกล้ถึง/กดดูทั้งหมด
+GALLERY_INLINE_IMAGES = 5
+
+# โหลด manifest ของ gallery แล้วต่อรูปที่เหลือท้าย gallery (ใช้ทั้ง image-optimization.js และหน้า detail)
+GALLERY_LOADER_JS = """
+(function () {
+  function loadGallery(more) {
+    if (more.dataset.loaded) return;
+    more.dataset.loaded = '1';
+    fetch(more.dataset.galleryManifest).then(function (response) {
+      if (!response.ok) throw new Error(response.status);
+      return response.json();
+    }).then(function (manifest) {
+      var fragment = document.createDocumentFragment();
+      manifest.images.forEach(function (image, i) {
+        var index = manifest.start + i;
+        var item = document.createElement('div');
+        item.className = 'gallery-item';
+        item.dataset.index = index;
+        var picture = document.createElement('picture');
+        var sources = image.sources || [];
+        sources.slice(0, -1).forEach(function (source) {
+          var element = document.createElement('source');
+          element.type = source[0];
+          element.srcset = source[1];
+          element.sizes = manifest.sizes;
+          picture.appendChild(element);
+        });
+        var img = document.createElement('img');
+        if (sources.length) {
+          img.srcset = sources[sources.length - 1][1];
+          img.sizes = manifest.sizes;
+        }
+        img.src = image.src;
+        img.alt = manifest.title + ' - รูปที่ ' + (index + 1);
+        if (image.w) { img.width = image.w; img.height = image.h; }
+        img.loading = 'lazy';
+        img.decoding = 'async';
+        img.onload = function () { img.classList.add('loaded'); };
+        picture.appendChild(img);
+        item.appendChild(picture);
+        fragment.appendChild(item);
+      });
+      more.parentNode.insertBefore(fragment, more);
+      more.remove();
+    }).catch(function () {
+      delete more.dataset.loaded;
+    });
+  }
+
+  document.querySelectorAll('[data-gallery-manifest]').forEach(function (more) {
+    more.querySelector('button').addEventListener('click', function () { loadGallery(more); });
+    if ('IntersectionObserver' in window) {
+      var observer = new IntersectionObserver(function (entries) {
+        if (entries[0].isIntersecting) {
+          observer.disconnect();
+          loadGallery(more);
+        }
+      }, { rootMargin: '300px 0px' });
+      observer.observe(more);
+    }
+  });
+})();
+"""
+
+
+def variant_widths(source_size):
+    """ความกว้างของ variant ที่ควรสร้างจากขนาดต้นฉบับจริง
+    - ไม่เกินความกว้างต้นฉบับ (ไม่ขยายรูป) แต่ใส่ความกว้างต้นฉบับเองถ้าเล็กกว่าขนาดใหญ่สุดในตาราง
+    - ความกว้างที่ใกล้กันเกินไปรวมเหลือตัวเดียว
+    - ไม่รู้ขนาด -> ใช้ทุกขนาดในตาราง"""
+    standard = sorted(w for w, _ in VARIANT_SIZES.values())
+    if not source_size:
+        return standard
+
+    source_width = source_size[0]
+    candidates = [w for w in standard if w < source_width] + [min(source_width, standard[-1])]
+    widths = []
+    for width in sorted(set(candidates)):
+        if widths and width / widths[-1] < NEAR_DUPLICATE_RATIO:
+            widths[-1] = width
+        else:
+            widths.append(width)
+    return widths
+
+
+def pick_variant(variants, target_width):
+    """variant ที่เล็กที่สุดซึ่งกว้างอย่างน้อย target_width (ไม่มีก็ใช้ตัวใหญ่สุด)"""
+    for variant in variants:
+        if variant['width'] >= target_width:
+            return variant
+    return variants[-1]
+
+
+def srcset_formats(optimized):
+    """[(mime, srcset)] ตามลำดับที่เบราว์เซอร์เลือก: AVIF/WebP เฉพาะเมื่อมีครบทุกความกว้าง แล้วปิดด้วย JPEG"""
+    formats = []
+    for fmt, mime in (('avif', 'image/avif'), ('webp', 'image/webp'), ('jpg', 'image/jpeg')):
+        if all(opt.get(fmt) for opt in optimized):
+            formats.append((mime, ", ".join(f"{opt[fmt]} {opt['width']}w" for opt in optimized)))
+    return formats
+
+
+def picture_sources(optimized, sizes):
+    """<source> ของ <picture>"""
+    return "\n".join(f'  <source type="{mime}" srcset="{srcset}" sizes="{sizes}">'
+                     for mime, srcset in srcset_formats(optimized))
+
+
+def preload_link(optimized, sizes):
+    """preload ของรูป LCP ที่ตรงกับ <source> แรกของ <picture> (imagesrcset/imagesizes)
+    เบราว์เซอร์เลือกขนาดตาม viewport เหมือนตอนเลือกจาก <picture> จึงใช้ไฟล์เดียวกันไม่โหลดซ้ำ"""
+    mime, srcset = srcset_formats(optimized)[0]
+    return (f'<link rel="preload" as="image" imagesrcset="{srcset}" imagesizes="{sizes}"'
+            f' type="{mime}" fetchpriority="high">')
+
+
+def gallery_manifest_entry(image_url, optimized=None, size=None):
+    """รูปหนึ่งรูปใน gallery manifest: src (JPEG ขนาดกลาง), ขนาด และ srcset ต่อ format (ตัวสุดท้ายคือ JPEG)"""
+    if optimized:
+        default = pick_variant(optimized, 600)
+        return {'src': default['jpg'], 'w': default['width'], 'h': default['height'],
+                'sources': [list(source) for source in srcset_formats(optimized)]}
+    entry = {'src': image_url}
+    if size:
+        entry['w'], entry['h'] = size
+    return entry
+
+
+def gallery_manifest(title, sizes, entries, start=GALLERY_INLINE_IMAGES):
+    """manifest ของรูปที่ไม่ได้อยู่ใน HTML (alt สร้างจาก title + ลำดับรูปฝั่งเบราว์เซอร์)"""
+    return {'title': title, 'sizes': sizes, 'start': start, 'images': entries}
+
+
+def write_gallery_manifest(path, manifest):
+    """บันทึก manifest แบบกะทัดรัด (None = ลบไฟล์เดิม เมื่อรูปทั้งหมดอยู่ใน HTML แล้ว)"""
+    path = Path(path)
+    if manifest is None:
+        path.unlink(missing_ok=True)
+        return None
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_suffix(".tmp")
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, ensure_ascii=False, separators=(",", ":"))
+    os.replace(tmp_path, path)
+    return path
+
+
+def gallery_more_html(manifest_url, total):
+    """ปุ่มดูรูปทั้งหมดท้าย gallery - JS โหลด manifest เมื่อเลื่อนใกล้ถึงหรือกดปุ่ม"""
+    return (f'<div class="gallery-more" data-gallery-manifest="{manifest_url}">\n'
+            f'  <button type="button">ดูรูปทั้งหมด ({total} รูป)</button>\n'
+            f'</div>')
+
+
+def variant_settings(fmt, quality=None):
+    """ค่าการบันทึกของ format (quality จากการค้นหาแทนค่าคงที่ถ้ามี)"""
+    settings = dict(FORMAT_SETTINGS[fmt])
+    if quality is not None:
+        settings['quality'] = quality
+    return settings
+
+
+def avif_supported():
+    """Pillow รุ่นใหม่รองรับ AVIF ในตัว รุ่นเก่าต้องมี pillow-avif-plugin"""
+    if Image is None:
+        return False
+    try:
+        if features.check('avif'):
+            return True
+    except ValueError:
+        pass
+    try:
+        import pillow_avif  # noqa: F401
+        return True
+    except ImportError:
+        return False
+
+
+def render_variant(task):
+    """สร้างรูปหนึ่งขนาดจากต้นฉบับหนึ่งรูป ในทุก format (รันใน worker process)"""
+    started = time.perf_counter()
+    with Image.open(task['source']) as original:
+        # หมุนตาม EXIF orientation ก่อน แล้วค่อยทิ้ง metadata
+        image = ImageOps.exif_transpose(original)
+        icc_profile = original.info.get('icc_profile')
+
+        if image.mode not in ('RGB', 'RGBA'):
+            image = image.convert('RGBA' if 'transparency' in image.info else 'RGB')
+
+        # ย่อให้กว้างเท่าขนาดเป้าหมาย (ไม่ขยายรูปเล็ก) คงสัดส่วนจริงของรูป
+        width = min(task['width'], image.width)
+        height = max(1, round(image.height * width / image.width))
+        if (width, height) != image.size:
+            image = image.resize((width, height), Image.LANCZOS)
+
+        outputs = {}
+        for fmt in task['formats']:
+            settings = variant_settings(fmt, task.get('qualities', {}).get(fmt))
+            save_format = settings.pop('format')
+            frame = image.convert('RGB') if save_format == 'JPEG' and image.mode != 'RGB' else image
+            # ไม่ส่ง exif/xmp ต่อ -> metadata ถูกตัดทิ้ง (เก็บ ICC ไว้เพื่อสีที่ถูกต้อง)
+            if icc_profile:
+                settings['icc_profile'] = icc_profile
+            output_path = Path(task['outputs'][fmt])
+            output_path.parent.mkdir(parents=True, exist_ok=True)
+            frame.save(output_path, save_format, **settings)
+            outputs[fmt] = {'path': str(output_path), 'bytes': output_path.stat().st_size}
+
+    return {
+        'source': task['source'],
+        'size_name': task['size_name'],
+        'width': width,
+        'height': height,
+        'outputs': outputs,
+        'seconds': time.perf_counter() - started,
+    }
 
 
 class ImageOptimizer:
-    def __init__(self):
+    def __init__(self, cache_max_mb=2048, max_connections=16, per_host_connections=4, target_ssim=None,
+                 dedupe_threshold=6):
         self.cars_data = self.load_cars_data()
-        self.optimization_cache = {}
+        self.mirror_catalogs = self.load_mirror_catalogs()
+        # เป้า SSIM สำหรับค้นหา quality ต่อรูป (None = ใช้ quality คงที่ใน FORMAT_SETTINGS)
+        self.target_ssim = target_ssim
+        self.quality_file = Path(".image-cache") / "quality-search.json"
+        self.quality_results = self.load_quality_results()
+        self.max_connections = max_connections
+        self.per_host_connections = per_host_connections
+        self.cache = ImageCache(max_bytes=cache_max_mb * 1024 * 1024)
         self.processed_images = set()
+        self.image_probe = ImageProbe(Path(".image-cache") / "dimensions.json")
+        self.placeholders = PlaceholderBuilder()
+        self.variants_dir = Path("docs") / "images" / "variants"
+        # path ของ variants ที่ใช้ใน HTML (หน้าเว็บอยู่ใน docs/)
+        self.variants_url = "images/variants"
+        # รูปที่ perceptual hash ต่างกันไม่เกิน dedupe_threshold บิตถือเป็นรูปเดียวกัน (0 = ปิด)
+        self.dedupe_threshold = dedupe_threshold
+        self.duplicates = DuplicateFinder(Path(".image-cache") / "perceptual-hashes.json",
+                                          threshold=dedupe_threshold)
+        self.duplicate_of = {}
+        # คิวงานรูปภาพ: ทำต่อจากเดิมได้หลังโปรเซสตาย รูป hero/หน้าแรกก่อน
+        self.jobs = ImageJobQueue(Path(".image-cache") / "jobs.sqlite3")
 
     def load_cars_data(self):
         """โหลดข้อมูลรถจาก cars.json"""
@@ -34,66 +327,94 @@ class ImageOptimizer:
             print("❌ ไม่พบไฟล์ cars.json")
             return []
 
+    def load_mirror_catalogs(self):
+        """โหลดสำเนาแคตตาล็อกใน online-deploy/online-ready คืนค่า [(ชื่อ, รายการรถ)]"""
+        catalogs = []
+        for path in MIRROR_CATALOGS:
+            try:
+                with open(path, "r", encoding="utf-8") as f:
+                    data = json.load(f)
+            except (FileNotFoundError, json.JSONDecodeError):
+                continue
+            cars = data.get("products", []) if isinstance(data, dict) else data
+            catalogs.append((path.parts[0], cars))
+        return catalogs
+
+    def catalog_cars(self):
+        """(ชื่อแคตตาล็อก, [URL รูปของรถหนึ่งคัน]) ตามลำดับใน cars.json และสำเนา"""
+        for name, cars in [("cars.json", self.cars_data)] + self.mirror_catalogs:
+            for car in cars:
+                images = []
+                for image_url in car.get("images", []):
+                    if isinstance(image_url, dict):
+                        image_url = image_url.get("src", "")
+                    if image_url and urlparse(image_url).netloc not in PLACEHOLDER_HOSTS:
+                        images.append(image_url)
+                yield name, images
+
+    def catalog_images(self):
+        """(ชื่อแคตตาล็อก, URL รูป) ของทุกรูปใน cars.json และสำเนา"""
+        for name, images in self.catalog_cars():
+            for image_url in images:
+                yield name, image_url
+
     def get_image_hash(self, image_url):
         """สร้าง hash สำหรับ cache image"""
         return hashlib.md5(image_url.encode()).hexdigest()[:8]
 
     def get_optimized_image_urls(self, original_url):
-        """สร้าง URLs สำหรับรูปที่ optimize แล้ว"""
-        # Shopify CDN transformation parameters
-        base_url = original_url.split('?')[0]  # Remove existing parameters
-        
-        # Different sizes for responsive images
-        sizes = {
-            'thumb': '_300x225',     # Thumbnail (300x225)
-            'medium': '_600x450',    # Medium (600x450) 
-            'large': '_900x675',     # Large (900x675)
-            'xl': '_1200x900'        # Extra Large (1200x900)
-        }
-        
-        optimized_urls = {}
-        
-        for size_name, size_suffix in sizes.items():
-            # WebP format (better compression)
-            webp_url = f"{base_url}{size_suffix}.webp"
-            # JPG fallback
-            jpg_url = f"{base_url}{size_suffix}.jpg"
-            
-            optimized_urls[size_name] = {
-                'webp': webp_url,
-                'jpg': jpg_url,
-                'width': int(size_suffix.split('x')[0][1:]),
-                'height': int(size_suffix.split('x')[1])
-            }
+        """สร้าง URLs สำหรับรูปที่ optimize แล้ว (เรียงตามความกว้าง เฉพาะขนาดที่ไม่ขยายต้นฉบับ)
+        - Shopify CDN: ให้ CDN ย่อ/แปลง format เอง (คง v= ไว้)
+        - host อื่น: variants ที่สร้างไว้แล้วใน docs/images/variants (ยังไม่มีก็ใช้ต้นฉบับ)"""
+        size = self.image_probe.get(original_url)
+        if not is_shopify_cdn(original_url):
+            return self.get_local_variant_urls(original_url, size)
         
-        return optimized_urls
+        # Shopify CDN transformation parameters (WebP + progressive JPG fallback)
+        return shopify_variants(original_url, variant_widths(size), size)
+
+    def get_local_variant_urls(self, original_url, size):
+        """URL ของ variants ที่ generate_variants สร้างไว้ (หาไฟล์จาก digest ของต้นฉบับในแคช)"""
+        original = self.cached_original(original_url)
+        widths = {}
+        if original:
+            for variant_path in self.variants_dir.glob(f"{original[0][:16]}_*w.*"):
+                match = re.search(r"_(\d+)w\.(\w+)$", variant_path.name)
+                if match:
+                    widths.setdefault(int(match.group(1)), {})[match.group(2)] = f"{self.variants_url}/{variant_path.name}"
+
+        optimized_urls = []
+        for width in sorted(widths):
+            files = widths[width]
+            if 'jpg' not in files:
+                continue
+            optimized_urls.append({
+                'avif': files.get('avif'),
+                'webp': files.get('webp'),
+                'jpg': files['jpg'],
+                'width': width,
+                'height': scaled_height(size, width) or round(width * 3 / 4),
+            })
+        if optimized_urls:
+            return optimized_urls
+
+        # ยังไม่ได้สร้าง variants: ใช้ต้นฉบับตรงๆ
+        width, height = size or VARIANT_SIZES['medium']
+        return [{'avif': None, 'webp': None, 'jpg': original_url, 'width': width, 'height': height}]
 
     def generate_responsive_image_html(self, image_url, alt_text, loading="lazy"):
         """สร้าง HTML สำหรับ responsive images with WebP support"""
         optimized = self.get_optimized_image_urls(image_url)
+        default = pick_variant(optimized, 600)
         
-        # สร้าง srcset สำหรับ WebP
-        webp_srcset = ", ".join([
-            f"{opt['webp']} {opt['width']}w" 
-            for opt in optimized.values()
-        ])
-        
-        # สร้าง srcset สำหรับ JPG fallback
-        jpg_srcset = ", ".join([
-            f"{opt['jpg']} {opt['width']}w"
-            for opt in optimized.values()
-        ])
-        
-        # sizes attribute สำหรับ responsive
-        sizes = "(max-width: 600px) 300px, (max-width: 900px) 600px, 900px"
+        sizes = GALLERY_SIZES
         
         html = f"""<picture>
-  <source type="image/webp" srcset="{webp_srcset}" sizes="{sizes}">
-  <source type="image/jpeg" srcset="{jpg_srcset}" sizes="{sizes}">
-  <img src="{optimized['medium']['jpg']}" 
+{picture_sources(optimized, sizes)}
+  <img src="{default['jpg']}" 
        alt="{alt_text}"
-       width="{optimized['medium']['width']}"
-       height="{optimized['medium']['height']}"
+       width="{default['width']}"
+       height="{default['height']}"
        loading="{loading}"
        decoding="async"
        style="object-fit: cover; width: 100%; height: auto;">
@@ -104,42 +425,34 @@ class ImageOptimizer:
     def generate_hero_image_html(self, image_url, alt_text):
         """สร้าง HTML สำหรับ hero images (LCP optimization)"""
         optimized = self.get_optimized_image_urls(image_url)
+        default = pick_variant(optimized, 900)
+        sizes = GALLERY_SIZES
         
-        # Hero images ต้อง preload และไม่ lazy load
-        webp_srcset = ", ".join([
-            f"{opt['webp']} {opt['width']}w" 
-            for opt in optimized.values()
-        ])
-        
-        jpg_srcset = ", ".join([
-            f"{opt['jpg']} {opt['width']}w"
-            for opt in optimized.values()
-        ])
-        
-        # Preload hint สำหรับ LCP
-        preload_html = f'<link rel="preload" as="image" href="{optimized["large"]["webp"]}" type="image/webp">'
+        # Preload hint สำหรับ LCP (Hero images ต้อง preload และไม่ lazy load)
+        preload_html = preload_link(optimized, sizes)
         
         html = f"""{preload_html}
 <picture>
-  <source type="image/webp" srcset="{webp_srcset}" sizes="(max-width: 600px) 300px, (max-width: 900px) 600px, 900px">
-  <source type="image/jpeg" srcset="{jpg_srcset}" sizes="(max-width: 600px) 300px, (max-width: 900px) 600px, 900px">
-  <img src="{optimized['large']['jpg']}" 
+{picture_sources(optimized, sizes)}
+  <img src="{default['jpg']}" 
        alt="{alt_text}"
-       width="{optimized['large']['width']}"
-       height="{optimized['large']['height']}"
+       width="{default['width']}"
+       height="{default['height']}"
        loading="eager"
        decoding="sync"
        fetchpriority="high"
-       style="object-fit: cover; width: 100%; height: auto;">
+       style="object-fit: cover; width: 100%; height: auto; {self.placeholders.background_style(image_url)}">
 </picture>"""
         
         return html
 
-    def generate_image_gallery_html(self, images, car_title):
-        """สร้าง HTML gallery สำหรับรูปรถ"""
+    def generate_image_gallery_html(self, images, car_title, manifest_path=None, manifest_url=None):
+        """สร้าง HTML gallery สำหรับรูปรถ
+        รูปแรก GALLERY_INLINE_IMAGES รูปอยู่ใน HTML ที่เหลือเขียนเป็น manifest ที่ manifest_path
+        (manifest_url = path ที่หน้าเว็บใช้โหลด) ไม่ระบุ manifest_path จะแสดงแค่รูปใน HTML"""
         gallery_html = '<div class="car-image-gallery">\n'
         
-        for i, image_url in enumerate(images[:5]):  # แสดงแค่ 5 รูปแรก
+        for i, image_url in enumerate(images[:GALLERY_INLINE_IMAGES]):
             alt_text = f"{car_title} - รูปที่ {i+1}"
             loading = "eager" if i == 0 else "lazy"  # รูปแรกไม่ lazy load
             
@@ -152,6 +465,19 @@ class ImageOptimizer:
             
             gallery_html += f'  <div class="gallery-item" data-index="{i}">\n    {image_html}\n  </div>\n'
         
+        remaining = images[GALLERY_INLINE_IMAGES:]
+        if manifest_path:
+            manifest = None
+            if remaining:
+                manifest = gallery_manifest(car_title, GALLERY_SIZES, [
+                    gallery_manifest_entry(image_url, self.get_optimized_image_urls(image_url))
+                    for image_url in remaining
+                ])
+            write_gallery_manifest(manifest_path, manifest)
+            if remaining:
+                more_html = gallery_more_html(manifest_url or Path(manifest_path).name, len(images))
+                gallery_html += ''.join(f'  {line}\n' for line in more_html.splitlines())
+        
         gallery_html += '</div>'
         return gallery_html
 
@@ -243,6 +569,20 @@ picture {
   width: 100%;
   height: 100%;
 }
+
+/* ปุ่มดูรูปทั้งหมด (รูปที่เหลือโหลดจาก manifest) */
+.gallery-more {
+  grid-column: 1 / -1;
+  text-align: center;
+}
+
+.gallery-more button {
+  padding: 0.6rem 1.5rem;
+  border: 1px solid #ccc;
+  border-radius: 999px;
+  background: #fff;
+  cursor: pointer;
+}
 """
         return css
 
@@ -306,7 +646,9 @@ document.addEventListener('DOMContentLoaded', function() {
   });
 
 });
-"""
+
+// Gallery: รูปที่เหลือโหลดจาก manifest เมื่อเลื่อนใกล้ถึงหรือกดดูทั้งหมด
+""" + GALLERY_LOADER_JS
         return js
 
     def create_optimization_files(self):
@@ -346,7 +688,363 @@ document.addEventListener('DOMContentLoaded', function() {
         for domain in unique_domains:
             print(f"   - {domain}")
 
-    def optimize_images(self, webp=False, compress=False):
+        self.report_duplicate_groups()
+
+    def cached_original(self, image_url):
+        """ต้นฉบับที่มีอยู่แล้ว (ในเครื่องหรือในแคช) โดยไม่ดาวน์โหลด คืนค่า (digest, path) หรือ None"""
+        if not urlparse(image_url).scheme.startswith("http"):
+            return fetch_original(self.cache, image_url)
+        cached = self.cache.lookup_source(image_url)
+        return (cached[0], cached[2]) if cached else None
+
+    def report_duplicate_groups(self, workers=None):
+        """กลุ่มรูปที่เกือบเหมือนกันทั้งใน cars.json และสำเนาแคตตาล็อก พร้อมขนาดที่ประหยัดได้"""
+        if Image is None:
+            return
+        urls = {}
+        catalogs = {}
+        sources = {}
+        not_downloaded = 0
+        for name, image_url in self.catalog_images():
+            original = self.cached_original(image_url)
+            if not original:
+                not_downloaded += 1
+                continue
+            digest, source_path = original
+            sources[digest] = source_path
+            urls.setdefault(digest, {}).setdefault(image_url, None)
+            catalogs.setdefault(digest, set()).add(name)
+        # lookup อัปเดตเวลาใช้งานล่าสุดในแคช - commit ปล่อย write lock ก่อน connection อื่นเขียน
+        self.cache.commit()
+
+        with ProcessPoolExecutor(max_workers=workers or os.cpu_count() or 1) as executor:
+            self.duplicates.hash_sources(executor, sources)
+        self.duplicates.save()
+        sources = {digest: path for digest, path in sources.items() if digest in self.duplicates.hashes}
+
+        groups = self.duplicates.groups(sources)
+        grouped = {digest for group in groups for digest in group}
+        # URL ต่างกันแต่ไฟล์เดียวกันก็นับเป็นกลุ่ม
+        groups += [[digest] for digest in sources if digest not in grouped and len(urls[digest]) > 1]
+
+        report = []
+        for group in groups:
+            representative = group[0]
+            url_count = sum(len(urls[digest]) for digest in group)
+            original_bytes = sum(len(urls[digest]) * self.duplicates.hashes[digest]['bytes'] for digest in group)
+            variant_bytes = sum(path.stat().st_size for path in self.variants_dir.glob(f"{representative[:16]}_*"))
+            report.append({
+                'url': next(iter(urls[representative])),
+                'urls': url_count,
+                'near': len(group) - 1,
+                'catalogs': sorted(set().union(*(catalogs[digest] for digest in group))),
+                'original_saved': original_bytes - self.duplicates.hashes[representative]['bytes'],
+                'variant_saved': (url_count - 1) * variant_bytes,
+            })
+        report.sort(key=lambda g: g['original_saved'] + g['variant_saved'], reverse=True)
+
+        print(f"👯 กลุ่มรูปซ้ำ (perceptual hash ต่างกันไม่เกิน {self.dedupe_threshold} บิต):")
+        if not_downloaded:
+            print(f"   - ยังไม่มีต้นฉบับในแคช {not_downloaded} รูป (รัน --webp/--compress ก่อน)")
+        print(f"   - {len(report)} กลุ่ม, URL ซ้ำ {sum(g['urls'] - 1 for g in report)}"
+              f" (เกือบเหมือน {sum(g['near'] for g in report)} รูป)")
+        print(f"   - ประหยัด: ต้นฉบับ {sum(g['original_saved'] for g in report) / 1024:.1f} KB"
+              f" + variants {sum(g['variant_saved'] for g in report) / 1024:.1f} KB")
+        for group in report[:10]:
+            print(f"   - [{group['urls']} URL, {', '.join(group['catalogs'])}] {group['url']}")
+
+    def collect_image_urls(self):
+        """รวม URL รูปทั้งหมดในแคตตาล็อกและสำเนา (ไม่ซ้ำ คงลำดับ)"""
+        return list(dict.fromkeys(image_url for _, image_url in self.catalog_images()))
+
+    def probe_image_dimensions(self):
+        """อ่านขนาดจริงของทุกรูปจากส่วนหัวไฟล์ (แคชตาม URL) สำหรับ width/height ใน HTML"""
+        urls = self.collect_image_urls()
+        known = asyncio.run(self.image_probe.probe_many(urls))
+        print(f"📐 รู้ขนาดรูปแล้ว {len(known)}/{len(urls)} รูป")
+        return known
+
+    def variant_key(self, digest, width, fmt, quality=None):
+        """key ในแคช = digest ต้นฉบับ + พารามิเตอร์การแปลงทั้งหมด"""
+        return ImageCache.variant_key(digest, {
+            'width': width,
+            'format': fmt,
+            'settings': variant_settings(fmt, quality),
+            'renderer': RENDER_VERSION,
+        })
+
+    def load_quality_results(self):
+        """ผลการค้นหา quality ที่เคยทำไว้ (key = digest + format + เป้า SSIM)"""
+        try:
+            with open(self.quality_file, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return {}
+
+    def save_quality_results(self):
+        self.quality_file.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.quality_file.with_suffix(".tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self.quality_results, f)
+        os.replace(tmp_path, self.quality_file)
+
+    def quality_key(self, digest, fmt):
+        return f"{digest}:{fmt}:{self.target_ssim}:{QUALITY_SEARCH_WIDTH}:{RENDER_VERSION}"
+
+    async def find_qualities(self, executor, digest, source_path, formats):
+        """quality ต่ำสุดที่ถึงเป้า SSIM ของแต่ละ format - ค้นครั้งเดียวต่อรูป (แคชตาม digest)"""
+        searchable = [fmt for fmt in formats if fmt in QUALITY_RANGES]
+        if not self.target_ssim or not searchable:
+            return {}
+
+        missing = [fmt for fmt in searchable if self.quality_key(digest, fmt) not in self.quality_results]
+        if missing:
+            task = {
+                'source': str(source_path),
+                'width': QUALITY_SEARCH_WIDTH,
+                'target': self.target_ssim,
+                'formats': {fmt: FORMAT_SETTINGS[fmt] for fmt in missing},
+            }
+            try:
+                found = await asyncio.wrap_future(executor.submit(search_quality, task))
+            except Exception as e:
+                print(f"   ⚠️ ค้นหา quality ไม่สำเร็จ: {e}")
+                found = {}
+            for fmt, result in found.items():
+                self.quality_results[self.quality_key(digest, fmt)] = result
+            self.quality_stats['searched'] += len(found)
+
+        qualities = {}
+        for fmt in searchable:
+            result = self.quality_results.get(self.quality_key(digest, fmt))
+            if result:
+                qualities[fmt] = result['quality']
+                self.quality_stats['used'].append((fmt, result))
+        return qualities
+
+    def source_size(self, image_url, source_path):
+        """ขนาดจริงของต้นฉบับ (จากแคช probe หรืออ่านส่วนหัวไฟล์ที่โหลดมาแล้ว)"""
+        size = self.image_probe.get(image_url)
+        if not size:
+            size = self.image_probe.probe_file(Path(source_path))
+            if size:
+                self.image_probe.remember(image_url, size)
+        return size
+
+    async def process_source(self, executor, image_url, digest, source_path, formats, results, planned):
+        """ต้นฉบับหนึ่งรูป: ค้นหา quality (ถ้าเปิด) แล้วส่ง variant ที่ยังไม่มีเข้า process pool"""
+        size = self.source_size(image_url, source_path)
+        # รูปเดียวกันที่ใช้หลายคัน (digest ซ้ำ) ทำครั้งเดียว
+        if digest in planned:
+            self.variant_stats['shared_sources'] += 1
+            return []
+        planned.add(digest)
+
+        # รูปที่เกือบเหมือนรูปที่ส่งไปแล้ว (relist / สำเนาแคตตาล็อก) ใช้ variants ของรูปนั้น
+        if self.dedupe_threshold and await self.duplicates.hash_source(executor, digest, source_path):
+            representative = self.duplicates.assign(digest)
+            if representative != digest:
+                self.duplicate_of[image_url] = (digest, representative)
+                return []
+
+        qualities = await self.find_qualities(executor, digest, source_path, formats)
+        tasks = self.plan_variant_tasks(digest, source_path, size, formats, results, qualities)
+        return [(task, asyncio.wrap_future(executor.submit(render_variant, task))) for task in tasks]
+
+    def plan_variant_tasks(self, digest, source_path, size, formats, results, qualities):
+        """แยก variant ของรูปหนึ่งรูปเป็นที่มีในแคชแล้ว (ลิงก์ไป docs ทันที) กับที่ต้องสร้างใหม่
+        ความกว้างมาจากขนาดจริงของต้นฉบับ"""
+        widths = variant_widths(size)
+        self.variant_stats['skipped_widths'] += len(VARIANT_SIZES) - len(widths)
+        tasks = []
+        for width in widths:
+            # ตั้งชื่อตามเนื้อรูป: รถที่ใช้รูปเดียวกันได้ไฟล์เดียวกัน
+            size_name = f"{width}w"
+            name = f"{digest[:16]}_{size_name}"
+            cached = {}
+            missing = {}
+            for fmt in formats:
+                key = self.variant_key(digest, width, fmt, qualities.get(fmt))
+                cached_path = self.cache.get(key)
+                if cached_path:
+                    published = ImageCache.publish(cached_path, self.variants_dir / f"{name}.{fmt}")
+                    cached[fmt] = {'path': str(published), 'bytes': cached_path.stat().st_size}
+                else:
+                    missing[fmt] = key
+
+            if cached:
+                results.append({'source': str(source_path), 'size_name': size_name,
+                                'outputs': cached, 'cached': True, 'seconds': 0.0})
+            if missing:
+                tasks.append({
+                    'source': str(source_path),
+                    'size_name': size_name,
+                    'width': width,
+                    'formats': list(missing),
+                    'outputs': {fmt: str(self.cache.object_path(key, f".{fmt}")) for fmt, key in missing.items()},
+                    'keys': missing,
+                    'qualities': qualities,
+                    'name': name,
+                })
+        return tasks
+
+    def store_variant_result(self, task, result):
+        """บันทึก variant ที่สร้างเสร็จเข้าแคชแล้ววางไฟล์ไว้ที่ docs สำหรับเว็บ"""
+        for fmt, output in result['outputs'].items():
+            self.cache.register_file(task['keys'][fmt], output['path'])
+            published = ImageCache.publish(output['path'], self.variants_dir / f"{task['name']}.{fmt}")
+            output['path'] = str(published)
+
+    def enqueue_catalog_jobs(self):
+        """ใส่รูปทุกคันเข้าคิว (รูปที่มีอยู่แล้วแค่ปรับ priority) แยก priority หน้าแรกตามแต่ละแคตตาล็อก"""
+        jobs = {}
+        by_catalog = {}
+        for name, images in self.catalog_cars():
+            by_catalog.setdefault(name, []).append(images)
+        for image_lists in by_catalog.values():
+            for image_url, priority in catalog_jobs(image_lists).items():
+                jobs[image_url] = max(priority, jobs.get(image_url, 0))
+        return self.jobs.enqueue(jobs)
+
+    def job_spec(self, formats):
+        """ค่าการสร้างรูปของรอบนี้ - เปลี่ยนเมื่อไหร่งานที่ทำเสร็จแล้วต้องทำใหม่"""
+        return {'formats': list(formats), 'target_ssim': self.target_ssim,
+                'dedupe': self.duplicates.spec() if self.dedupe_threshold else 0, 'renderer': RENDER_VERSION}
+
+    def claim_jobs(self, formats):
+        """กู้งานที่ค้างจากรอบก่อน เติมงานใหม่จากแคตตาล็อก แล้วหยิบงานที่ต้องทำเรียงตาม priority"""
+        recovered = self.jobs.recover()
+        added = self.enqueue_catalog_jobs()
+        claimed = self.jobs.claim(self.job_spec(formats))
+        print(f"📋 คิวงาน: หยิบ {len(claimed)} งาน (งานใหม่ {added}, กู้จากรอบที่ค้าง {recovered},"
+              f" เสร็จแล้ว {self.jobs.status()['counts']['done']})")
+        if self.dedupe_threshold:
+            # รูปที่ทำเสร็จในรอบก่อนๆ เป็นตัวแทนกลุ่มได้ด้วย
+            for digest in self.jobs.done_digests():
+                self.duplicates.assign(digest)
+        return claimed
+
+    async def finish_variant(self, image_url, digest, task, future, results, remaining):
+        """รอ variant หนึ่งชิ้น บันทึกเข้าแคช แล้วปิดงานของ URL เมื่อครบทุกชิ้น"""
+        try:
+            result = await future
+        except Exception as e:
+            print(f"   ⚠️ สร้าง variant ไม่สำเร็จ: {e}")
+            self.jobs.fail(image_url, e)
+            return
+        self.store_variant_result(task, result)
+        results.append(result)
+        remaining[image_url] -= 1
+        if remaining[image_url] == 0 and self.jobs.state(image_url) == "running":
+            # บันทึก index ของแคชก่อน แล้วค่อยปิดงาน (ตายตรงกลางก็แค่ทำงานนี้ซ้ำจากแคช)
+            self.cache.commit()
+            self.jobs.complete(image_url, digest)
+
+    async def run_variant_pipeline(self, formats, executor, results):
+        """ดาวน์โหลดต้นฉบับแบบขนาน แล้วส่งเข้า process pool ทันทีที่แต่ละรูปโหลดเสร็จ
+        ทำเฉพาะงานที่ยังไม่เสร็จในคิว (hero/หน้าแรกเริ่มดาวน์โหลดก่อน)"""
+        claimed = self.claim_jobs(formats)
+        downloader = AsyncImageDownloader(self.cache, max_connections=self.max_connections,
+                                          per_host=self.per_host_connections)
+        pending = []
+        planned = set()
+        sources = []
+        source_tasks = []
+        async for image_url, digest, source_path in downloader.iter_downloads(claimed):
+            sources.append((image_url, digest))
+            source_tasks.append(asyncio.create_task(
+                self.process_source(executor, image_url, digest, source_path, formats, results, planned)
+            ))
+        remaining = {}
+        for (image_url, digest), submitted in zip(sources, await asyncio.gather(*source_tasks)):
+            pending.extend((image_url, digest, task, future) for task, future in submitted)
+            remaining[image_url] = len(submitted)
+            if not submitted and image_url not in self.duplicate_of:
+                self.jobs.complete(image_url, digest)
+        source_count = len(sources)
+        self.image_probe.save()
+        self.duplicates.save()
+        if self.target_ssim:
+            self.save_quality_results()
+
+        print(f"🏭 สร้าง {len(pending)} variants ({', '.join(formats)}) จาก {source_count} รูป"
+              f" (ใช้จากแคช {len(results)}, ข้ามขนาดที่ต้องขยาย/ซ้ำ {self.variant_stats['skipped_widths']},"
+              f" รูปซ้ำข้ามคัน {self.variant_stats['shared_sources']}, รูปเกือบซ้ำ {len(self.duplicate_of)})")
+        await asyncio.gather(*(
+            self.finish_variant(image_url, digest, task, future, results, remaining)
+            for image_url, digest, task, future in pending
+        ))
+        self.cache.commit()
+        self.link_duplicate_variants()
+        self.jobs.fail_unfinished(claimed, "ดาวน์โหลดต้นฉบับไม่ได้")
+        return source_count
+
+    def link_duplicate_variants(self):
+        """วางไฟล์ variants ของตัวแทนกลุ่มไว้ใต้ชื่อของรูปที่ซ้ำ (hard link ไม่ใช้พื้นที่เพิ่ม)"""
+        for image_url, (digest, representative) in self.duplicate_of.items():
+            prefix = representative[:16]
+            for variant_path in self.variants_dir.glob(f"{prefix}_*"):
+                ImageCache.publish(variant_path, self.variants_dir / f"{digest[:16]}{variant_path.name[len(prefix):]}")
+                self.variant_stats['duplicate_bytes'] += variant_path.stat().st_size
+            self.jobs.complete(image_url, digest)
+
+    def generate_variants(self, formats=("avif", "webp", "jpg"), workers=None):
+        """สร้างรูปทุกความกว้างที่ไม่เกินต้นฉบับเป็นไฟล์จริงบน process pool (หนึ่ง task ต่อรูปต่อขนาด)
+        variant ที่มีในแคชแล้วจะไม่ถูก decode ใหม่ แค่ลิงก์ไฟล์ไปที่ docs"""
+        if Image is None:
+            print("❌ ต้องติดตั้ง pillow ก่อน: pip install pillow")
+            return []
+
+        formats = [fmt for fmt in formats if fmt != "avif" or avif_supported()]
+        workers = workers or os.cpu_count() or 1
+
+        started = time.perf_counter()
+        results = []
+        self.variant_stats = {'skipped_widths': 0, 'shared_sources': 0, 'duplicate_bytes': 0}
+        self.duplicates.reset()
+        self.duplicate_of = {}
+        self.quality_stats = {'searched': 0, 'used': []}
+        if self.target_ssim and np is None:
+            print("⚠️ ต้องติดตั้ง numpy สำหรับการค้นหา quality - ใช้ quality คงที่แทน")
+            self.target_ssim = None
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            source_count = asyncio.run(self.run_variant_pipeline(formats, executor, results))
+        elapsed = time.perf_counter() - started
+
+        self.report_variant_throughput(results, source_count, elapsed, workers)
+        return results
+
+    def report_variant_throughput(self, results, source_count, elapsed, workers):
+        """รายงานความเร็วเป็นรูปต่อวินาทีต่อ core"""
+        total_bytes = sum(out['bytes'] for r in results for out in r['outputs'].values())
+        images_per_second = source_count / elapsed if elapsed else 0.0
+        print(f"📈 ผลการสร้าง variants:")
+        print(f"   - variants: {len(results)} ({total_bytes / 1024:.1f} KB)")
+        print(f"   - เวลา: {elapsed:.2f} วินาที")
+        print(f"   - {images_per_second:.2f} รูป/วินาที ({images_per_second / workers:.2f} รูป/วินาที/core)")
+        print(f"   - แคช: {self.cache.stats['hits']} hits, {self.cache.stats['misses']} misses, "
+              f"{self.cache.stats['evicted']} evicted ({self.cache.total_bytes() / 1024 / 1024:.1f} MB)")
+        if self.duplicate_of:
+            print(f"   - รูปเกือบซ้ำ {len(self.duplicate_of)} รูป ใช้ variants ของรูปตัวแทน"
+                  f" (ไม่ต้องสร้าง {self.variant_stats['duplicate_bytes'] / 1024:.1f} KB)")
+        if self.quality_stats['used']:
+            self.report_quality_savings()
+
+    def report_quality_savings(self):
+        """เทียบขนาดไฟล์จากการค้นหา quality กับ quality คงที่ (ที่ความกว้างอ้างอิง)"""
+        print(f"🎯 Quality search (SSIM >= {self.target_ssim}, วัดที่ {QUALITY_SEARCH_WIDTH}px,"
+              f" ค้นใหม่ {self.quality_stats['searched']} / ใช้ผลจากแคชที่เหลือ):")
+        for fmt in sorted({fmt for fmt, _ in self.quality_stats['used']}):
+            used = [result for f, result in self.quality_stats['used'] if f == fmt]
+            searched_bytes = sum(r['bytes'] for r in used)
+            baseline_bytes = sum(r['baseline_bytes'] for r in used)
+            qualities = sorted(r['quality'] for r in used)
+            saved = 1 - searched_bytes / baseline_bytes if baseline_bytes else 0.0
+            print(f"   - {fmt}: {len(used)} รูป, quality {qualities[0]}-{qualities[-1]}"
+                  f" (กลาง {qualities[len(qualities) // 2]}, คงที่ {used[0]['baseline_quality']}),"
+                  f" {baseline_bytes / 1024:.1f} KB -> {searched_bytes / 1024:.1f} KB (ประหยัด {saved:.1%})")
+
+    def optimize_images(self, webp=False, compress=False, workers=None):
         """รัน image optimization process"""
         print("🖼️ เริ่ม Image Optimization สำหรับ Core Web Vitals...")
         
@@ -356,12 +1054,26 @@ document.addEventListener('DOMContentLoaded', function() {
         # สร้างไฟล์ optimization
         self.create_optimization_files()
         
+        # ขนาดจริงของรูปสำหรับ width/height (กัน layout shift)
+        self.probe_image_dimensions()
+        
+        # สร้างรูป variants จริง: --webp = AVIF/WebP + JPEG fallback, --compress = JPEG ที่บีบอัดแล้ว
+        if webp or compress:
+            formats = ["avif", "webp", "jpg"] if webp else ["jpg"]
+            self.generate_variants(formats=formats, workers=workers)
+        
+        # LQIP ของรูป hero แต่ละคัน แสดงเป็นพื้นหลังระหว่างรอรูปจริง
+        # (หลัง variants - ต้นฉบับอยู่ในแคชแล้ว ที่ยังขาดโหลดผ่าน downloader แบบขนาน)
+        self.placeholders.workers = workers
+        self.placeholders.build((car["images"][0] for car in self.cars_data if car.get("images")), cache=self.cache)
+        
         # สร้าง example HTML สำหรับการใช้งาน
         if self.cars_data:
             sample_car = self.cars_data[0]
             sample_html = self.generate_image_gallery_html(
                 sample_car.get("images", []), 
-                sample_car.get("title", "รถยนต์")
+                sample_car.get("title", "รถยนต์"),
+                manifest_path=Path("docs") / "sample-optimized-gallery.json"
             )
             
             with open("docs/sample-optimized-gallery.html", "w", encoding="utf-8") as f:
@@ -403,8 +1115,19 @@ if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="Image Optimization สำหรับ Core Web Vitals")
     parser.add_argument("--webp", action="store_true", help="เปิดใช้ WebP optimization")
     parser.add_argument("--compress", action="store_true", help="เปิดใช้ image compression")
+    parser.add_argument("--workers", type=int, default=None, help="จำนวน worker processes (ค่าเริ่มต้น = จำนวน CPU)")
+    parser.add_argument("--cache-size", type=int, default=2048, help="ขนาดแคชรูปสูงสุด (MB) ก่อนลบไฟล์ที่ไม่ได้ใช้นานที่สุด")
+    parser.add_argument("--max-connections", type=int, default=16, help="จำนวน connection ดาวน์โหลดพร้อมกันทั้งหมด")
+    parser.add_argument("--per-host", type=int, default=4, help="จำนวน connection ดาวน์โหลดพร้อมกันต่อ host")
+    parser.add_argument("--target-ssim", type=float, default=None,
+                        help="ค้นหา quality WebP/AVIF ต่ำสุดที่ SSIM ถึงค่านี้ต่อรูป (เช่น 0.985) แทน quality คงที่")
+    parser.add_argument("--dedupe-threshold", type=int, default=6,
+                        help="รูปที่ perceptual hash ต่างกันไม่เกินกี่บิต (และสีใกล้กัน) ถือว่าซ้ำ ใช้ variants ร่วมกัน"
+                             " (0 = ปิด)")
     
     args = parser.parse_args()
     
-    optimizer = ImageOptimizer()
-    optimizer.optimize_images(webp=args.webp, compress=args.compress)
\ No newline at end of file
+    optimizer = ImageOptimizer(cache_max_mb=args.cache_size, max_connections=args.max_connections,
+                               per_host_connections=args.per_host, target_ssim=args.target_ssim,
+                               dedupe_threshold=args.dedupe_threshold)
+    optimizer.optimize_images(webp=args.webp, compress=args.compress, workers=args.workers)
\ No newline at end of file
@@ -6,20 +6,42 @@ Ultimate Python SSR 2025 - Server-Side Rendering
 
 import asyncio
 import aiohttp
+import heapq
+import itertools
 import json
 import os
 import re
-from datetime import datetime
+import sqlite3
+import time
+from datetime import datetime, timezone
 from pathlib import Path
-from typing import Dict, List, Optional, Any
-from dataclasses import dataclass
+from typing import Dict, List, Optional, Any, Tuple
+from dataclasses import dataclass, asdict
 import argparse
 import logging
 
+from circuit_breaker import CircuitBreaker, CircuitOpenError
+from css_tools import inline_critical_css
+from image_jobs import ImageJobQueue, catalog_jobs
+from image_placeholders import MISSING_IMAGE_SVG, PlaceholderBuilder
+from image_probe import ImageProbe
+from og_cards import CARD_SIZE, OGCardBuilder
+from optimize_images import (GALLERY_INLINE_IMAGES, GALLERY_LOADER_JS, gallery_manifest, gallery_manifest_entry,
+                             gallery_more_html, pick_variant, preload_link, srcset_formats, variant_widths,
+                             write_gallery_manifest)
+from shopify_bulk import ShopifyBulkIngestor, graphql_url_for
+from shopify_cdn import is_shopify_cdn, shopify_variants
+from shopify_client import ShopifyClient
+from shopify_sync import ShopifyCatalogStore, delta_sync, parse_timestamp
+
 # Setup logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
+# ความกว้างที่รูปแสดงจริงตาม style.css (.car-grid คอลัมน์ละ >= 300px กว้างสุด 1200px)
+CARD_IMAGE_SIZES = "(max-width: 700px) 100vw, 360px"
+GALLERY_IMAGE_SIZES = "(max-width: 900px) 100vw, 900px"
+
 @dataclass
 class CarData:
     """Data class สำหรับข้อมูลรถ"""
@@ -46,6 +68,11 @@ class PythonSSRGenerator:
         self.base_path = Path(__file__).parent
         self.docs_path = self.base_path / "docs"
         self.templates_path = self.base_path / "templates"
+        self.car_detail_path = self.docs_path / "car-detail"
+        self.cache_path = self.base_path / ".ssr-cache"
+        
+        # จำนวนรถที่แสดงในหน้า listing
+        self.listing_limit = 6
         
         # API Configuration
         self.api_configs = {
@@ -63,6 +90,29 @@ class PythonSSRGenerator:
             }
         }
         
+        # Shopify Admin API ต้องใช้ access token
+        shopify_token = os.environ.get('SHOPIFY_ACCESS_TOKEN')
+        if shopify_token:
+            self.api_configs['shopify']['headers']['X-Shopify-Access-Token'] = shopify_token
+        
+        # Delta sync: เทียบ ID ทั้งร้านเพื่อหาสินค้าที่ถูกลบทุกๆ กี่ชั่วโมง
+        self.reconcile_interval_hours = 24
+        
+        # Circuit breaker: งบเวลาดึงข้อมูลต่อแหล่ง (วินาที) - เกินแล้วใช้ snapshot ล่าสุดแทน
+        self.fetch_budgets = {'local': 5.0, 'shopify': 20.0, 'custom': 10.0}
+        self.circuit_breakers: Dict[str, CircuitBreaker] = {}
+        
+        # Multi-source merge (--api local+shopify): ลำดับความสำคัญของแหล่ง (มากกว่าชนะ)
+        # ถ้าเท่ากันใช้ updated_at ที่ใหม่กว่า
+        self.source_precedence = {'shopify': 30, 'custom': 20, 'local': 10}
+        
+        # ขนาดจริงของรูป (อ่านจากส่วนหัวไฟล์) สำหรับ width/height ของ <img> กัน layout shift
+        self.image_probe = ImageProbe(self.cache_path / "image-dimensions.json")
+        # ภาพเบลอขนาดเล็ก (LQIP) ของรูป hero ใช้ต้นฉบับใน .image-cache ร่วมกับ optimize_images
+        self.placeholders = PlaceholderBuilder(self.base_path / ".image-cache")
+        # คิวงานสร้าง variants ของรูป (ใช้ร่วมกับ optimize_images / image_jobs.py status)
+        self.image_jobs = ImageJobQueue(self.base_path / ".image-cache" / "jobs.sqlite3")
+        
         # SEO Configuration
         self.seo_config = {
             'site_name': 'ครูหนึ่งรถสวย',
@@ -74,9 +124,16 @@ class PythonSSRGenerator:
             'phone': '094-064-9019',
             'address': '320 หมู่ 2 ต.สันพระเนตร อ.สันทราย จ.เชียงใหม่ 50170'
         }
+        
+        # รูปแชร์ (Open Graph) 1200x630 ของแต่ละคัน อยู่ที่ docs/og/<handle>.jpg
+        self.og_cards = OGCardBuilder(self.docs_path / "og", self.base_path / ".image-cache",
+                                      site_name=self.seo_config['site_name'])
 
     async def fetch_api_data(self, api_source: str) -> Optional[Dict[str, Any]]:
         """ดึงข้อมูลจาก API แบบ async"""
+        if '+' in api_source:
+            return await self.fetch_merged_data(api_source.split('+'))
+        
         logger.info(f"🔍 Fetching data from {api_source} API...")
         
         try:
@@ -97,6 +154,15 @@ class PythonSSRGenerator:
                         data = {'products': data}
                     logger.info(f"✅ Successfully loaded local data: {len(data.get('products', []))} products")
                     return data
+            elif api_source == 'shopify':
+                # Delta sync: ดึงเฉพาะที่เปลี่ยนตั้งแต่ high-water mark แล้วรวมกับแคตตาล็อกในเครื่อง
+                store = ShopifyCatalogStore(self.cache_path / f"{api_source}-catalog.json").load()
+                async with aiohttp.ClientSession() as session:
+                    client = ShopifyClient(session, config['headers'])
+                    await delta_sync(client, store, config['url'],
+                                     reconcile_interval_hours=self.reconcile_interval_hours)
+                logger.info(f"✅ Successfully synced from {api_source}: {len(store.products)} products")
+                return store.as_raw_data()
             else:
                 # Fetch from remote API
                 async with aiohttp.ClientSession() as session:
@@ -112,6 +178,210 @@ class PythonSSRGenerator:
             logger.error(f"❌ Error fetching from {api_source}: {str(e)}")
             return None
 
+    async def fetch_merged_data(self, sources: List[str]) -> Optional[Dict[str, Any]]:
+        """ดึงหลายแหล่งพร้อมกันใน event loop เดียว แล้วรวมเป็นชุดเดียว
+        แต่ละแหล่งมี circuit breaker ของตัวเอง - แหล่งที่ล่มจะถูกข้าม"""
+        unbounded = not self.snapshot_file('+'.join(sources)).exists()
+
+        async def fetch_one(source: str) -> Optional[Dict[str, Any]]:
+            try:
+                return await self.get_circuit_breaker(source).call(lambda: self.fetch_api_data(source),
+                                                                   unbounded=unbounded)
+            except Exception as e:
+                logger.warning(f"⚠️ Skipping {source} in merge: {str(e) or type(e).__name__}")
+                return None
+
+        results = await asyncio.gather(*[fetch_one(source) for source in sources])
+        raw_by_source = {source: raw for source, raw in zip(sources, results) if raw}
+        if not raw_by_source:
+            return None
+
+        products = self.merge_products(raw_by_source)
+        logger.info(f"🔀 Merged {len(products)} products from {', '.join(raw_by_source)}")
+        return {'products': products}
+
+    def merge_products(self, raw_by_source: Dict[str, Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """รวมสินค้าตาม handle (หรือ id ถ้าไม่มี handle) - precedence ก่อน แล้วค่อย updated_at"""
+        oldest = datetime.min.replace(tzinfo=timezone.utc)
+        merged: Dict[str, Tuple[int, datetime, Dict[str, Any]]] = {}
+
+        for source, raw_data in raw_by_source.items():
+            products = raw_data.get('products', raw_data if isinstance(raw_data, list) else [])
+            rank = self.source_precedence.get(source, 0)
+            for product in products:
+                key = product.get('handle') or f"id:{product.get('id', '')}"
+                updated_at = parse_timestamp(product.get('updated_at', '')) or oldest
+                current = merged.get(key)
+                if current is None or (rank, updated_at) > (current[0], current[1]):
+                    merged[key] = (rank, updated_at, product)
+
+        return [product for _, _, product in merged.values()]
+
+    def get_circuit_breaker(self, api_source: str) -> CircuitBreaker:
+        """circuit breaker ของแต่ละแหล่งข้อมูล (คงอยู่ข้ามรอบของ scheduler)"""
+        if api_source not in self.circuit_breakers:
+            self.circuit_breakers[api_source] = CircuitBreaker(api_source, latency_budget=self.fetch_budget(api_source))
+        return self.circuit_breakers[api_source]
+
+    def fetch_budget(self, api_source: str) -> float:
+        """งบเวลา (วินาที) ของแหล่งข้อมูล - แหล่งรวมใช้งบของแหล่งที่ช้าที่สุด เพราะดึงพร้อมกัน"""
+        return max(self.fetch_budgets.get(source, 10.0) for source in api_source.split('+'))
+
+    def snapshot_file(self, api_source: str) -> Path:
+        return self.cache_path / f"snapshot-{api_source}.json"
+
+    def save_snapshot(self, api_source: str, cars: List[CarData]):
+        """บันทึกข้อมูลรถที่ normalize สำเร็จล่าสุด (atomic)"""
+        snapshot_path = self.snapshot_file(api_source)
+        snapshot_path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = snapshot_path.with_suffix('.tmp')
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({
+                'saved_at': datetime.now().isoformat(timespec='seconds'),
+                'api_source': api_source,
+                'cars': [asdict(car) for car in cars]
+            }, f, ensure_ascii=False)
+        os.replace(tmp_path, snapshot_path)
+
+    def load_snapshot(self, api_source: str) -> Tuple[List[CarData], Optional[str]]:
+        """โหลด snapshot ล่าสุด คืนค่า (cars, เวลาที่บันทึก)"""
+        snapshot_path = self.snapshot_file(api_source)
+        if not snapshot_path.exists():
+            return [], None
+        try:
+            with open(snapshot_path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            return [CarData(**car) for car in data.get('cars', [])], data.get('saved_at')
+        except Exception as e:
+            logger.error(f"❌ Error loading snapshot for {api_source}: {str(e)}")
+            return [], None
+
+    async def fetch_cars(self, api_source: str, bulk: bool = False) -> Tuple[List[CarData], Optional[str]]:
+        """ดึงและ normalize ภายใต้ circuit breaker
+        คืนค่า (cars, stale_since) - stale_since เป็น None ถ้าข้อมูลสด"""
+        async def fetch_fresh() -> Optional[List[CarData]]:
+            if bulk:
+                cars = await self.fetch_cars_bulk(api_source)
+            else:
+                raw_data = await self.fetch_api_data(api_source)
+                if not raw_data:
+                    return None
+                cars = self.process_car_data(raw_data, api_source)
+            # บันทึกในงานเอง - งานที่เกินงบเวลาแล้วเสร็จทีหลังก็ได้ snapshot ด้วย
+            if cars:
+                self.save_snapshot(api_source, cars)
+            return cars
+
+        # งบเวลามีไว้เพื่อ fallback เป็น snapshot - ครั้งแรก (ยังไม่มี snapshot) และ bulk operation
+        # (ใช้เวลาหลายนาทีเป็นปกติ) รอจนเสร็จ
+        unbounded = bulk or not self.snapshot_file(api_source).exists()
+        breaker = self.get_circuit_breaker(api_source)
+        try:
+            cars = await breaker.call(fetch_fresh, unbounded=unbounded)
+            return cars, None
+        except CircuitOpenError:
+            logger.warning(f"🚫 {api_source} circuit is open - skipping upstream")
+        except asyncio.TimeoutError:
+            logger.warning(f"⏱️ {api_source} exceeded {breaker.latency_budget:.1f}s budget")
+        except Exception as e:
+            logger.error(f"❌ Failed to fetch data from {api_source}: {str(e)}")
+
+        cars, saved_at = self.load_snapshot(api_source)
+        if cars:
+            logger.warning(f"📼 Using last-good snapshot for {api_source} from {saved_at}")
+        return cars, saved_at
+
+    async def finish_background_fetches(self):
+        """รันครั้งเดียว: รอ sync ที่เกินงบเวลาให้เสร็จและบันทึกผล ไม่ทิ้งไปตอน event loop ปิด
+        (รอบถัดไปจึงเป็น delta sync ที่เร็ว)"""
+        for breaker in list(self.circuit_breakers.values()):
+            await breaker.drain()
+
+    async def fetch_cars_bulk(self, api_source: str = 'shopify') -> List[CarData]:
+        """ดึงทั้งร้านผ่าน GraphQL bulk operation แล้ว normalize แบบสตรีม
+        เก็บไว้แค่รถ listing_limit คันที่ใหม่ที่สุด (heap) + สินค้าปัจจุบัน"""
+        config = self.api_configs[api_source]
+        newest: List[tuple] = []
+        counter = itertools.count()
+        total = 0
+
+        async with aiohttp.ClientSession() as session:
+            client = ShopifyClient(session, config['headers'])
+            ingestor = ShopifyBulkIngestor(client, graphql_url_for(config['url']))
+            async for product in ingestor.run():
+                total += 1
+                try:
+                    car = self.normalize_car(product)
+                except Exception as e:
+                    logger.warning(f"⚠️ Error processing car {product.get('id', 'unknown')}: {str(e)}")
+                    continue
+                entry = (car.created_at or car.updated_at, next(counter), car)
+                if len(newest) < self.listing_limit:
+                    heapq.heappush(newest, entry)
+                else:
+                    heapq.heappushpop(newest, entry)
+
+        logger.info(f"✅ Streamed {total} products from bulk export")
+        return [car for _, _, car in sorted(newest, reverse=True)]
+
+    def normalize_car(self, car_raw: Dict[str, Any]) -> CarData:
+        """แปลงสินค้าดิบหนึ่งชิ้นเป็น CarData"""
+        # Extract basic information
+        car_id = str(car_raw.get('id', car_raw.get('handle', '')))
+        title = car_raw.get('title', 'ไม่ระบุชื่อ')
+        handle = car_raw.get('handle', f"car-{car_id}")
+        
+        # Clean description - handle both desc and body_html
+        body_html = car_raw.get('body_html', car_raw.get('desc', ''))
+        description = self.clean_html_text(body_html)
+        
+        # Extract price - handle different formats
+        variants = car_raw.get('variants', [])
+        if variants:
+            price = float(variants[0].get('price', 0))
+        else:
+            # Try to extract price from description
+            price_match = re.search(r'(\d{1,3}(?:,\d{3})*(?:\.\d{2})?)', body_html)
+            price = float(price_match.group().replace(',', '')) if price_match else 450000.0
+        
+        # Extract images
+        images_raw = car_raw.get('images', [])
+        if isinstance(images_raw, list) and images_raw:
+            if isinstance(images_raw[0], str):
+                # Direct string URLs
+                images = images_raw
+            else:
+                # Object format with src property
+                images = [img.get('src', '') for img in images_raw if img.get('src')]
+        else:
+            images = []
+        
+        # ไม่มีรูป -> ปล่อยว่าง ตอนเรนเดอร์จะใช้ MISSING_IMAGE_SVG แทน
+        
+        # Extract other fields
+        status = car_raw.get('status', 'พร้อมขาย')
+        brand = car_raw.get('brand', '')
+        
+        # Try to extract car details from title or tags
+        extracted_brand, model, year = self.extract_car_details(title)
+        if not brand:
+            brand = extracted_brand
+        
+        return CarData(
+            id=car_id,
+            title=title,
+            handle=handle,
+            description=description,
+            price=price,
+            status=status,
+            images=images,
+            brand=brand,
+            model=model,
+            year=year,
+            created_at=car_raw.get('created_at', ''),
+            updated_at=car_raw.get('updated_at', '')
+        )
+
     def process_car_data(self, raw_data: Dict[str, Any], api_source: str) -> List[CarData]:
         """ประมวลผลข้อมูลรถจาก API เป็น CarData objects"""
         logger.info("🔄 Processing car data...")
@@ -126,65 +396,7 @@ class PythonSSRGenerator:
             processed_cars = []
             for car_raw in cars_raw:
                 try:
-                    # Extract basic information
-                    car_id = str(car_raw.get('id', car_raw.get('handle', '')))
-                    title = car_raw.get('title', 'ไม่ระบุชื่อ')
-                    handle = car_raw.get('handle', f"car-{car_id}")
-                    
-                    # Clean description - handle both desc and body_html
-                    body_html = car_raw.get('body_html', car_raw.get('desc', ''))
-                    description = self.clean_html_text(body_html)
-                    
-                    # Extract price - handle different formats
-                    variants = car_raw.get('variants', [])
-                    if variants:
-                        price = float(variants[0].get('price', 0))
-                    else:
-                        # Try to extract price from description
-                        price_match = re.search(r'(\d{1,3}(?:,\d{3})*(?:\.\d{2})?)', body_html)
-                        price = float(price_match.group().replace(',', '')) if price_match else 450000.0
-                    
-                    # Extract images
-                    images_raw = car_raw.get('images', [])
-                    if isinstance(images_raw, list) and images_raw:
-                        if isinstance(images_raw[0], str):
-                            # Direct string URLs
-                            images = images_raw
-                        else:
-                            # Object format with src property
-                            images = [img.get('src', '') for img in images_raw if img.get('src')]
-                    else:
-                        images = []
-                    
-                    if not images:
-                        images = ['https://via.placeholder.com/300x200?text=No+Image']
-                    
-                    # Extract other fields
-                    status = car_raw.get('status', 'พร้อมขาย')
-                    brand = car_raw.get('brand', '')
-                    
-                    # Try to extract car details from title or tags
-                    extracted_brand, model, year = self.extract_car_details(title)
-                    if not brand:
-                        brand = extracted_brand
-                    
-                    car_data = CarData(
-                        id=car_id,
-                        title=title,
-                        handle=handle,
-                        description=description,
-                        price=price,
-                        status=status,
-                        images=images,
-                        brand=brand,
-                        model=model,
-                        year=year,
-                        created_at=car_raw.get('created_at', ''),
-                        updated_at=car_raw.get('updated_at', '')
-                    )
-                    
-                    processed_cars.append(car_data)
-                    
+                    processed_cars.append(self.normalize_car(car_raw))
                 except Exception as e:
                     logger.warning(f"⚠️ Error processing car {car_raw.get('id', 'unknown')}: {str(e)}")
                     continue
@@ -193,7 +405,7 @@ class PythonSSRGenerator:
             processed_cars.sort(key=lambda x: x.created_at or x.updated_at, reverse=True)
             
             logger.info(f"✅ Successfully processed {len(processed_cars)} cars")
-            return processed_cars[:6]  # Return only first 6 cars
+            return processed_cars[:self.listing_limit]
 
         except Exception as e:
             logger.error(f"❌ Error processing car data: {str(e)}")
@@ -312,19 +524,136 @@ class PythonSSRGenerator:
         
         return json.dumps(schema, ensure_ascii=False, indent=2)
 
+    async def prepare_images(self, cars: List[CarData], max_seconds: Optional[float] = None):
+        """เตรียมข้อมูลรูปก่อนเรนเดอร์: ขนาดจริงทุกรูป + LQIP ของรูป hero (แคชทั้งคู่)
+        เกิน max_seconds แล้วเรนเดอร์ด้วยเท่าที่มีในแคช ที่เหลือทำต่อรอบหน้า"""
+        hero_urls = [car.images[0] for car in cars if car.images]
+        try:
+            # รูปใหม่เข้าคิวสร้าง variants (optimize_images.py ทำต่อ) - hero/หน้าแรกก่อน
+            added = self.image_jobs.enqueue(catalog_jobs([car.images for car in cars], self.listing_limit))
+            if added:
+                logger.info(f"📋 Queued {added} new images for variant generation")
+        except sqlite3.Error as e:
+            logger.warning(f"⚠️ Image job queue unavailable: {str(e)}")
+        results = await asyncio.gather(
+            asyncio.wait_for(self.image_probe.probe_many(url for car in cars for url in car.images), max_seconds),
+            # งานในเธรดยกเลิกจากภายนอกไม่ได้ - ส่งงบเวลาเข้าไปให้หยุดเอง
+            asyncio.to_thread(self.build_image_assets, cars, hero_urls, max_seconds),
+            return_exceptions=True,
+        )
+        for result in results:
+            if isinstance(result, asyncio.TimeoutError):
+                logger.warning(f"⏱️ Image probing exceeded {max_seconds:.1f}s - using cached sizes")
+            elif isinstance(result, Exception):
+                logger.warning(f"⚠️ Image preparation failed: {str(result)}")
+
+    def build_image_assets(self, cars: List[CarData], hero_urls: List[str], max_seconds: Optional[float] = None):
+        """OG card แล้วตามด้วย LQIP (รันในเธรดแยก) - OG card ดาวน์โหลดต้นฉบับแบบขนานเข้าแคชก่อน
+        LQIP จึงใช้ต้นฉบับจากแคชได้เลย ทั้งสองขั้นใช้งบเวลา max_seconds ร่วมกัน"""
+        started = time.perf_counter()
+        self.og_cards.build(self.og_card_inputs(cars), max_seconds=max_seconds)
+        remaining = max_seconds - (time.perf_counter() - started) if max_seconds else None
+        if remaining is not None and remaining <= 0:
+            logger.warning("⏱️ No time left for LQIP placeholders - rendering without the missing ones")
+            return
+        self.placeholders.build(hero_urls, max_seconds=remaining)
+
+    def og_card_inputs(self, cars: List[CarData]) -> List[Tuple[str, str, str, Optional[str]]]:
+        """ข้อมูลที่ใช้สร้าง OG card: (handle, ชื่อรถ, ราคา, รูปแรก)"""
+        return [(car.handle, car.title, self.format_price(car.price), car.images[0] if car.images else None)
+                for car in cars]
+
+    def og_image_meta(self, car: CarData, fallback_image: str) -> str:
+        """meta og:image ของหน้า detail - ใช้การ์ดของรถคันนั้นถ้าสร้างแล้ว"""
+        card_url = self.og_cards.card_url(car.handle)
+        if not card_url:
+            return f'<meta property="og:image" content="{fallback_image}">'
+        return (f'<meta property="og:image" content="{self.seo_config["canonical_url"]}{card_url}">\n'
+                f'    <meta property="og:image:width" content="{CARD_SIZE[0]}">\n'
+                f'    <meta property="og:image:height" content="{CARD_SIZE[1]}">\n'
+                f'    <meta property="og:image:alt" content="{car.title}">')
+
+    def image_size_attrs(self, image_url: str, variants: Optional[List[Dict[str, Any]]] = None) -> str:
+        """width/height ของรูปตามขนาดจริง - ยังไม่รู้ขนาดแต่ CDN crop เป็น 4:3 ให้ใช้ขนาดของ variant
+        (ว่างถ้าไม่รู้สัดส่วนเลย)"""
+        size = self.image_probe.get(image_url)
+        if not size and variants:
+            default = pick_variant(variants, 600)
+            size = (default['width'], default['height'])
+        return f' width="{size[0]}" height="{size[1]}"' if size else ''
+
+    def placeholder_attr(self, image_url: str) -> str:
+        """style ที่แสดง LQIP เป็นพื้นหลังระหว่างรอรูปจริง (ว่างถ้ายังไม่มี)"""
+        style = self.placeholders.background_style(image_url)
+        return f' style="{style}"' if style else ''
+
+    def responsive_variants(self, image_url: str) -> Optional[List[Dict[str, Any]]]:
+        """variants ของรูปบน Shopify CDN ตามขนาดจริง (None = host อื่น ใช้ <img> ธรรมดา)"""
+        if not is_shopify_cdn(image_url):
+            return None
+        size = self.image_probe.get(image_url)
+        return shopify_variants(image_url, variant_widths(size), size)
+
+    def render_image(self, image_url: str, alt: str, sizes: str, loading: str = "lazy",
+                     lcp: bool = False, placeholder: bool = False, indent: str = "") -> str:
+        """<img> (หรือ <picture> ถ้ามี srcset) - lcp=True เฉพาะรูปที่เป็น LCP ของหน้าได้ fetchpriority=high"""
+        variants = self.responsive_variants(image_url)
+        attrs = f'{self.image_size_attrs(image_url, variants)} alt="{alt}" loading="{loading}"'
+        if lcp:
+            attrs += ' fetchpriority="high"'
+        if placeholder:
+            attrs += self.placeholder_attr(image_url)
+
+        if not variants:
+            return (f'''{indent}<img src="{image_url}"{attrs}'''
+                    f''' onerror="this.onerror=null;this.src='{MISSING_IMAGE_SVG}'">''')
+
+        formats = srcset_formats(variants)
+        sources = ''.join(f'{indent}    <source type="{mime}" srcset="{srcset}" sizes="{sizes}">\n'
+                          for mime, srcset in formats[:-1])
+        default = pick_variant(variants, 600)
+        # รูปเสีย: ลบ <source>/srcset ออกก่อน ไม่งั้นเบราว์เซอร์ไม่ใช้ src ใหม่
+        onerror = ("this.onerror=null;this.parentNode.querySelectorAll('source').forEach(s=>s.remove());"
+                   f"this.removeAttribute('srcset');this.src='{MISSING_IMAGE_SVG}'")
+        return (f'{indent}<picture>\n{sources}'
+                f'{indent}    <img src="{default["jpg"]}" srcset="{formats[-1][1]}" sizes="{sizes}"{attrs} onerror="{onerror}">\n'
+                f'{indent}</picture>')
+
+    def gallery_manifest_path(self, handle: str) -> Path:
+        return self.car_detail_path / f"{handle}.gallery.json"
+
+    def car_gallery_manifest(self, car: CarData) -> Optional[Dict[str, Any]]:
+        """manifest ของรูปที่เกิน GALLERY_INLINE_IMAGES รูปแรกในหน้า detail (None = อยู่ใน HTML ครบ)"""
+        remaining = car.images[GALLERY_INLINE_IMAGES:]
+        if not remaining:
+            return None
+        return gallery_manifest(car.title, GALLERY_IMAGE_SIZES, [
+            gallery_manifest_entry(image_url, self.responsive_variants(image_url), self.image_probe.get(image_url))
+            for image_url in remaining
+        ])
+
+    def lcp_preload(self, image_url: Optional[str], sizes: str) -> str:
+        """<link rel=preload> ของรูป LCP ของหน้า ตรงกับ srcset ที่ <picture> จะเลือกจริง"""
+        if not image_url or image_url.startswith('data:'):
+            return ''
+        variants = self.responsive_variants(image_url)
+        if variants:
+            return preload_link(variants, sizes)
+        return f'<link rel="preload" as="image" href="{image_url}" fetchpriority="high">'
+
     def render_car_card(self, car: CarData, index: int = 0) -> str:
-        """เรนเดอร์ car card HTML"""
+        """เรนเดอร์ car card HTML (การ์ดแรกของหน้าคือรูป LCP)"""
         formatted_price = self.format_price(car.price)
         detail_link = f"car-detail/{car.handle}.html"
-        image_url = car.images[0] if car.images else 'https://via.placeholder.com/300x200'
+        image_url = car.images[0] if car.images else MISSING_IMAGE_SVG
         animation_delay = (index * 0.1) + 0.1
+        image_html = self.render_image(image_url, car.title, CARD_IMAGE_SIZES,
+                                       loading='eager' if index < 2 else 'lazy',
+                                       lcp=index == 0, placeholder=True, indent="            ")
         
         return f'''
         <div class="car-card" style="animation-delay: {animation_delay}s;">
-            <img src="{image_url}" 
-                 alt="{car.title}" 
-                 loading="{'eager' if index < 2 else 'lazy'}"
-                 onerror="this.src='https://via.placeholder.com/300x200?text=Loading...'">
+{image_html}
             <div class="car-info">
                 <div class="car-title">{car.title}</div>
                 <div class="car-price">฿{formatted_price}</div>
@@ -334,15 +663,25 @@ class PythonSSRGenerator:
             </div>
         </div>'''
 
-    def generate_html_page(self, cars: List[CarData], api_source: str) -> str:
-        """สร้างหน้า HTML สมบูรณ์"""
+    def generate_html_page(self, cars: List[CarData], api_source: str, stale_since: Optional[str] = None) -> str:
+        """สร้างหน้า HTML สมบูรณ์ (stale_since = เวลาของ snapshot ถ้าใช้ข้อมูลสำรอง)"""
         logger.info("🎨 Generating HTML page...")
         
         # Generate components
         car_cards_html = '\n'.join([self.render_car_card(car, i) for i, car in enumerate(cars)])
+        # รูปการ์ดแรกเป็น LCP ของหน้า listing - เริ่มโหลดตั้งแต่ <head>
+        lcp_preload = self.lcp_preload(cars[0].images[0] if cars and cars[0].images else None, CARD_IMAGE_SIZES)
         schema_markup = self.generate_schema_markup(cars)
         last_update = datetime.now().strftime("%d/%m/%Y %H:%M น.")
         
+        # Staleness marker เมื่อเรนเดอร์จาก snapshot
+        stale_notice = ''
+        if stale_since:
+            stale_notice = f'''
+            <div class="stale-notice" data-stale-since="{stale_since}">
+                ⚠️ แสดงข้อมูลสำรองเมื่อ {stale_since} - ระบบกำลังเชื่อมต่อแหล่งข้อมูลใหม่
+            </div>'''
+        
         # Create page title with car count
         page_title = f"รถมือสองเชียงใหม่ เข้าใหม่ {len(cars)} คันล่าสุด ฟรีดาวน์ | {self.seo_config['site_name']}"
         
@@ -381,6 +720,7 @@ class PythonSSRGenerator:
     <meta name="twitter:image" content="{self.seo_config['og_image']}">
     
     <!-- Performance Critical Resources -->
+    {lcp_preload}
     <link rel="preload" href="style.css" as="style">
     <link rel="stylesheet" href="style.css">
     <link rel="preload" href="https://fonts.googleapis.com/css2?family=Prompt:wght@300;400;600;700;800&display=swap" as="style">
@@ -438,7 +778,7 @@ class PythonSSRGenerator:
         <footer class="update-info">
             <div class="server-info">
                 <strong>🔥 Server-Side Rendered</strong> - อัพเดทสดจาก API
-            </div>
+            </div>{stale_notice}
             <div class="update-details">
                 <small>
                     📅 อัพเดทล่าสุด: {last_update} | 
@@ -495,6 +835,15 @@ class PythonSSRGenerator:
         border-radius: 8px;
     }}
     
+    .stale-notice {{
+        text-align: center;
+        background: #fff3cd;
+        color: #856404;
+        padding: 10px;
+        border-radius: 6px;
+        margin: 10px 0;
+    }}
+    
     .contact-info p {{
         margin: 0;
         font-weight: 600;
@@ -523,36 +872,160 @@ class PythonSSRGenerator:
 
         return html_template
 
-    async def render_and_save(self, api_source: str = 'local', output_file: str = 'index-ssr.html') -> bool:
+    def generate_car_detail_page(self, car: CarData) -> str:
+        """สร้างหน้า car detail ของรถหนึ่งคัน"""
+        formatted_price = self.format_price(car.price)
+        page_url = f"{self.seo_config['canonical_url']}car-detail/{car.handle}.html"
+        main_image = car.images[0] if car.images else self.seo_config['og_image']
+        page_title = f"{car.title} | {self.seo_config['site_name']}"
+        last_update = datetime.now().strftime("%d/%m/%Y %H:%M น.")
+
+        schema = {
+            "@context": "https://schema.org",
+            "@type": "Product",
+            "@id": page_url,
+            "name": car.title,
+            "description": car.description,
+            "image": car.images,
+            "brand": {"@type": "Brand", "name": car.brand} if car.brand else None,
+            "offers": {
+                "@type": "Offer",
+                "price": car.price,
+                "priceCurrency": "THB",
+                "availability": "https://schema.org/InStock" if car.status == "พร้อมขาย" else "https://schema.org/OutOfStock"
+            }
+        }
+        schema = {k: v for k, v in schema.items() if v is not None}
+        schema_markup = json.dumps(schema, ensure_ascii=False, indent=2)
+
+        # รูปแรกของ gallery เป็น LCP ของหน้า detail
+        # รูปที่เกิน GALLERY_INLINE_IMAGES อยู่ใน <handle>.gallery.json โหลดเมื่อเลื่อนใกล้ถึง/กดดูทั้งหมด
+        images_html = '\n'.join([
+            self.render_image(image_url, f"{car.title} - รูปที่ {i + 1}", GALLERY_IMAGE_SIZES,
+                              loading='eager' if i == 0 else 'lazy', lcp=i == 0, placeholder=i == 0,
+                              indent="            ")
+            for i, image_url in enumerate(car.images[:GALLERY_INLINE_IMAGES] or [MISSING_IMAGE_SVG])
+        ])
+        gallery_script = ''
+        if len(car.images) > GALLERY_INLINE_IMAGES:
+            more_html = gallery_more_html(self.gallery_manifest_path(car.handle).name, len(car.images))
+            images_html += '\n' + '\n'.join(f"            {line}" for line in more_html.splitlines())
+            gallery_script = f"<script>{GALLERY_LOADER_JS}</script>"
+        lcp_preload = self.lcp_preload(car.images[0] if car.images else None, GALLERY_IMAGE_SIZES)
+
+        return f'''<!DOCTYPE html>
+<html lang="th" itemscope itemtype="https://schema.org/Product">
+<head>
+    <meta charset="UTF-8">
+    <meta name="viewport" content="width=device-width, initial-scale=1.0">
+    <title>{page_title}</title>
+    <meta name="description" content="{car.description}">
+    <meta name="robots" content="index, follow">
+    <link rel="canonical" href="{page_url}">
+
+    <!-- Open Graph -->
+    <meta property="og:title" content="{page_title}">
+    <meta property="og:description" content="{car.description}">
+    {self.og_image_meta(car, main_image)}
+    <meta property="og:url" content="{page_url}">
+    <meta property="og:type" content="product">
+    <meta property="og:site_name" content="{self.seo_config['site_name']}">
+    <meta property="product:price:amount" content="{car.price:.0f}">
+    <meta property="product:price:currency" content="THB">
+
+    {lcp_preload}
+    <link rel="stylesheet" href="../style.css">
+    <style>
+    .car-gallery img {{
+        max-width: 100%;
+        height: auto;
+    }}
+    .gallery-more {{
+        text-align: center;
+        margin: 1rem 0;
+    }}
+    </style>
+
+    <!-- Schema.org JSON-LD -->
+    <script type="application/ld+json">
+    {schema_markup}
+    </script>
+</head>
+
+<body>
+    <div class="container">
+        <nav class="breadcrumb"><a href="../index.html">หน้าแรก</a> › {car.title}</nav>
+        <header class="car-header">
+            <h1 class="car-title">{car.title}</h1>
+            <div class="car-price">฿{formatted_price}</div>
+            <div class="car-status">{car.status}</div>
+        </header>
+
+        <section class="car-gallery">
+{images_html}
+        </section>
+
+        <section class="car-details">
+            <p class="car-desc">{car.description}</p>
+        </section>
+
+        <footer class="update-info">
+            <small>📅 อัพเดทล่าสุด: {last_update} | 📞 โทร: {self.seo_config['phone']}</small>
+        </footer>
+    </div>
+    {gallery_script}
+</body>
+</html>'''
+
+    def write_page(self, output_path: Path, html_content: str) -> Path:
+        """บันทึกไฟล์ HTML (สร้างโฟลเดอร์ให้อัตโนมัติ)
+        critical CSS คำนวณจาก stylesheet ที่หน้าลิงก์ (ถ้ามีไฟล์ใน docs) ส่วนที่เหลือโหลดแบบไม่ block render"""
+        output_path.parent.mkdir(parents=True, exist_ok=True)
+        html_content = inline_critical_css(html_content, output_path)
+        with open(output_path, 'w', encoding='utf-8') as f:
+            f.write(html_content)
+        return output_path
+
+    def save_car_detail_page(self, car: CarData) -> Path:
+        """เรนเดอร์และบันทึกหน้า car detail"""
+        output_path = self.car_detail_path / f"{car.handle}.html"
+        write_gallery_manifest(self.gallery_manifest_path(car.handle), self.car_gallery_manifest(car))
+        return self.write_page(output_path, self.generate_car_detail_page(car))
+
+    def remove_car_detail_page(self, handle: str) -> bool:
+        """ลบหน้า car detail ของรถที่ถูกลบออกจากร้าน"""
+        output_path = self.car_detail_path / f"{handle}.html"
+        self.og_cards.remove(handle)
+        write_gallery_manifest(self.gallery_manifest_path(handle), None)
+        if output_path.exists():
+            output_path.unlink()
+            return True
+        return False
+
+    async def render_and_save(self, api_source: str = 'local', output_file: str = 'index-ssr.html',
+                              bulk: bool = False) -> bool:
         """เรนเดอร์และบันทึกไฟล์ HTML"""
         logger.info(f"🚀 Starting Python SSR rendering from '{api_source}' API...")
         
         start_time = datetime.now()
         
-        # Fetch data from API
-        raw_data = await self.fetch_api_data(api_source)
-        if not raw_data:
-            logger.error(f"❌ Failed to fetch data from {api_source}")
-            return False
-        
-        # Process car data
-        cars = self.process_car_data(raw_data, api_source)
+        # Fetch + process ภายใต้ circuit breaker (fallback เป็น snapshot ล่าสุด)
+        cars, stale_since = await self.fetch_cars(api_source, bulk=bulk)
         if not cars:
-            logger.error("❌ No car data found")
+            logger.error(f"❌ No car data from {api_source} and no snapshot to fall back to")
             return False
         
+        # ขนาดรูปจริงสำหรับ width/height + LQIP ของรูป hero (แคชทั้งคู่)
+        await self.prepare_images(cars, max_seconds=self.fetch_budget(api_source))
+        
         # Generate HTML
-        html_content = self.generate_html_page(cars, api_source)
+        html_content = self.generate_html_page(cars, api_source, stale_since)
         
         # Save to file
         output_path = self.docs_path / output_file
         try:
-            # Ensure docs directory exists
-            self.docs_path.mkdir(exist_ok=True)
-            
-            with open(output_path, 'w', encoding='utf-8') as f:
-                f.write(html_content)
-            
+            self.write_page(output_path, html_content)
+
             end_time = datetime.now()
             render_time = (end_time - start_time).total_seconds()
             file_size = os.path.getsize(output_path)
@@ -597,24 +1070,50 @@ class PythonSSRGenerator:
 async def main():
     """Main CLI function"""
     parser = argparse.ArgumentParser(description='Ultimate Python SSR 2025 - Server-Side Rendering')
-    parser.add_argument('--api', default='local', choices=['local', 'shopify', 'custom'], 
-                       help='API source to fetch data from')
+    parser.add_argument('--api', default='local', 
+                       help='API source to fetch data from: local, shopify, custom, '
+                            'or several joined with + (e.g. local+shopify) to fetch concurrently and merge')
     parser.add_argument('--output', default='index-ssr.html', 
                        help='Output HTML filename')
     parser.add_argument('--auto', action='store_true', 
                        help='Enable auto-update mode')
     parser.add_argument('--interval', type=int, default=30, 
                        help='Auto-update interval in minutes')
+    parser.add_argument('--bulk', action='store_true',
+                       help='Ingest the whole store via a Shopify GraphQL bulk operation (JSONL stream)')
+    parser.add_argument('--api-url', default=None,
+                       help='Override the products endpoint URL of the selected API source')
+    parser.add_argument('--webhook', action='store_true',
+                       help='Run Shopify product webhook receiver (targeted re-renders)')
+    parser.add_argument('--host', default='127.0.0.1',
+                       help='Webhook receiver bind address')
+    parser.add_argument('--port', type=int, default=8080,
+                       help='Webhook receiver port')
+    parser.add_argument('--debounce', type=float, default=2.0,
+                       help='Seconds to coalesce webhook bursts per product')
     
     args = parser.parse_args()
     
     # Create SSR generator
     ssr = PythonSSRGenerator()
+    unknown = [source for source in args.api.split('+') if source not in ssr.api_configs]
+    if unknown:
+        parser.error(f"unknown API source(s): {', '.join(unknown)}")
+    if (args.api_url or args.bulk) and '+' in args.api:
+        parser.error("--api-url and --bulk work with a single API source")
+    if args.api_url:
+        ssr.api_configs[args.api]['url'] = args.api_url
     
-    if args.auto:
+    if args.webhook:
+        from shopify_webhook import ShopifyWebhookReceiver
+        receiver = ShopifyWebhookReceiver(ssr, args.api, debounce_seconds=args.debounce,
+                                          listing_pages=[args.output])
+        await receiver.serve(args.host, args.port)
+    elif args.auto:
         await ssr.auto_update_scheduler(args.api, args.interval)
     else:
-        success = await ssr.render_and_save(args.api, args.output)
+        success = await ssr.render_and_save(args.api, args.output, bulk=args.bulk)
+        await ssr.finish_background_fetches()
         if success:
             print("\n🎉 Python SSR rendering completed successfully!")
             print(f"🌐 Open docs/{args.output} in your browser to view the result")
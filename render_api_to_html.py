@@ -13,6 +13,8 @@ import asyncio
 import aiohttp
 from typing import Dict, List, Optional
 
+from image_placeholders import MISSING_IMAGE_SVG
+
 class APItoHTMLRenderer:
     def __init__(self):
         self.base_path = Path(__file__).parent
@@ -226,7 +228,7 @@ class APItoHTMLRenderer:
         cards_html = ""
         
         for car in cars:
-            image_url = car['images'][0]['src'] if car['images'] else 'https://via.placeholder.com/300x200'
+            image_url = car['images'][0]['src'] if car['images'] else MISSING_IMAGE_SVG
             detail_link = f"car-detail/{car['handle']}.html"
             
             card_html = self.templates['car_card'].format(
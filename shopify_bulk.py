@@ -0,0 +1,199 @@
+#!/usr/bin/env python3
+"""
+Shopify Bulk Operation Ingestion
+เริ่ม GraphQL bulk operation, รอจนเสร็จ แล้วสตรีมไฟล์ JSONL ทีละบรรทัด
+ประกอบแถวลูก (variants/images) กลับเข้าสินค้าแม่แบบสตรีม - ในหน่วยความจำมีแค่สินค้าปัจจุบัน
+"""
+
+import asyncio
+import json
+import logging
+from typing import Any, AsyncIterator, Dict, Optional
+
+import aiohttp
+
+from shopify_client import ShopifyClient
+
+logger = logging.getLogger(__name__)
+
+BULK_PRODUCTS_QUERY = '''
+{
+  products {
+    edges {
+      node {
+        id
+        handle
+        title
+        descriptionHtml
+        status
+        createdAt
+        updatedAt
+        variants {
+          edges {
+            node {
+              id
+              price
+            }
+          }
+        }
+        images {
+          edges {
+            node {
+              id
+              url
+            }
+          }
+        }
+      }
+    }
+  }
+}
+'''
+
+RUN_BULK_MUTATION = '''
+mutation RunBulk($query: String!) {
+  bulkOperationRunQuery(query: $query) {
+    bulkOperation { id status }
+    userErrors { field message }
+  }
+}
+'''
+
+CURRENT_BULK_QUERY = '''
+{
+  currentBulkOperation {
+    id
+    status
+    errorCode
+    objectCount
+    url
+  }
+}
+'''
+
+TERMINAL_STATUSES = {'COMPLETED', 'FAILED', 'CANCELED', 'EXPIRED'}
+
+
+def graphql_url_for(rest_url: str) -> str:
+    """แปลง URL ของ REST products.json เป็น endpoint graphql.json ของ API version เดียวกัน"""
+    base, _, _ = rest_url.rpartition('/')
+    return f"{base}/graphql.json"
+
+
+def gid_to_id(gid: str) -> str:
+    """gid://shopify/Product/123 -> 123"""
+    return gid.rsplit('/', 1)[-1] if gid else ''
+
+
+class ShopifyBulkIngestor:
+    """เรียก bulk operation และสตรีมผลลัพธ์เป็นสินค้ารูปแบบเดียวกับ REST"""
+
+    def __init__(self, client: ShopifyClient, graphql_url: str,
+                 poll_interval: float = 1.0, max_poll_interval: float = 10.0,
+                 timeout_seconds: float = 2 * 60 * 60):
+        self.client = client
+        self.graphql_url = graphql_url
+        self.poll_interval = poll_interval
+        self.max_poll_interval = max_poll_interval
+        self.timeout_seconds = timeout_seconds
+
+    async def start(self, query: str = BULK_PRODUCTS_QUERY) -> str:
+        """เริ่ม bulk operation คืนค่า operation id"""
+        data = await self.client.post_json(self.graphql_url, {
+            'query': RUN_BULK_MUTATION, 'variables': {'query': query}
+        })
+        result = data.get('data', {}).get('bulkOperationRunQuery') or {}
+        errors = result.get('userErrors') or data.get('errors')
+        if errors:
+            raise Exception(f"Bulk operation rejected: {errors}")
+        operation = result.get('bulkOperation') or {}
+        logger.info(f"📦 Bulk operation started: {operation.get('id')}")
+        return operation.get('id', '')
+
+    async def wait(self, operation_id: str) -> Optional[str]:
+        """poll จนกว่า operation จะจบ คืนค่า URL ของไฟล์ JSONL (None = ไม่มีข้อมูล)"""
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + self.timeout_seconds
+        interval = self.poll_interval
+
+        while loop.time() < deadline:
+            data = await self.client.post_json(self.graphql_url, {'query': CURRENT_BULK_QUERY})
+            operation = data.get('data', {}).get('currentBulkOperation') or {}
+            if operation.get('id') and operation.get('id') != operation_id:
+                raise Exception(f"Another bulk operation is running: {operation.get('id')}")
+
+            status = operation.get('status', '')
+            if status in TERMINAL_STATUSES:
+                if status != 'COMPLETED':
+                    raise Exception(f"Bulk operation {status}: {operation.get('errorCode')}")
+                logger.info(f"✅ Bulk operation completed: {operation.get('objectCount')} objects")
+                return operation.get('url')
+
+            await asyncio.sleep(interval)
+            interval = min(self.max_poll_interval, interval * 1.5)
+
+        raise Exception(f"Bulk operation timed out after {self.timeout_seconds:.0f}s")
+
+    async def iter_lines(self, url: str, chunk_size: int = 64 * 1024) -> AsyncIterator[bytes]:
+        """อ่านไฟล์ JSONL เป็นบรรทัด (ไม่จำกัดความยาวบรรทัดแบบ StreamReader.readline)"""
+        # ไฟล์อยู่บน storage ภายนอก - ไม่ส่ง access token ของร้านไปด้วย
+        async with self.client.session.get(url, timeout=aiohttp.ClientTimeout(total=None, sock_read=300)) as response:
+            if response.status != 200:
+                raise Exception(f"Bulk export returned status {response.status}")
+            buffer = b''
+            async for chunk in response.content.iter_chunked(chunk_size):
+                buffer += chunk
+                *lines, buffer = buffer.split(b'\n')
+                for line in lines:
+                    if line.strip():
+                        yield line
+            if buffer.strip():
+                yield buffer
+
+    async def iter_products(self, url: str) -> AsyncIterator[Dict[str, Any]]:
+        """ประกอบแถวแม่/ลูกกลับเป็นสินค้า - แถวลูกตามหลังแม่เสมอในไฟล์ bulk"""
+        current: Optional[Dict[str, Any]] = None
+        current_gid = ''
+        orphans = 0
+
+        async for line in self.iter_lines(url):
+            row = json.loads(line)
+            parent_gid = row.get('__parentId')
+
+            if parent_gid is None:
+                if current is not None:
+                    yield current
+                current_gid = row.get('id', '')
+                current = {
+                    'id': gid_to_id(current_gid),
+                    'handle': row.get('handle', ''),
+                    'title': row.get('title', ''),
+                    'body_html': row.get('descriptionHtml', ''),
+                    'status': (row.get('status') or '').lower(),
+                    'created_at': row.get('createdAt', ''),
+                    'updated_at': row.get('updatedAt', ''),
+                    'variants': [],
+                    'images': [],
+                }
+            elif current is not None and parent_gid == current_gid:
+                child_gid = row.get('id', '')
+                if '/ProductVariant/' in child_gid:
+                    current['variants'].append({'id': gid_to_id(child_gid), 'price': row.get('price', '0')})
+                elif row.get('url'):
+                    current['images'].append({'id': gid_to_id(child_gid), 'src': row['url']})
+            else:
+                orphans += 1
+
+        if current is not None:
+            yield current
+        if orphans:
+            logger.warning(f"⚠️ Skipped {orphans} bulk rows without a preceding parent")
+
+    async def run(self) -> AsyncIterator[Dict[str, Any]]:
+        """เริ่ม -> รอ -> สตรีมสินค้า"""
+        operation_id = await self.start()
+        url = await self.wait(operation_id)
+        if not url:
+            return
+        async for product in self.iter_products(url):
+            yield product
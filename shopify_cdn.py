@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+"""
+Shopify CDN Image URLs
+สร้าง URL รูปขนาด/format ที่ต้องการจาก URL รูปบน Shopify CDN ให้ CDN ย่อ/แปลงรูปเอง
+- ใช้พารามิเตอร์ width / height / crop / format ของ CDN
+- ตัด suffix ขนาดแบบเก่าในชื่อไฟล์ (_600x450, _grande, _x300_crop_center, @2x, .progressive) ออกก่อน
+- เก็บ v= (cache buster) และพารามิเตอร์อื่นไว้เหมือนเดิม
+"""
+
+import re
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import parse_qsl, urlencode, urlparse, urlunparse
+
+from image_probe import scaled_height
+
+SHOPIFY_CDN_HOSTS = {'cdn.shopify.com'}
+# โดเมนร้านเสิร์ฟรูปผ่าน CDN เดียวกันที่ /cdn/shop/...
+SHOPIFY_SHOP_CDN_PREFIX = '/cdn/shop/'
+
+CROP_POSITIONS = {'top', 'center', 'bottom', 'left', 'right', 'region'}
+# format ที่ CDN แปลงให้ได้ (pjpg = progressive JPEG)
+CDN_FORMATS = {'jpg': 'pjpg', 'pjpg': 'pjpg', 'png': 'png', 'webp': 'webp'}
+TRANSFORM_PARAMS = {'width', 'height', 'crop', 'format'}
+
+_NAMED_SIZES = 'pico|icon|thumb|small|compact|medium|large|grande|original|master'
+_SIZE_SUFFIX = re.compile(
+    r'_(?:\d+x\d*|x\d+|' + _NAMED_SIZES + r')'
+    r'(?:_crop_(?:top|center|bottom|left|right))?'
+    r'(?:@\dx)?$'
+)
+
+
+def is_shopify_cdn(url: str) -> bool:
+    parsed = urlparse(url)
+    if not parsed.scheme.startswith('http'):
+        return False
+    return parsed.netloc in SHOPIFY_CDN_HOSTS or parsed.path.startswith(SHOPIFY_SHOP_CDN_PREFIX)
+
+
+def strip_size_suffix(path: str) -> str:
+    """ตัด suffix ขนาดแบบเก่าออกจากชื่อไฟล์ ได้ path ของรูปต้นฉบับ"""
+    directory, _, filename = path.rpartition('/')
+    stem, dot, extension = filename.rpartition('.')
+    if not dot:
+        return path
+    stem = stem[:-len('.progressive')] if stem.endswith('.progressive') else stem
+    stem = _SIZE_SUFFIX.sub('', stem)
+    return f"{directory}/{stem}.{extension}" if directory else f"{stem}.{extension}"
+
+
+def shopify_image_url(url: str, width: Optional[int] = None, height: Optional[int] = None,
+                      crop: Optional[str] = None, fmt: Optional[str] = None) -> str:
+    """URL รูปบน Shopify CDN ตามขนาด/format ที่ต้องการ
+    ใส่ทั้ง width และ height โดยไม่กำหนด crop -> CDN ย่อให้อยู่ในกรอบ (สัดส่วนเดิม)"""
+    if crop and crop not in CROP_POSITIONS:
+        raise ValueError(f"crop ต้องเป็นหนึ่งใน {sorted(CROP_POSITIONS)}")
+    if fmt and fmt not in CDN_FORMATS:
+        raise ValueError(f"format ต้องเป็นหนึ่งใน {sorted(CDN_FORMATS)}")
+
+    parsed = urlparse(url)
+    params = [(key, value) for key, value in parse_qsl(parsed.query, keep_blank_values=True)
+              if key not in TRANSFORM_PARAMS]
+    if width:
+        params.append(('width', str(width)))
+    if height:
+        params.append(('height', str(height)))
+    if crop:
+        params.append(('crop', crop))
+    if fmt:
+        params.append(('format', CDN_FORMATS[fmt]))
+    return urlunparse(parsed._replace(path=strip_size_suffix(parsed.path), query=urlencode(params)))
+
+
+def shopify_variants(url: str, widths: List[int], size: Optional[Tuple[int, int]] = None) -> List[Dict]:
+    """URL WebP/JPEG ของแต่ละความกว้าง [{webp, jpg, width, height}]
+    รู้ขนาดจริง -> ขอแค่ width (CDN คงสัดส่วน), ไม่รู้ -> ให้ CDN crop เป็น 4:3 ตรงกับ width/height ใน HTML"""
+    variants = []
+    for width in widths:
+        if size:
+            height, crop = scaled_height(size, width), None
+        else:
+            height, crop = round(width * 3 / 4), 'center'
+        variants.append({
+            'webp': shopify_image_url(url, width, crop and height, crop, 'webp'),
+            'jpg': shopify_image_url(url, width, crop and height, crop, 'jpg'),
+            'width': width,
+            'height': height,
+        })
+    return variants
@@ -0,0 +1,146 @@
+#!/usr/bin/env python3
+"""
+Rate-limit-aware Shopify Client
+- Leaky bucket ที่ปรับตาม X-Shopify-Shop-Api-Call-Limit (ใช้ให้เต็มที่แต่ไม่โดน throttle)
+- เคารพ Retry-After เมื่อโดน 429
+- Retry 429/5xx/ข้อผิดพลาดเครือข่าย ด้วย exponential backoff แบบมี jitter
+"""
+
+import asyncio
+import logging
+import random
+import time
+from typing import Any, Dict, Optional, Tuple
+
+import aiohttp
+
+logger = logging.getLogger(__name__)
+
+
+class LeakyBucket:
+    """จำลอง bucket ของ Shopify ฝั่ง client (REST: 40 calls, รั่ว 2 calls/วินาที)"""
+
+    def __init__(self, capacity: int = 40, leak_rate: float = 2.0, headroom: int = 2):
+        self.capacity = capacity
+        self.leak_rate = leak_rate
+        self.headroom = headroom
+        self.level = 0.0
+        self.updated = time.monotonic()
+        self.lock = asyncio.Lock()
+
+    def _leak(self):
+        now = time.monotonic()
+        self.level = max(0.0, self.level - (now - self.updated) * self.leak_rate)
+        self.updated = now
+
+    async def acquire(self):
+        """รอจนมีที่ว่างใน bucket แล้วจองหนึ่ง call"""
+        async with self.lock:
+            while True:
+                self._leak()
+                limit = self.capacity - self.headroom
+                if self.level + 1 <= limit:
+                    self.level += 1
+                    return
+                await asyncio.sleep((self.level + 1 - limit) / self.leak_rate)
+
+    def observe(self, used: int, capacity: int):
+        """ปรับระดับตามที่ server บอก (ไม่ลดต่ำกว่าค่าที่ประมาณไว้ เพราะมี request ค้างอยู่)"""
+        self._leak()
+        if capacity and capacity != self.capacity:
+            # Shopify รั่วที่ 1/20 ของความจุต่อวินาที (40 -> 2/s, 400 -> 20/s)
+            self.capacity = capacity
+            self.leak_rate = capacity / 20.0
+        self.level = max(self.level, float(used))
+
+    def fill(self):
+        """โดน 429 แล้ว - ถือว่า bucket เต็ม"""
+        self._leak()
+        self.level = float(self.capacity)
+
+
+class ShopifyClient:
+    """HTTP client สำหรับ Shopify Admin API ที่ไม่ยิงเกิน rate limit"""
+
+    RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+    def __init__(self, session: aiohttp.ClientSession, headers: Optional[Dict[str, str]] = None,
+                 max_concurrency: int = 8, max_retries: int = 5, base_delay: float = 0.5,
+                 max_delay: float = 30.0, timeout: int = 30, bucket: Optional[LeakyBucket] = None):
+        self.session = session
+        self.headers = headers or {}
+        self.bucket = bucket or LeakyBucket()
+        self.semaphore = asyncio.Semaphore(max_concurrency)
+        self.max_concurrency = max_concurrency
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.timeout = timeout
+        self.stats = {'requests': 0, 'retries': 0, 'throttled': 0}
+
+    def backoff_delay(self, attempt: int) -> float:
+        """Exponential backoff แบบ full jitter"""
+        return random.uniform(0, min(self.max_delay, self.base_delay * (2 ** attempt)))
+
+    def observe_headers(self, headers) -> Optional[float]:
+        """อ่าน call limit / Retry-After จาก response"""
+        call_limit = headers.get('X-Shopify-Shop-Api-Call-Limit')
+        if call_limit and '/' in call_limit:
+            used, _, capacity = call_limit.partition('/')
+            try:
+                self.bucket.observe(int(used), int(capacity))
+            except ValueError:
+                pass
+
+        retry_after = headers.get('Retry-After')
+        if retry_after:
+            try:
+                return float(retry_after)
+            except ValueError:
+                return None
+        return None
+
+    async def request_json(self, method: str, url: str, params: Optional[Dict[str, Any]] = None,
+                           json_body: Optional[Dict[str, Any]] = None) -> Tuple[Dict[str, Any], Optional[str]]:
+        """ส่ง request แล้วคืนค่า (JSON, URL หน้าถัดไปจาก Link header)"""
+        attempt = 0
+        while True:
+            await self.bucket.acquire()
+            try:
+                async with self.semaphore:
+                    self.stats['requests'] += 1
+                    async with self.session.request(method, url, params=params, json=json_body,
+                                                    headers=self.headers, timeout=self.timeout) as response:
+                        retry_after = self.observe_headers(response.headers)
+
+                        if response.status == 200:
+                            data = await response.json()
+                            next_link = response.links.get('next')
+                            return data, (str(next_link['url']) if next_link else None)
+
+                        if response.status not in self.RETRY_STATUSES:
+                            raise Exception(f"API returned status {response.status}")
+
+                        if response.status == 429:
+                            self.stats['throttled'] += 1
+                            self.bucket.fill()
+                        status = response.status
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                status = type(e).__name__
+                retry_after = None
+
+            if attempt >= self.max_retries:
+                raise Exception(f"API request failed after {attempt + 1} attempts (last: {status})")
+
+            delay = retry_after if retry_after is not None else self.backoff_delay(attempt)
+            attempt += 1
+            self.stats['retries'] += 1
+            logger.warning(f"⚠️ Shopify {status} - retry {attempt}/{self.max_retries} in {delay:.2f}s")
+            await asyncio.sleep(delay)
+
+    async def get_json(self, url: str, params: Optional[Dict[str, Any]] = None) -> Tuple[Dict[str, Any], Optional[str]]:
+        return await self.request_json('GET', url, params=params)
+
+    async def post_json(self, url: str, json_body: Dict[str, Any]) -> Dict[str, Any]:
+        data, _ = await self.request_json('POST', url, json_body=json_body)
+        return data
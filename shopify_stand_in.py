@@ -0,0 +1,432 @@
+#!/usr/bin/env python3
+"""
+Shopify Stand-in - จำลองฝั่ง Shopify สำหรับทดสอบแบบออฟไลน์
+- webhook: ส่ง webhook products/* ที่เซ็น HMAC แล้วไปยัง receiver
+- serve: Admin REST products.json จำลอง (cursor pagination, updated_at_min/max, fields, count)
+  พร้อม rate limit แบบ leaky bucket (X-Shopify-Shop-Api-Call-Limit, 429 + Retry-After)
+- serve ยังมี graphql.json (bulkOperationRunQuery / currentBulkOperation) และไฟล์ export JSONL
+- images: เซิร์ฟเวอร์รูปจำลอง (ETag/304, Range/206, ตัดการเชื่อมต่อกลางไฟล์) สำหรับทดสอบตัวดาวน์โหลด
+
+ตัวอย่าง:
+  python shopify_stand_in.py webhook --topic products/update --product-id 1 --price 799000 --burst 5
+  python shopify_stand_in.py serve --products 50000 --port 8765
+  python python_ssr_generator.py --api shopify --bulk --api-url http://127.0.0.1:8765/admin/api/2023-10/products.json
+  python shopify_stand_in.py images --count 200 --drop-rate 0.2 --write-catalog /tmp/cars.json
+"""
+
+import argparse
+import asyncio
+import hashlib
+import io
+import json
+import os
+import random
+import time
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from typing import Dict, List
+
+import aiohttp
+from aiohttp import web
+
+from shopify_bulk import gid_to_id
+from shopify_webhook import compute_hmac
+
+
+def load_fixture_product(product_id: str) -> Dict:
+    """หยิบสินค้าจาก cars.json มาเป็น payload ตั้งต้น"""
+    cars_file = Path(__file__).parent / "cars.json"
+    with open(cars_file, 'r', encoding='utf-8') as f:
+        data = json.load(f)
+    products = data.get('products', []) if isinstance(data, dict) else data
+    for product in products:
+        if str(product.get('id')) == str(product_id):
+            return dict(product)
+    return {'id': product_id, 'handle': f"car-{product_id}", 'title': f"Test car {product_id}"}
+
+
+async def send_webhook(session: aiohttp.ClientSession, url: str, topic: str, payload: Dict,
+                       secret: str, shop_domain: str = 'stand-in.myshopify.com') -> int:
+    """ส่ง webhook หนึ่งครั้งพร้อม header แบบเดียวกับ Shopify"""
+    body = json.dumps(payload, ensure_ascii=False).encode('utf-8')
+    headers = {
+        'Content-Type': 'application/json',
+        'X-Shopify-Topic': topic,
+        'X-Shopify-Hmac-Sha256': compute_hmac(body, secret),
+        'X-Shopify-Shop-Domain': shop_domain,
+    }
+    async with session.post(url, data=body, headers=headers) as response:
+        return response.status
+
+
+async def send_burst(url: str, topic: str, product_id: str, secret: str,
+                     burst: int = 1, price: float = None, interval: float = 0.1) -> list:
+    """ส่ง webhook ของสินค้าเดียวกันติดกันหลายครั้ง (ใช้ทดสอบ debounce)"""
+    statuses = []
+    async with aiohttp.ClientSession() as session:
+        for i in range(burst):
+            if topic == 'products/delete':
+                payload = {'id': product_id}
+            else:
+                payload = load_fixture_product(product_id)
+                if price is not None:
+                    payload['variants'] = [{'price': str(price + i)}]
+            statuses.append(await send_webhook(session, url, topic, payload, secret))
+            if i < burst - 1:
+                await asyncio.sleep(interval)
+    return statuses
+
+
+class StandInShop:
+    """ร้าน Shopify จำลองที่มีสินค้าสังเคราะห์ N ชิ้น"""
+
+    API_PREFIX = '/admin/api/2023-10'
+
+    def __init__(self, product_count: int = 1000, bucket_size: int = 40, leak_rate: float = 2.0,
+                 failure_rate: float = 0.0):
+        base_time = datetime(2024, 1, 1, tzinfo=timezone.utc)
+        self.products: List[Dict] = [
+            self.make_product(i, base_time + timedelta(minutes=i)) for i in range(1, product_count + 1)
+        ]
+        self.bytes_sent = 0
+
+        # Rate limit แบบเดียวกับ Shopify REST
+        self.bucket_size = bucket_size
+        self.leak_rate = leak_rate
+        self.bucket_level = 0.0
+        self.bucket_updated = time.monotonic()
+        self.failure_rate = failure_rate
+        self.stats = {'requests': 0, 'throttled': 0, 'failed': 0}
+
+        # Bulk operation จำลอง: เสร็จหลังจาก bulk_delay วินาที
+        self.bulk_delay = 1.0
+        self.bulk_operation: Dict = {}
+
+    @staticmethod
+    def make_product(product_id: int, updated_at: datetime) -> Dict:
+        stamp = updated_at.isoformat()
+        return {
+            'id': product_id,
+            'title': f"Toyota Vios {2010 + product_id % 14} #{product_id}",
+            'handle': f"toyota-vios-{product_id}",
+            'body_html': '<p>รถบ้าน สภาพดี ไมล์แท้</p>',
+            'status': 'active',
+            'variants': [{'id': product_id * 10, 'price': f"{300000 + product_id % 500 * 1000}.00"}],
+            'images': [{'id': product_id * 100, 'src': f"https://cdn.shopify.com/s/files/1/0000/0001/files/car-{product_id}.jpg?v=1"}],
+            'created_at': stamp,
+            'updated_at': stamp,
+        }
+
+    def touch(self, product_ids: List[int]):
+        """แก้ไขสินค้า (เลื่อน updated_at เป็นตอนนี้)"""
+        now = datetime.now(timezone.utc).isoformat()
+        wanted = set(product_ids)
+        for product in self.products:
+            if product['id'] in wanted:
+                product['updated_at'] = now
+
+    def delete(self, product_ids: List[int]):
+        wanted = set(product_ids)
+        self.products = [p for p in self.products if p['id'] not in wanted]
+
+    def json_response(self, payload: Dict, headers: Dict = None) -> web.Response:
+        body = json.dumps(payload, ensure_ascii=False).encode('utf-8')
+        self.bytes_sent += len(body)
+        return web.Response(body=body, content_type='application/json', headers=headers)
+
+    @web.middleware
+    async def rate_limit_middleware(self, request: web.Request, handler):
+        """Leaky bucket + สุ่ม 503 สำหรับทดสอบ retry"""
+        self.stats['requests'] += 1
+        now = time.monotonic()
+        self.bucket_level = max(0.0, self.bucket_level - (now - self.bucket_updated) * self.leak_rate)
+        self.bucket_updated = now
+
+        if self.bucket_level + 1 > self.bucket_size:
+            self.stats['throttled'] += 1
+            retry_after = (self.bucket_level + 1 - self.bucket_size) / self.leak_rate
+            return web.Response(status=429, text='Exceeded call limit', headers={
+                'Retry-After': f"{retry_after:.1f}",
+                'X-Shopify-Shop-Api-Call-Limit': f"{self.bucket_size}/{self.bucket_size}",
+            })
+        self.bucket_level += 1
+
+        if self.failure_rate and random.random() < self.failure_rate:
+            self.stats['failed'] += 1
+            return web.Response(status=503, text='Service unavailable')
+
+        response = await handler(request)
+        response.headers['X-Shopify-Shop-Api-Call-Limit'] = f"{int(self.bucket_level)}/{self.bucket_size}"
+        return response
+
+    def filter_products(self, query) -> List[Dict]:
+        """กรองตาม updated_at_min / updated_at_max (รวมค่าที่เท่ากัน)"""
+        matches = self.products
+        for key, keep in (('updated_at_min', lambda t, b: t >= b), ('updated_at_max', lambda t, b: t <= b)):
+            if query.get(key):
+                bound = datetime.fromisoformat(query[key].replace('Z', '+00:00'))
+                matches = [p for p in matches if keep(datetime.fromisoformat(p['updated_at']), bound)]
+        return matches
+
+    async def handle_products(self, request: web.Request) -> web.Response:
+        query = request.query
+        if 'page_info' in query:
+            # page_info จำลอง = "offset|updated_at_min|updated_at_max"
+            offset_text, updated_at_min, updated_at_max = query['page_info'].split('|')
+            offset = int(offset_text)
+        else:
+            offset = 0
+            updated_at_min = query.get('updated_at_min', '')
+            updated_at_max = query.get('updated_at_max', '')
+
+        limit = min(int(query.get('limit', 50)), 250)
+        fields = [f for f in query.get('fields', '').split(',') if f]
+
+        matches = self.filter_products({'updated_at_min': updated_at_min, 'updated_at_max': updated_at_max})
+        page = matches[offset:offset + limit]
+        if fields:
+            page = [{k: v for k, v in p.items() if k in fields} for p in page]
+
+        headers = {}
+        if offset + limit < len(matches):
+            next_url = request.url.with_query({
+                'limit': str(limit),
+                'fields': ','.join(fields),
+                'page_info': f"{offset + limit}|{updated_at_min}|{updated_at_max}",
+            })
+            headers['Link'] = f'<{next_url}>; rel="next"'
+        return self.json_response({'products': page}, headers)
+
+    async def handle_count(self, request: web.Request) -> web.Response:
+        return self.json_response({'count': len(self.filter_products(request.query))})
+
+    async def handle_graphql(self, request: web.Request) -> web.Response:
+        """รองรับเฉพาะ bulkOperationRunQuery และ currentBulkOperation"""
+        body = await request.json()
+        query = body.get('query', '')
+
+        if 'bulkOperationRunQuery' in query:
+            operation_id = f"gid://shopify/BulkOperation/{int(time.time() * 1000)}"
+            self.bulk_operation = {'id': operation_id, 'started': time.monotonic()}
+            return self.json_response({'data': {'bulkOperationRunQuery': {
+                'bulkOperation': {'id': operation_id, 'status': 'CREATED'}, 'userErrors': []
+            }}})
+
+        if 'currentBulkOperation' in query:
+            operation = self.bulk_operation
+            if not operation:
+                return self.json_response({'data': {'currentBulkOperation': None}})
+            done = time.monotonic() - operation['started'] >= self.bulk_delay
+            export_url = request.url.with_path(f"/bulk/{gid_to_id(operation['id'])}.jsonl").with_query(None)
+            return self.json_response({'data': {'currentBulkOperation': {
+                'id': operation['id'],
+                'status': 'COMPLETED' if done else 'RUNNING',
+                'errorCode': None,
+                'objectCount': str(len(self.products) * 3) if done else '0',
+                'url': str(export_url) if done else None,
+            }}})
+
+        return self.json_response({'errors': [{'message': 'Unsupported stand-in query'}]})
+
+    def bulk_rows(self, product: Dict):
+        """แถว JSONL ของสินค้าหนึ่งชิ้น: แม่ก่อน ตามด้วย variants และ images"""
+        product_gid = f"gid://shopify/Product/{product['id']}"
+        yield {
+            'id': product_gid,
+            'handle': product['handle'],
+            'title': product['title'],
+            'descriptionHtml': product['body_html'],
+            'status': product['status'].upper(),
+            'createdAt': product['created_at'],
+            'updatedAt': product['updated_at'],
+        }
+        for variant in product['variants']:
+            yield {'id': f"gid://shopify/ProductVariant/{variant['id']}", 'price': variant['price'],
+                   '__parentId': product_gid}
+        for image in product['images']:
+            yield {'id': f"gid://shopify/ProductImage/{image['id']}", 'url': image['src'],
+                   '__parentId': product_gid}
+
+    async def handle_bulk_export(self, request: web.Request) -> web.StreamResponse:
+        """สตรีมไฟล์ export JSONL (สร้างทีละบรรทัด ไม่ต้องมีไฟล์จริง)"""
+        response = web.StreamResponse(headers={'Content-Type': 'application/jsonl'})
+        await response.prepare(request)
+        batch = []
+        for product in self.products:
+            for row in self.bulk_rows(product):
+                batch.append(json.dumps(row, ensure_ascii=False))
+            if len(batch) >= 500:
+                data = ('\n'.join(batch) + '\n').encode('utf-8')
+                self.bytes_sent += len(data)
+                await response.write(data)
+                batch = []
+        if batch:
+            data = ('\n'.join(batch) + '\n').encode('utf-8')
+            self.bytes_sent += len(data)
+            await response.write(data)
+        await response.write_eof()
+        return response
+
+    def create_app(self) -> web.Application:
+        app = web.Application(middlewares=[self.rate_limit_middleware])
+        app.router.add_get(f"{self.API_PREFIX}/products.json", self.handle_products)
+        app.router.add_get(f"{self.API_PREFIX}/products/count.json", self.handle_count)
+        app.router.add_post(f"{self.API_PREFIX}/graphql.json", self.handle_graphql)
+        app.router.add_get('/bulk/{operation}.jsonl', self.handle_bulk_export)
+        return app
+
+
+class StandInImageServer:
+    """CDN รูปจำลอง: สร้าง JPEG ตามชื่อไฟล์ รองรับ ETag, Range และจำลองการหลุดกลางไฟล์"""
+
+    def __init__(self, width: int = 1600, height: int = 1200, drop_rate: float = 0.0,
+                 chunk_size: int = 16 * 1024, chunk_delay: float = 0.0):
+        self.width = width
+        self.height = height
+        self.drop_rate = drop_rate
+        self.chunk_size = chunk_size
+        self.chunk_delay = chunk_delay
+        self.images: Dict[str, bytes] = {}
+        self.in_flight = 0
+        self.stats = {'requests': 0, 'bytes_sent': 0, 'partial': 0, 'not_modified': 0,
+                      'dropped': 0, 'peak_in_flight': 0}
+
+    def image_bytes(self, name: str) -> bytes:
+        """สร้างรูปแบบ deterministic จากชื่อไฟล์ (สีต่างกันทุกชื่อ)"""
+        if name not in self.images:
+            from PIL import Image, ImageDraw
+
+            seed = int(hashlib.md5(name.encode()).hexdigest()[:6], 16)
+            image = Image.new('RGB', (self.width, self.height),
+                              ((seed >> 16) & 0xFF, (seed >> 8) & 0xFF, seed & 0xFF))
+            draw = ImageDraw.Draw(image)
+            for i in range(0, self.width, 40):
+                draw.line([(i, 0), (self.width - i, self.height)], fill=(255 - i % 256, i % 256, 128), width=3)
+            buffer = io.BytesIO()
+            image.save(buffer, 'JPEG', quality=90)
+            self.images[name] = buffer.getvalue()
+        return self.images[name]
+
+    @staticmethod
+    def etag_for(body: bytes) -> str:
+        return f'"{hashlib.md5(body).hexdigest()[:16]}"'
+
+    async def handle_image(self, request: web.Request) -> web.StreamResponse:
+        self.stats['requests'] += 1
+        body = self.image_bytes(request.match_info['name'])
+        etag = self.etag_for(body)
+        if request.headers.get('If-None-Match') == etag:
+            self.stats['not_modified'] += 1
+            return web.Response(status=304, headers={'ETag': etag})
+
+        start = 0
+        status = 200
+        headers = {'ETag': etag, 'Accept-Ranges': 'bytes', 'Content-Type': 'image/jpeg'}
+        range_header = request.headers.get('Range', '')
+        if range_header.startswith('bytes=') and request.headers.get('If-Range', etag) == etag:
+            start = int(range_header[6:].split('-')[0] or 0)
+            if start >= len(body):
+                return web.Response(status=416, headers={'Content-Range': f"bytes */{len(body)}"})
+            status = 206
+            headers['Content-Range'] = f"bytes {start}-{len(body) - 1}/{len(body)}"
+            self.stats['partial'] += 1
+
+        payload = body[start:]
+        headers['Content-Length'] = str(len(payload))
+        response = web.StreamResponse(status=status, headers=headers)
+        await response.prepare(request)
+
+        # หลุดกลางไฟล์เฉพาะการโหลดครั้งแรก เพื่อให้การ resume สำเร็จได้
+        drop_at = len(payload) // 2 if status == 200 and random.random() < self.drop_rate else None
+        self.in_flight += 1
+        self.stats['peak_in_flight'] = max(self.stats['peak_in_flight'], self.in_flight)
+        try:
+            for offset in range(0, len(payload), self.chunk_size):
+                if drop_at is not None and offset >= drop_at:
+                    self.stats['dropped'] += 1
+                    request.transport.abort()
+                    return response
+                chunk = payload[offset:offset + self.chunk_size]
+                await response.write(chunk)
+                self.stats['bytes_sent'] += len(chunk)
+                if self.chunk_delay:
+                    await asyncio.sleep(self.chunk_delay)
+        finally:
+            self.in_flight -= 1
+        await response.write_eof()
+        return response
+
+    def create_app(self) -> web.Application:
+        app = web.Application()
+        app.router.add_get('/images/{name}', self.handle_image)
+        return app
+
+
+def write_image_catalog(path: str, base_url: str, count: int, images_per_car: int = 3):
+    """เขียนแคตตาล็อกรูปแบบ cars.json ที่ชี้รูปไปยังเซิร์ฟเวอร์รูปจำลอง"""
+    cars = [
+        {
+            'id': str(i),
+            'title': f"Toyota Vios {2010 + i % 14} #{i}",
+            'handle': f"toyota-vios-{i}",
+            'images': [f"{base_url}/images/car-{i}-{n}.jpg" for n in range(1, images_per_car + 1)],
+        }
+        for i in range(1, count + 1)
+    ]
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(cars, f, ensure_ascii=False, indent=2)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Shopify stand-in for offline testing')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    webhook = subparsers.add_parser('webhook', help='Send signed product webhooks')
+    webhook.add_argument('--url', default='http://127.0.0.1:8080/webhooks/shopify')
+    webhook.add_argument('--topic', default='products/update',
+                         choices=['products/create', 'products/update', 'products/delete'])
+    webhook.add_argument('--product-id', default='1')
+    webhook.add_argument('--price', type=float, default=None)
+    webhook.add_argument('--burst', type=int, default=1, help='Number of webhooks to send back-to-back')
+    webhook.add_argument('--secret', default=os.environ.get('SHOPIFY_WEBHOOK_SECRET', 'stand-in-secret'))
+
+    serve = subparsers.add_parser('serve', help='Serve a synthetic Admin REST products API')
+    serve.add_argument('--products', type=int, default=1000)
+    serve.add_argument('--host', default='127.0.0.1')
+    serve.add_argument('--port', type=int, default=8765)
+    serve.add_argument('--bucket-size', type=int, default=40)
+    serve.add_argument('--leak-rate', type=float, default=2.0)
+    serve.add_argument('--failure-rate', type=float, default=0.0, help='Fraction of requests answered with 503')
+
+    images = subparsers.add_parser('images', help='Serve synthetic product images (ETag, Range, dropped connections)')
+    images.add_argument('--host', default='127.0.0.1')
+    images.add_argument('--port', type=int, default=8766)
+    images.add_argument('--width', type=int, default=1600)
+    images.add_argument('--height', type=int, default=1200)
+    images.add_argument('--drop-rate', type=float, default=0.0, help='Fraction of full downloads cut off halfway')
+    images.add_argument('--chunk-delay', type=float, default=0.0, help='Seconds to wait between 16 KB chunks')
+    images.add_argument('--count', type=int, default=50, help='Cars in the catalog written by --write-catalog')
+    images.add_argument('--write-catalog', default=None, help='Write a cars.json-style catalog pointing at this server')
+
+    args = parser.parse_args()
+
+    if args.command == 'webhook':
+        statuses = asyncio.run(send_burst(args.url, args.topic, args.product_id, args.secret,
+                                          args.burst, args.price))
+        print(f"📨 Sent {len(statuses)} webhook(s): {statuses}")
+    elif args.command == 'serve':
+        shop = StandInShop(args.products, args.bucket_size, args.leak_rate, args.failure_rate)
+        print(f"🏪 Stand-in shop: http://{args.host}:{args.port}{shop.API_PREFIX}/products.json")
+        web.run_app(shop.create_app(), host=args.host, port=args.port)
+    elif args.command == 'images':
+        server = StandInImageServer(args.width, args.height, args.drop_rate, chunk_delay=args.chunk_delay)
+        base_url = f"http://{args.host}:{args.port}"
+        if args.write_catalog:
+            write_image_catalog(args.write_catalog, base_url, args.count)
+            print(f"📝 Wrote {args.count} cars to {args.write_catalog}")
+        print(f"🖼️ Stand-in images: {base_url}/images/<name>.jpg")
+        web.run_app(server.create_app(), host=args.host, port=args.port)
+
+
+if __name__ == "__main__":
+    main()
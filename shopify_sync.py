@@ -0,0 +1,247 @@
+#!/usr/bin/env python3
+"""
+Shopify Delta Sync
+ดึงเฉพาะสินค้าที่เปลี่ยนตั้งแต่ high-water mark (updated_at_min)
+รวมเข้ากับแคตตาล็อกที่เก็บไว้ในเครื่อง และตรวจจับสินค้าที่ถูกลบด้วยการเทียบ ID
+"""
+
+import asyncio
+import json
+import logging
+import math
+import os
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from shopify_client import ShopifyClient
+
+logger = logging.getLogger(__name__)
+
+# ฟิลด์ที่ใช้จริงในการเรนเดอร์ - ขอเท่านี้เพื่อลดขนาด response
+SHOPIFY_PRODUCT_FIELDS = [
+    'id', 'title', 'handle', 'body_html', 'status', 'variants', 'images',
+    'created_at', 'updated_at'
+]
+
+# จุดเริ่มต้นของช่วงเวลาเมื่อแบ่งดึงทั้งร้าน (ก่อนหน้านี้ไม่มีร้าน Shopify)
+CATALOG_EPOCH = datetime(2006, 1, 1, tzinfo=timezone.utc)
+
+# ถอย high-water mark ไว้ก่อนเวลาเริ่มซิงก์ - สินค้าที่ถูกแก้ระหว่างไล่หน้า cursor
+# อาจไม่อยู่ในหน้าที่ดึงไปแล้ว รอบหน้าต้องดึงช่วงนี้ซ้ำ (merge ทับได้ไม่เสียหาย)
+HIGH_WATER_OVERLAP = timedelta(seconds=60)
+
+
+def parse_timestamp(value: str) -> Optional[datetime]:
+    """แปลง timestamp ของ Shopify (ISO 8601) เป็น datetime"""
+    if not value:
+        return None
+    try:
+        parsed = datetime.fromisoformat(value.replace('Z', '+00:00'))
+    except ValueError:
+        return None
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return parsed
+
+
+class ShopifyCatalogStore:
+    """แคตตาล็อกสินค้าที่เก็บบนดิสก์ พร้อม high-water mark และ tombstones"""
+
+    def __init__(self, path: Path, tombstone_days: int = 30):
+        self.path = Path(path)
+        self.tombstone_days = tombstone_days
+        self.high_water_mark = ''
+        self.products: Dict[str, Dict[str, Any]] = {}
+        self.tombstones: Dict[str, str] = {}
+        self.last_reconcile = ''
+
+    def load(self) -> 'ShopifyCatalogStore':
+        """โหลดแคตตาล็อกจากไฟล์ (ถ้ามี)"""
+        if self.path.exists():
+            with open(self.path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            self.high_water_mark = data.get('high_water_mark', '')
+            self.products = data.get('products', {})
+            self.tombstones = data.get('tombstones', {})
+            self.last_reconcile = data.get('last_reconcile', '')
+        return self
+
+    def save(self):
+        """บันทึกแบบ atomic (เขียนไฟล์ชั่วคราวแล้ว rename)"""
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.path.with_suffix(self.path.suffix + '.tmp')
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({
+                'high_water_mark': self.high_water_mark,
+                'last_reconcile': self.last_reconcile,
+                'products': self.products,
+                'tombstones': self.tombstones,
+            }, f, ensure_ascii=False)
+        os.replace(tmp_path, self.path)
+
+    def merge(self, changed: Iterable[Dict[str, Any]], cap: Optional[datetime] = None) -> int:
+        """รวมสินค้าที่เปลี่ยนเข้ากับแคตตาล็อก และเลื่อน high-water mark (ไม่เกิน cap)"""
+        count = 0
+        previous_mark = self.high_water_mark
+        previous = parse_timestamp(previous_mark)
+        newest = previous
+        for product in changed:
+            product_id = str(product.get('id', ''))
+            if not product_id:
+                continue
+            self.products[product_id] = product
+            self.tombstones.pop(product_id, None)
+            count += 1
+
+            updated_at = parse_timestamp(product.get('updated_at', ''))
+            if updated_at and (newest is None or updated_at > newest):
+                newest = updated_at
+                self.high_water_mark = product['updated_at']
+
+        if cap is not None and newest is not None and newest > cap:
+            # ไม่ถอยต่ำกว่า mark เดิม - แค่ไม่เลื่อนเกินจุดที่ยังเชื่อได้ว่าดึงครบ
+            self.high_water_mark = cap.isoformat() if previous is None or cap > previous else previous_mark
+        return count
+
+    def reconcile(self, live_ids: Iterable[str]) -> List[str]:
+        """ลบสินค้าที่ไม่มีอยู่ในร้านแล้ว และบันทึก tombstone ไว้"""
+        live = {str(i) for i in live_ids}
+        now = datetime.now(timezone.utc)
+        deleted = [product_id for product_id in self.products if product_id not in live]
+        for product_id in deleted:
+            del self.products[product_id]
+            self.tombstones[product_id] = now.isoformat()
+
+        # เก็บ tombstone ไว้แค่ช่วงเวลาหนึ่ง
+        cutoff = now - timedelta(days=self.tombstone_days)
+        self.tombstones = {
+            product_id: deleted_at for product_id, deleted_at in self.tombstones.items()
+            if (parse_timestamp(deleted_at) or now) >= cutoff
+        }
+        self.last_reconcile = now.isoformat()
+        return deleted
+
+    def reconcile_due(self, interval_hours: float) -> bool:
+        """ถึงเวลาเทียบ ID ทั้งร้านหรือยัง"""
+        last = parse_timestamp(self.last_reconcile)
+        if last is None:
+            return True
+        return datetime.now(timezone.utc) - last >= timedelta(hours=interval_hours)
+
+    def as_raw_data(self) -> Dict[str, Any]:
+        """คืนค่าในรูปแบบเดียวกับ response ของ Shopify"""
+        return {'products': list(self.products.values())}
+
+
+async def fetch_paginated(client: ShopifyClient, url: str, params: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """ดึง products ทุกหน้าตาม Link header (cursor pagination ของ Shopify)"""
+    products = []
+    next_url: Optional[str] = url
+    next_params: Optional[Dict[str, Any]] = params
+
+    while next_url:
+        data, next_url = await client.get_json(next_url, next_params)
+        products.extend(data.get('products', []))
+        # page_info URL มีพารามิเตอร์ครบแล้ว
+        next_params = None
+
+    return products
+
+
+async def fetch_product_count(client: ShopifyClient, url: str,
+                              params: Optional[Dict[str, Any]] = None) -> Optional[int]:
+    """ดึงจำนวนสินค้า (products/count.json) - ใช้ตรวจการลบและวางแผนแบ่งช่วงเวลา"""
+    if not url.endswith('/products.json'):
+        return None
+    count_url = url[:-len('/products.json')] + '/products/count.json'
+    try:
+        data, _ = await client.get_json(count_url, params)
+    except Exception:
+        return None
+    return data.get('count')
+
+
+async def plan_windows(client: ShopifyClient, url: str, start: datetime, end: datetime,
+                       max_products: int) -> List[Tuple[datetime, datetime]]:
+    """แบ่งช่วง updated_at ให้แต่ละช่วงมีสินค้าไม่เกิน max_products (ใช้ count ที่ถูกมาก)"""
+    count = await fetch_product_count(client, url, {
+        'updated_at_min': start.isoformat(), 'updated_at_max': end.isoformat()
+    })
+    if count is None:
+        return [(start, end)]
+    if count == 0:
+        return []
+    if count <= max_products or end - start <= timedelta(minutes=1):
+        return [(start, end)]
+
+    mid = start + (end - start) / 2
+    left, right = await asyncio.gather(
+        plan_windows(client, url, start, mid, max_products),
+        plan_windows(client, url, mid, end, max_products),
+    )
+    return left + right
+
+
+async def fetch_all_windowed(client: ShopifyClient, url: str, params: Dict[str, Any],
+                             until: datetime) -> List[Dict[str, Any]]:
+    """ดึงทั้งร้านแบบขนาน: แบ่งตามช่วง updated_at แล้วไล่ cursor ของแต่ละช่วงพร้อมกัน"""
+    total = await fetch_product_count(client, url)
+    if not total:
+        return await fetch_paginated(client, url, params)
+
+    max_products = max(params.get('limit', 250), math.ceil(total / client.max_concurrency))
+    windows = await plan_windows(client, url, CATALOG_EPOCH, until, max_products)
+    pages = await asyncio.gather(*[
+        fetch_paginated(client, url, {
+            **params, 'updated_at_min': start.isoformat(), 'updated_at_max': end.isoformat()
+        })
+        for start, end in windows
+    ])
+
+    # ขอบช่วงรวมทั้งสองฝั่ง - ตัดตัวซ้ำออก
+    unique: Dict[str, Dict[str, Any]] = {}
+    for page in pages:
+        for product in page:
+            unique[str(product.get('id', ''))] = product
+    return list(unique.values())
+
+
+async def delta_sync(client: ShopifyClient, store: ShopifyCatalogStore, url: str,
+                     page_size: int = 250, reconcile_interval_hours: float = 24.0) -> Dict[str, int]:
+    """ซิงก์แบบ delta: ดึงเฉพาะที่เปลี่ยน แล้วเทียบ ID เมื่อจำนวนไม่ตรงหรือถึงรอบ"""
+    params: Dict[str, Any] = {'limit': page_size, 'fields': ','.join(SHOPIFY_PRODUCT_FIELDS)}
+    sync_started = datetime.now(timezone.utc)
+    full_sync = not store.high_water_mark
+
+    if full_sync:
+        changed = await fetch_all_windowed(client, url, params, sync_started)
+    else:
+        # updated_at_min รวมค่าที่เท่ากันด้วย - สินค้าที่ซ้ำจะถูก merge ทับเฉยๆ
+        params['updated_at_min'] = store.high_water_mark
+        changed = await fetch_paginated(client, url, params)
+    merged = store.merge(changed, cap=sync_started - HIGH_WATER_OVERLAP)
+
+    deleted: List[str] = []
+    if full_sync:
+        # ดึงครบทั้งร้านแล้ว ถือเป็นการ reconcile ไปในตัว
+        deleted = store.reconcile(p['id'] for p in changed if 'id' in p)
+        needs_reconcile = False
+    else:
+        needs_reconcile = store.reconcile_due(reconcile_interval_hours)
+    if not full_sync and not needs_reconcile:
+        # การสร้าง/แก้ไขมาทาง delta แล้ว จำนวนไม่ตรง = มีสินค้าถูกลบ
+        remote_count = await fetch_product_count(client, url)
+        needs_reconcile = remote_count is not None and remote_count != len(store.products)
+
+    if needs_reconcile:
+        # บันทึกส่วนที่ดึงมาแล้วก่อน - ถ้าการเทียบ ID (ช้า) ถูกขัดจังหวะ รอบหน้าไม่ต้องดึงซ้ำ
+        store.save()
+        id_rows = await fetch_all_windowed(client, url, {'limit': page_size, 'fields': 'id'}, sync_started)
+        deleted = store.reconcile(row['id'] for row in id_rows if 'id' in row)
+
+    store.save()
+    logger.info(f"🔄 Delta sync: {merged} changed, {len(deleted)} deleted, "
+                f"{len(store.products)} in catalog (since {params.get('updated_at_min', 'beginning')}, "
+                f"{client.stats['requests']} requests, {client.stats['throttled']} throttled)")
+    return {'changed': merged, 'deleted': len(deleted), 'total': len(store.products)}
@@ -0,0 +1,252 @@
+#!/usr/bin/env python3
+"""
+Shopify Product Webhook Receiver
+รับ webhook products/create, products/update, products/delete จาก Shopify
+แล้วเรนเดอร์ใหม่เฉพาะหน้าที่เกี่ยวข้อง (car detail + หน้า listing ที่มีรถคันนั้น)
+"""
+
+import asyncio
+import base64
+import hashlib
+import hmac
+import json
+import logging
+import os
+from typing import Dict, List, Optional, Set, Tuple
+
+from aiohttp import web
+
+from python_ssr_generator import PythonSSRGenerator
+
+logger = logging.getLogger(__name__)
+
+
+def compute_hmac(body: bytes, secret: str) -> str:
+    """คำนวณ HMAC-SHA256 (base64) แบบเดียวกับ header X-Shopify-Hmac-Sha256"""
+    digest = hmac.new(secret.encode('utf-8'), body, hashlib.sha256).digest()
+    return base64.b64encode(digest).decode('ascii')
+
+
+class ShopifyWebhookReceiver:
+    """Webhook receiver ที่รวม event ซ้ำๆ ของสินค้าเดียวกันแล้วเรนเดอร์ครั้งเดียว"""
+
+    TOPICS = {'products/create', 'products/update', 'products/delete'}
+    # status ของ Shopify ที่ไม่แสดงบนหน้าร้าน - ถือเหมือนถูกลบ
+    HIDDEN_STATUSES = {'draft', 'archived', 'unlisted'}
+
+    def __init__(self, ssr: PythonSSRGenerator, api_source: str = 'shopify',
+                 secret: Optional[str] = None, debounce_seconds: float = 2.0,
+                 max_delay_seconds: float = 10.0, listing_pages: Optional[List[str]] = None,
+                 retry_base_seconds: float = 5.0, retry_max_seconds: float = 300.0):
+        self.ssr = ssr
+        self.api_source = api_source
+        self.secret = secret if secret is not None else os.environ.get('SHOPIFY_WEBHOOK_SECRET', '')
+        self.debounce_seconds = debounce_seconds
+        self.max_delay_seconds = max_delay_seconds
+        self.retry_base_seconds = retry_base_seconds
+        self.retry_max_seconds = retry_max_seconds
+        self.listing_pages = listing_pages or ['index.html']
+
+        # แคตตาล็อกในหน่วยความจำ: product id -> raw product
+        self.products: Dict[str, Dict] = {}
+        # handle ของรถที่อยู่ในแต่ละหน้า listing ตอนนี้
+        self.listing_handles: Dict[str, Set[str]] = {}
+
+        # สถานะ debounce ต่อสินค้า
+        self.pending_events: Dict[str, Tuple[str, Dict]] = {}
+        self.pending_timers: Dict[str, asyncio.TimerHandle] = {}
+        self.first_seen: Dict[str, float] = {}
+        # จำนวนครั้งที่เรนเดอร์ล้มเหลวติดกันต่อสินค้า (สำหรับ backoff)
+        self.retry_attempts: Dict[str, int] = {}
+        self.render_lock = asyncio.Lock()
+
+        self.stats = {'received': 0, 'rejected': 0, 'renders': 0}
+
+    async def load_catalog(self) -> int:
+        """โหลดแคตตาล็อกเริ่มต้นและจำว่ารถคันไหนอยู่หน้า listing ไหน"""
+        raw_data = await self.ssr.fetch_api_data(self.api_source)
+        products = (raw_data or {}).get('products', [])
+        self.products = {str(p.get('id', p.get('handle', ''))): p for p in products}
+
+        handles = self.current_listing_handles()
+        for page in self.listing_pages:
+            self.listing_handles[page] = set(handles)
+        await self.ssr.prepare_images(
+            self.ssr.process_car_data({'products': products}, self.api_source),
+            max_seconds=self.ssr.fetch_budget(self.api_source),
+        )
+
+        logger.info(f"📦 Webhook catalog loaded: {len(self.products)} products")
+        return len(self.products)
+
+    def current_listing_handles(self) -> List[str]:
+        """handle ของรถที่จะแสดงในหน้า listing จากแคตตาล็อกปัจจุบัน"""
+        cars = self.ssr.process_car_data({'products': list(self.products.values())}, self.api_source)
+        return [car.handle for car in cars]
+
+    def verify_hmac(self, body: bytes, received_hmac: str) -> bool:
+        """ตรวจสอบ X-Shopify-Hmac-Sha256"""
+        if not self.secret or not received_hmac:
+            return False
+        return hmac.compare_digest(compute_hmac(body, self.secret), received_hmac)
+
+    async def handle_webhook(self, request: web.Request) -> web.Response:
+        """Endpoint รับ webhook - ตอบกลับทันที แล้วค่อยเรนเดอร์ภายหลัง"""
+        body = await request.read()
+        self.stats['received'] += 1
+
+        if not self.verify_hmac(body, request.headers.get('X-Shopify-Hmac-Sha256', '')):
+            self.stats['rejected'] += 1
+            logger.warning("⚠️ Webhook rejected: invalid HMAC")
+            return web.Response(status=401, text='invalid hmac')
+
+        topic = request.headers.get('X-Shopify-Topic', '')
+        if topic not in self.TOPICS:
+            return web.Response(status=200, text='ignored')
+
+        try:
+            payload = json.loads(body.decode('utf-8'))
+        except (UnicodeDecodeError, json.JSONDecodeError):
+            return web.Response(status=400, text='invalid json')
+
+        product_id = str(payload.get('id', ''))
+        if not product_id:
+            return web.Response(status=400, text='missing product id')
+
+        self.schedule(product_id, topic, payload)
+        return web.Response(status=200, text='ok')
+
+    def schedule(self, product_id: str, topic: str, payload: Dict):
+        """เก็บ event ล่าสุดของสินค้าและเลื่อนเวลาเรนเดอร์ (debounce ต่อสินค้า)"""
+        loop = asyncio.get_running_loop()
+        now = loop.time()
+
+        self.pending_events[product_id] = (topic, payload)
+        self.first_seen.setdefault(product_id, now)
+
+        timer = self.pending_timers.pop(product_id, None)
+        if timer:
+            timer.cancel()
+
+        # ไม่ให้ burst ยาวๆ เลื่อนการเรนเดอร์ไปเรื่อยๆ เกิน max_delay_seconds
+        deadline = self.first_seen[product_id] + self.max_delay_seconds
+        delay = max(0.0, min(self.debounce_seconds, deadline - now))
+        self.set_timer(product_id, delay)
+
+    def set_timer(self, product_id: str, delay: float):
+        loop = asyncio.get_running_loop()
+        self.pending_timers[product_id] = loop.call_later(
+            delay, lambda: asyncio.ensure_future(self.flush(product_id))
+        )
+
+    def schedule_retry(self, product_id: str, topic: str, payload: Dict) -> Optional[float]:
+        """ใส่ event ที่ล้มเหลวกลับเข้าคิว แล้วลองใหม่แบบ exponential backoff
+        (ถ้ามี event ใหม่กว่าเข้ามาระหว่างเรนเดอร์ ใช้ event นั้นแทน) คืนค่าเวลารอ"""
+        attempt = self.retry_attempts.get(product_id, 0) + 1
+        self.retry_attempts[product_id] = attempt
+        if product_id in self.pending_events:
+            return None
+        delay = min(self.retry_base_seconds * 2 ** (attempt - 1), self.retry_max_seconds)
+        self.pending_events[product_id] = (topic, payload)
+        self.set_timer(product_id, delay)
+        return delay
+
+    async def flush(self, product_id: str):
+        """นำ event ล่าสุดไปใช้กับแคตตาล็อกแล้วเรนเดอร์เฉพาะหน้าที่ได้รับผลกระทบ"""
+        self.pending_timers.pop(product_id, None)
+        self.first_seen.pop(product_id, None)
+        event = self.pending_events.pop(product_id, None)
+        if not event:
+            return
+
+        topic, payload = event
+        async with self.render_lock:
+            try:
+                if topic != 'products/delete' and not self.is_hidden(payload):
+                    await self.ssr.prepare_images(
+                        self.ssr.process_car_data({'products': [payload]}, self.api_source),
+                        max_seconds=self.ssr.fetch_budget(self.api_source),
+                    )
+                await asyncio.to_thread(self.apply_event, product_id, topic, payload)
+            except Exception as e:
+                delay = self.schedule_retry(product_id, topic, payload)
+                retry = f" - retrying in {delay:.1f}s" if delay is not None else " - newer event pending"
+                logger.error(f"❌ Error applying {topic} for product {product_id}: {str(e)}{retry}")
+            else:
+                self.retry_attempts.pop(product_id, None)
+
+    def is_hidden(self, payload: Dict) -> bool:
+        """สินค้าที่ไม่อยู่บนหน้าร้าน (draft/archived) ไม่มีหน้ารถและไม่อยู่ใน listing"""
+        return str(payload.get('status') or 'active').lower() in self.HIDDEN_STATUSES
+
+    def apply_event(self, product_id: str, topic: str, payload: Dict) -> List[str]:
+        """อัปเดตแคตตาล็อกและเขียนหน้าที่เปลี่ยน คืนค่ารายชื่อไฟล์ที่เรนเดอร์ใหม่"""
+        rendered = []
+        previous = self.products.get(product_id)
+
+        if topic == 'products/delete' or self.is_hidden(payload):
+            self.products.pop(product_id, None)
+            cars = []
+        else:
+            self.products[product_id] = payload
+            cars = self.ssr.process_car_data({'products': [payload]}, self.api_source)
+
+        if not cars:
+            # ลบ, draft/archived หรือแสดงไม่ได้แล้ว -> ลบหน้ารถและการ์ดใน listing เหมือนกัน
+            handle = (previous or {}).get('handle', payload.get('handle', ''))
+            if handle and self.ssr.remove_car_detail_page(handle):
+                rendered.append(f"car-detail/{handle}.html (deleted)")
+        else:
+            handle = cars[0].handle
+            self.ssr.save_car_detail_page(cars[0])
+            rendered.append(f"car-detail/{handle}.html")
+
+            # handle เปลี่ยน -> ลบหน้าเก่าทิ้ง
+            old_handle = (previous or {}).get('handle')
+            if old_handle and old_handle != handle:
+                self.ssr.remove_car_detail_page(old_handle)
+
+        # เรนเดอร์หน้า listing ใหม่เฉพาะเมื่อรถคันนี้อยู่ในหน้านั้น (ก่อนหรือหลังเปลี่ยน)
+        affected = {h for h in (handle, (previous or {}).get('handle')) if h}
+        new_handles = self.current_listing_handles()
+        listing_cars = None
+        for page in self.listing_pages:
+            old_handles = self.listing_handles.get(page, set())
+            if not affected & (old_handles | set(new_handles)):
+                continue
+            if listing_cars is None:
+                listing_cars = self.ssr.process_car_data(
+                    {'products': list(self.products.values())}, self.api_source
+                )
+            html_content = self.ssr.generate_html_page(listing_cars, self.api_source)
+            self.ssr.write_page(self.ssr.docs_path / page, html_content)
+            self.listing_handles[page] = set(new_handles)
+            rendered.append(page)
+
+        self.stats['renders'] += len(rendered)
+        logger.info(f"🔁 {topic} {product_id}: re-rendered {', '.join(rendered) or 'nothing'}")
+        return rendered
+
+    def create_app(self) -> web.Application:
+        """สร้าง aiohttp application"""
+        app = web.Application()
+        app.router.add_post('/webhooks/shopify', self.handle_webhook)
+        return app
+
+    async def serve(self, host: str = '127.0.0.1', port: int = 8080):
+        """รัน webhook server จนกว่าจะถูกหยุด"""
+        if not self.secret:
+            logger.warning("⚠️ SHOPIFY_WEBHOOK_SECRET is not set - every webhook will be rejected")
+
+        await self.load_catalog()
+
+        runner = web.AppRunner(self.create_app())
+        await runner.setup()
+        site = web.TCPSite(runner, host, port)
+        await site.start()
+        logger.info(f"🪝 Webhook receiver listening on http://{host}:{port}/webhooks/shopify")
+
+        try:
+            await asyncio.Event().wait()
+        finally:
+            await runner.cleanup()
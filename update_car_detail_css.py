@@ -1,94 +1,74 @@
-import os
-import re
-import glob
+from css_tools import inline_critical_css
+from html_rewrite import HTMLRewriter, Rule
+from html_tokens import insert_before_end_tag, replace_elements, replace_tags, set_attribute_if_absent
+
+# CSS link to add
+CSS_LINK = '<link rel="stylesheet" href="../car-detail-style.css">'
+
+# Critical CSS is computed from the linked stylesheets (css_tools), not written by hand.
+# Classes added by JavaScript after load still need their rules inlined.
+CRITICAL_SAFELIST = ("loaded",)
+
+# Hand-written critical blocks from earlier runs (replaced by the computed one)
+LEGACY_CRITICAL_MARKERS = ("Critical CSS สำหรับ LCP", "Only critical above-the-fold styles")
+LEGACY_CRITICAL_COMMENT = "  <!-- Critical CSS Inline -->\n"
+
+# Already updated by hand
+ALREADY_UPDATED = "car-detail/ford-ranger-4dr-dcab-wildtrak-auto-10sp-2wd-2-0-turbo-dct.html"
+
+
+def is_stylesheet(token):
+    return (token.attr('rel') or '').lower() == 'stylesheet'
+
+
+def is_large_inline_css(token, text):
+    """<style> เดิมของหน้า (ขึ้นต้นด้วย comment หรือ body{font-family) - ย้ายไปอยู่ใน shared CSS แล้ว"""
+    text = text.lstrip()
+    return not token.attrs and (text.startswith('/*') or text.startswith('body{font-family'))
+
+
+def is_legacy_critical_css(token, text):
+    return not token.attrs and any(marker in text for marker in LEGACY_CRITICAL_MARKERS)
+
+
+def use_shared_css(content):
+    """Link the shared car-detail CSS and drop the page's own large inline CSS"""
+    # Check if already has the CSS link
+    if '../car-detail-style.css' in content:
+        return content
+
+    # Add CSS link after existing CSS links or before </head>
+    if '<link rel="stylesheet"' in content:
+        # Add after last CSS link
+        content = replace_tags(content, 'link', lambda token: token.raw + '\n  ' + CSS_LINK,
+                               match=is_stylesheet, count=1)
+    else:
+        # Add before </head>
+        content = insert_before_end_tag(content, 'head', f'  {CSS_LINK}\n')
+
+    # Remove large inline CSS blocks (critical CSS is added by car-detail-critical-css)
+    content = replace_elements(content, 'style', '', match=is_large_inline_css)
+
+    # Fix image onerror attributes (only images without one - running again adds nothing)
+    return set_attribute_if_absent(content, 'img', 'onerror', "this.style.display='none'")
+
+
+def inline_page_critical_css(content, path):
+    """Inline the above-the-fold CSS of the page's linked stylesheets and load them without blocking render"""
+    content = content.replace(LEGACY_CRITICAL_COMMENT, '')
+    content = replace_elements(content, 'style', '', match=is_legacy_critical_css)
+    return inline_critical_css(content, path, safelist=CRITICAL_SAFELIST)
+
+
+RULES = [
+    Rule("car-detail-shared-css", use_shared_css, exclude=(ALREADY_UPDATED,), version=3),
+    Rule("car-detail-critical-css", inline_page_critical_css, with_path=True, depends=("*.css",), version=2),
+]
+
 
 def update_car_detail_files():
     """Update all car detail HTML files to use shared CSS"""
-    
-    # Path to car detail directory
-    car_detail_dir = "docs/car-detail"
-    
-    # CSS link to add
-    css_link = '<link rel="stylesheet" href="../car-detail-style.css">'
-    
-    # Minimal critical CSS
-    critical_css = '''<style>
-    /* Only critical above-the-fold styles */
-    body { font-family: 'Prompt', sans-serif; margin: 0; background: #f7f7fb; }
-    .container { max-width: 1200px; margin: 0 auto; padding: 1rem; }
-    .car-header { background: #fff; border-radius: 12px; padding: 2rem; margin-bottom: 2rem; }
-    .car-title { font-size: 2rem; font-weight: 700; color: #2c3e50; }
-    .car-price { font-size: 2.5rem; color: #e74c3c; font-weight: 800; }
-    img { opacity: 0; transition: opacity 0.3s ease; }
-    img.loaded, .main-image img { opacity: 1; }
-  </style>'''
-    
-    # Get all HTML files in car-detail directory
-    html_files = glob.glob(os.path.join(car_detail_dir, "*.html"))
-    
-    print(f"Found {len(html_files)} car detail files to update")
-    
-    for file_path in html_files:
-        try:
-            # Skip if it's already been updated
-            if "ford-ranger-4dr-dcab-wildtrak-auto-10sp-2wd-2-0-turbo-dct.html" in file_path:
-                continue
-                
-            print(f"Updating: {file_path}")
-            
-            with open(file_path, 'r', encoding='utf-8') as f:
-                content = f.read()
-            
-            # Check if already has the CSS link
-            if '../car-detail-style.css' in content:
-                print(f"  Already updated: {file_path}")
-                continue
-            
-            # Add CSS link after existing CSS links or before </head>
-            if '<link rel="stylesheet"' in content:
-                # Add after last CSS link
-                content = re.sub(
-                    r'(<link rel="stylesheet"[^>]*>)',
-                    r'\1\n  ' + css_link,
-                    content,
-                    count=1
-                )
-            else:
-                # Add before </head>
-                content = content.replace('</head>', f'  {css_link}\n</head>')
-            
-            # Remove large inline CSS blocks (keep only critical CSS)
-            # Look for large <style> blocks and replace with critical CSS
-            content = re.sub(
-                r'<style>\s*\/\*[^*]*\*\/.*?<\/style>',
-                critical_css,
-                content,
-                flags=re.DOTALL
-            )
-            
-            # Also handle CSS without comments
-            content = re.sub(
-                r'<style>\s*body\{font-family.*?<\/style>',
-                critical_css,
-                content,
-                flags=re.DOTALL
-            )
-            
-            # Fix image onerror attributes
-            content = re.sub(
-                r'<img([^>]*)>',
-                r'<img\1 onerror="this.style.display=\'none\'">',
-                content
-            )
-            
-            # Write updated content
-            with open(file_path, 'w', encoding='utf-8') as f:
-                f.write(content)
-            
-            print(f"  Updated successfully: {file_path}")
-            
-        except Exception as e:
-            print(f"  Error updating {file_path}: {e}")
+    HTMLRewriter(RULES).run()
 
 if __name__ == "__main__":
     update_car_detail_files()
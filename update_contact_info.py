@@ -7,10 +7,14 @@ Update Contact Information and Social Media Links
 Created by: Website Contact Update System
 """
 
-import re
 from pathlib import Path
 import json
 
+from html_rewrite import HTMLRewriter, Rule
+from html_tokens import replace_json_ld
+
+OLD_PHONE = '064-140-5566'
+
 class ContactInfoUpdater:
     def __init__(self):
         self.docs_path = Path("docs")
@@ -100,34 +104,7 @@ class ContactInfoUpdater:
             print("   ❌ ไม่พบไฟล์ index.html")
             return
         
-        with open(index_path, 'r', encoding='utf-8') as f:
-            content = f.read()
-        
-        # อัปเดต phone number
-        content = re.sub(
-            r'064-140-5566',
-            self.contact_info["phone"],
-            content
-        )
-        
-        # อัปเดต LocalBusiness schema
-        schema = self.create_local_business_schema()
-        schema_str = json.dumps(schema, ensure_ascii=False, indent=2)
-        
-        # หา LocalBusiness schema เก่าและแทนที่
-        pattern = r'<script type="application/ld\+json">\s*\{[^}]*"@type":\s*"LocalBusiness"[^<]*</script>'
-        replacement = f'<script type="application/ld+json">\n{schema_str}\n</script>'
-        
-        if re.search(pattern, content, re.DOTALL):
-            content = re.sub(pattern, replacement, content, flags=re.DOTALL)
-        else:
-            # เพิ่ม schema ใหม่ถ้าไม่มี
-            head_end = content.find('</head>')
-            if head_end != -1:
-                content = content[:head_end] + f'\n{replacement}\n' + content[head_end:]
-        
-        with open(index_path, 'w', encoding='utf-8') as f:
-            f.write(content)
+        HTMLRewriter(RULES, root=self.docs_path).run()
         
         print("   ✅ อัปเดตหน้าแรกสำเร็จ")
     
@@ -407,6 +384,22 @@ class ContactInfoUpdater:
         print("📱 โซเชียลมีเดีย: 6 แพลตฟอร์ม")
         print("🎯 หน้าติดต่อ: contact.html")
 
+def update_phone_number(content):
+    """อัปเดต phone number"""
+    return content.replace(OLD_PHONE, ContactInfoUpdater().contact_info["phone"])
+
+
+def update_local_business_schema(content):
+    """อัปเดต LocalBusiness schema ตาม @type ของบล็อก JSON-LD (เพิ่มก่อน </head> ถ้าไม่มี)"""
+    return replace_json_ld(content, "LocalBusiness", ContactInfoUpdater().create_local_business_schema())
+
+
+RULES = [
+    Rule("contact-phone", update_phone_number, patterns=("index.html",)),
+    Rule("contact-local-business-schema", update_local_business_schema, patterns=("index.html",), version=2),
+]
+
+
 if __name__ == "__main__":
     updater = ContactInfoUpdater()
     updater.update_all_files()
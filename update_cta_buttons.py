@@ -4,14 +4,10 @@
 อัพเดตปุ่ม CTA ในหน้า car detail ทั้งหมด
 """
 
-import os
-import glob
+from html_rewrite import HTMLRewriter, Rule
 
-def update_cta_buttons():
-    """อัพเดตปุ่ม CTA ในไฟล์ car detail ทั้งหมด"""
-    
-    # หา CTA section เดิม
-    old_cta = '''  <!-- CTA Section -->
+# หา CTA section เดิม
+OLD_CTA = '''  <!-- CTA Section -->
   <div class="container">
     <section class="cta-section">
       <h2>สนใจรถคันนี้?</h2>
@@ -27,9 +23,9 @@ def update_cta_buttons():
       </a>
     </section>
   </div>'''
-    
-    # CTA section ใหม่
-    new_cta = '''  <!-- CTA Section -->
+
+# CTA section ใหม่
+NEW_CTA = '''  <!-- CTA Section -->
   <div class="container">
     <section class="cta-section">
       <h2>💬 สนใจรถคันนี้?</h2>
@@ -62,35 +58,24 @@ def update_cta_buttons():
       </div>
     </section>
   </div>'''
-    
-    # ค้นหาไฟล์ HTML ทั้งหมดในโฟลเดอร์ car-detail
-    car_detail_files = glob.glob("docs/car-detail/*.html")
-    updated_count = 0
-    
-    for file_path in car_detail_files:
-        if 'navigation-test.html' in file_path or 'dummy' in file_path:
-            continue
-            
-        try:
-            # อ่านไฟล์
-            with open(file_path, 'r', encoding='utf-8') as f:
-                content = f.read()
-            
-            # แทนที่ CTA section
-            if old_cta in content:
-                content = content.replace(old_cta, new_cta)
-                
-                # เขียนกลับไฟล์
-                with open(file_path, 'w', encoding='utf-8') as f:
-                    f.write(content)
-                    
-                updated_count += 1
-                print(f"✅ อัพเดต: {os.path.basename(file_path)}")
-                
-        except Exception as e:
-            print(f"❌ ข้อผิดพลาด: {file_path} - {e}")
-    
-    print(f"\n🎉 อัพเดตสำเร็จ: {updated_count} ไฟล์")
+
+# ไฟล์ทดสอบ ไม่ต้องแก้
+SKIPPED_PAGES = ("car-detail/navigation-test.html", "car-detail/*dummy*")
+
+
+def replace_cta_section(content):
+    """แทนที่ CTA section เดิมด้วยแบบใหม่"""
+    return content.replace(OLD_CTA, NEW_CTA)
+
+
+RULES = [
+    Rule("cta-buttons", replace_cta_section, exclude=SKIPPED_PAGES),
+]
+
+
+def update_cta_buttons():
+    """อัพเดตปุ่ม CTA ในไฟล์ car detail ทั้งหมด"""
+    HTMLRewriter(RULES).run()
 
 if __name__ == "__main__":
     update_cta_buttons()